@@ -0,0 +1,137 @@
+import math
+from collections import OrderedDict
+from time import monotonic
+
+from Metrics import metrics
+
+# Reject codes, carried in the message as "Rejected [<code>]: ..."
+MALFORMED = "malformed"
+RATE_LIMITED = "rate-limited"
+FEE_TOO_LOW = "fee-too-low"
+MEMPOOL_FULL = "mempool-full"
+REGISTRATION_LIMITED = "registration-limited"
+
+MAX_NAME_LENGTH = 64
+
+
+def reject(code, detail):
+    metrics.inc(f"admission_rejected_{code.replace('-', '_')}_total")
+    return f"Rejected [{code}]: {detail}"
+
+
+def reject_code(result):
+    # The code of a rejection message, or None for anything else
+    if isinstance(result, str) and result.startswith("Rejected ["):
+        return result[len("Rejected ["):result.find("]")]
+    return None
+
+
+def valid_name(name):
+    return isinstance(name, str) and 0 < len(name) <= MAX_NAME_LENGTH and name.isprintable()
+
+
+def valid_amount(value, positive=True):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        return False
+    return value > 0 if positive else value >= 0
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens, now):
+        self.tokens = tokens
+        self.updated = now
+
+    def take(self, rate, burst, now, cost=1):
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens < cost:
+            return False
+        self.tokens -= cost
+        return True
+
+
+class AdmissionControl:
+    """Gate in front of a mempool.
+
+    Checks run cheapest first: stateless field checks, then the mempool
+    capacity, then a fee floor that starts at `fee_step` once the pool is
+    `soft_fraction` full and doubles `fee_doublings` times on the way to
+    `capacity`, then a per-sender token bucket (`rate` per second, up to
+    `burst`). New identities draw from one shared bucket and stop at
+    `max_nodes`. At most `max_senders` buckets are kept, least recently used
+    first out (a dropped bucket comes back full), so memory stays bounded
+    however many senders there are, and every check is O(1).
+
+    Each check returns None when the item may pass, or a rejection message.
+    `exempt` senders (the mining reward) skip the rate limit and the floor.
+    """
+
+    def __init__(self, capacity=50000, soft_fraction=0.5, fee_step=0.01, fee_doublings=8,
+                 rate=20.0, burst=100, max_senders=100000,
+                 registration_rate=50.0, registration_burst=500, max_nodes=1000000,
+                 exempt=("System",), clock=monotonic):
+        self.capacity = capacity
+        self.soft_limit = int(capacity * soft_fraction)
+        self.fee_step = fee_step
+        self.fee_doublings = fee_doublings
+        self.rate = rate
+        self.burst = burst
+        self.max_senders = max_senders
+        self.registration_rate = registration_rate
+        self.registration_burst = registration_burst
+        self.max_nodes = max_nodes
+        self.exempt = set(exempt)
+        self.clock = clock
+        self.buckets = OrderedDict()  # sender -> TokenBucket, least recently used first
+        self.registrations = TokenBucket(registration_burst, clock())
+
+    def fee_floor(self, pending):
+        if not self.fee_step or pending < self.soft_limit:
+            return 0
+        fullness = (pending - self.soft_limit) / max(self.capacity - self.soft_limit, 1)
+        return self.fee_step * 2 ** (self.fee_doublings * fullness)
+
+    def precheck(self, sender, receivers, amounts, fee=0):
+        # Stateless: names, amounts and fee are well-formed
+        if not valid_name(sender) or not all(valid_name(receiver) for receiver in receivers):
+            return reject(MALFORMED, f"Account names must be 1 to {MAX_NAME_LENGTH} printable characters!")
+        if not all(valid_amount(amount) for amount in amounts):
+            return reject(MALFORMED, "Amounts must be positive finite numbers!")
+        if not valid_amount(fee, positive=False):
+            return reject(MALFORMED, "Fee must be a non-negative finite number!")
+        return None
+
+    def admit(self, sender, pending, fee=0, now=None):
+        # Stateful: `pending` is the current mempool size
+        if pending >= self.capacity:
+            return reject(MEMPOOL_FULL, f"Mempool is full ({self.capacity} transactions)!")
+        if sender in self.exempt:
+            return None
+        floor = self.fee_floor(pending)
+        if fee < floor:
+            return reject(FEE_TOO_LOW, f"Fee must be at least {floor:.4f} while the mempool holds {pending} transactions!")
+        now = self.clock() if now is None else now
+        bucket = self.buckets.get(sender)
+        if bucket is None:
+            bucket = self.buckets[sender] = TokenBucket(self.burst, now)
+            if len(self.buckets) > self.max_senders:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(sender)
+        if not bucket.take(self.rate, self.burst, now):
+            return reject(RATE_LIMITED, f"{sender} may send at most {self.rate:g} transactions per second!")
+        metrics.inc("admission_accepted_total")
+        return None
+
+    def admit_registration(self, address, registered, now=None):
+        # `registered`: the number of identities that already exist
+        if not valid_name(address):
+            return reject(MALFORMED, f"Node names must be 1 to {MAX_NAME_LENGTH} printable characters!")
+        if registered >= self.max_nodes:
+            return reject(REGISTRATION_LIMITED, f"The network is limited to {self.max_nodes} nodes!")
+        now = self.clock() if now is None else now
+        if not self.registrations.take(self.registration_rate, self.registration_burst, now):
+            return reject(REGISTRATION_LIMITED, "Too many new nodes; try again shortly!")
+        return None
@@ -0,0 +1,231 @@
+import numpy as np
+
+from Indexes import tx_outputs, tx_payouts
+
+try:
+    import pandas as pd
+except ImportError:  # DataFrames are a convenience; arrays work without pandas
+    pd = None
+
+
+class GrowableColumn:
+    """NumPy array with amortized O(1) append of whole batches."""
+
+    def __init__(self, dtype, capacity=1024):
+        self.data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.data.dtype)
+        needed = self.size + len(values)
+        if needed > len(self.data):
+            grown = np.empty(max(needed, 2 * len(self.data)), dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size:needed] = values
+        self.size = needed
+
+    def truncate(self, size):
+        self.size = min(self.size, size)
+
+    @property
+    def values(self):
+        return self.data[:self.size]
+
+
+class LedgerAnalytics:
+    """Columnar copy of the confirmed ledger for dashboard queries.
+
+    `sync(chain)` appends only blocks it has not seen (and rolls back to the
+    fork point on a reorg); every query is a vectorized pass over the
+    columns. Each row is one transfer: a batch gives a row per output and
+    a contract call one per payout, the same flows the balance index and
+    AccountState apply. Fees are burned, as in Mycoin4's create_transaction.
+    """
+
+    def __init__(self, issuer="System"):
+        self.issuer = issuer
+        self.accounts = []  # code -> account name
+        self.codes = {}  # account name -> code
+        self.block_hashes = []
+        self.block_timestamps = GrowableColumn(np.float64)
+        self.tx_offsets = [0]  # first row of every block
+        self.tx_totals = [0]  # transactions before every block
+        self.height = GrowableColumn(np.int64)
+        self.sender = GrowableColumn(np.int32)
+        self.receiver = GrowableColumn(np.int32)
+        self.amount = GrowableColumn(np.float64)
+        self.fee = GrowableColumn(np.float64)
+        self._cache = {}  # query results, dropped whenever the ledger changes
+
+    def cached(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def code(self, account):
+        code = self.codes.get(account)
+        if code is None:
+            code = self.codes[account] = len(self.accounts)
+            self.accounts.append(account)
+        return code
+
+    def truncate(self, height):
+        del self.block_hashes[height:]
+        self.block_timestamps.truncate(height)
+        del self.tx_offsets[height + 1:]
+        del self.tx_totals[height + 1:]
+        rows = self.tx_offsets[-1]
+        for column in (self.height, self.sender, self.receiver, self.amount, self.fee):
+            column.truncate(rows)
+
+    def sync(self, chain):
+        start = min(len(self.block_hashes), len(chain))
+        while start and chain[start - 1].hash() != self.block_hashes[start - 1]:
+            start -= 1
+        if start < len(self.block_hashes) or start < len(chain):
+            self._cache = {}
+        if start < len(self.block_hashes):
+            self.truncate(start)
+        heights, senders, receivers, amounts, fees = [], [], [], [], []
+        timestamps = []
+        for height in range(start, len(chain)):
+            block = chain[height]
+            rows = len(heights)
+            for tx in block.transactions:
+                fee = getattr(tx, "fee", 0)  # charged once, on the first output
+                flows = [(tx.sender, receiver, amount) for receiver, amount in tx_outputs(tx)]
+                flows.extend(tx_payouts(tx))
+                for sender, receiver, amount in flows:
+                    heights.append(height)
+                    senders.append(self.code(sender))
+                    receivers.append(self.code(receiver))
+                    amounts.append(amount)
+                    fees.append(fee)
+                    fee = 0
+            self.block_hashes.append(block.hash())
+            timestamps.append(block.timestamp)
+            self.tx_offsets.append(self.tx_offsets[-1] + len(heights) - rows)
+            self.tx_totals.append(self.tx_totals[-1] + len(block.transactions))
+        self.block_timestamps.extend(timestamps)
+        self.height.extend(heights)
+        self.sender.extend(senders)
+        self.receiver.extend(receivers)
+        self.amount.extend(amounts)
+        self.fee.extend(fees)
+        return len(chain) - start
+
+    @property
+    def tx_count(self):
+        return self.tx_totals[-1]
+
+    def balances(self):
+        return self.cached("balances", self._balances)
+
+    def _balances(self):
+        n = len(self.accounts)
+        amount, fee = self.amount.values, self.fee.values
+        received = np.bincount(self.receiver.values, weights=amount, minlength=n)
+        sent = np.bincount(self.sender.values, weights=amount + fee, minlength=n)
+        return received - sent
+
+    def top_holders(self, n=10, include_issuer=False):
+        balances = self.balances()
+        if not include_issuer and self.issuer in self.codes:
+            balances = balances.copy()
+            balances[self.codes[self.issuer]] = -np.inf
+        n = min(n, len(balances))
+        if not n:
+            return []
+        top = np.argpartition(-balances, n - 1)[:n]
+        top = top[np.argsort(-balances[top])]
+        return [(self.accounts[i], float(balances[i])) for i in top if np.isfinite(balances[i])]
+
+    def balance_history(self, account):
+        # Balance after every block that touched the account
+        code = self.codes.get(account)
+        if code is None:
+            return self.frame({"height": [], "timestamp": [], "balance": []})
+        sender, receiver = self.sender.values, self.receiver.values
+        delta = np.where(receiver == code, self.amount.values, 0.0)
+        delta -= np.where(sender == code, self.amount.values + self.fee.values, 0.0)
+        touched = (sender == code) | (receiver == code)
+        heights = self.height.values[touched]
+        running = np.cumsum(delta[touched])
+        last = np.r_[heights[1:] != heights[:-1], True] if len(heights) else np.array([], dtype=bool)
+        heights = heights[last]
+        return self.frame({
+            "height": heights,
+            "timestamp": self.block_timestamps.values[heights],
+            "balance": running[last],
+        })
+
+    def pair_totals(self):
+        n = max(len(self.accounts), 1)
+        pairs = self.sender.values.astype(np.int64) * n + self.receiver.values
+        if n * n <= 1 << 22:
+            # Few enough accounts for a direct bincount over every pair
+            totals = np.bincount(pairs, weights=self.amount.values, minlength=n * n)
+            counts = np.bincount(pairs, minlength=n * n)
+            unique = np.flatnonzero(counts)
+            return unique, totals[unique]
+        unique, inverse = np.unique(pairs, return_inverse=True)
+        return unique, np.bincount(inverse, weights=self.amount.values)
+
+    def flows(self, min_amount=0.0):
+        # Total sent for every (sender, receiver) pair, largest first
+        n = max(len(self.accounts), 1)
+        unique, totals = self.cached("pair_totals", self.pair_totals)
+        order = np.argsort(-totals)
+        keep = order[totals[order] >= min_amount]
+        return self.frame({
+            "sender": [self.accounts[p // n] for p in unique[keep]],
+            "receiver": [self.accounts[p % n] for p in unique[keep]],
+            "amount": totals[keep],
+        })
+
+    def flow_matrix(self, accounts=None):
+        # Dense sender x receiver matrix, restricted to `accounts` (default: top 20)
+        if accounts is None:
+            accounts = [name for name, _ in self.top_holders(20, include_issuer=True)]
+        codes = np.array([self.codes[a] for a in accounts if a in self.codes], dtype=np.int64)
+        k = len(codes)
+        lookup = np.full(len(self.accounts), -1, dtype=np.int64)
+        lookup[codes] = np.arange(k)
+        s, r = lookup[self.sender.values], lookup[self.receiver.values]
+        mask = (s >= 0) & (r >= 0)
+        matrix = np.bincount(s[mask] * k + r[mask], weights=self.amount.values[mask], minlength=k * k).reshape(k, k)
+        names = [self.accounts[c] for c in codes]
+        if pd is not None:
+            return pd.DataFrame(matrix, index=names, columns=names)
+        return names, matrix
+
+    def fee_totals(self):
+        blocks = len(self.block_hashes)
+        per_block = np.bincount(self.height.values, weights=self.fee.values, minlength=blocks)
+        per_sender = np.bincount(self.sender.values, weights=self.fee.values, minlength=len(self.accounts))
+        return {
+            "total": float(self.fee.values.sum()),
+            "per_block": per_block,
+            "per_sender": {self.accounts[i]: float(v) for i, v in enumerate(per_sender) if v},
+        }
+
+    def supply_over_time(self):
+        # Coins outside the issuer after every block; fees paid from
+        # circulation are burned and leave the supply
+        blocks = len(self.block_hashes)
+        code = self.codes.get(self.issuer, -1)
+        amount = self.amount.values
+        issued = np.where(self.sender.values == code, amount, -self.fee.values)
+        issued -= np.where(self.receiver.values == code, amount, 0.0)
+        per_block = np.bincount(self.height.values, weights=issued, minlength=blocks)
+        return self.frame({
+            "height": np.arange(blocks),
+            "timestamp": self.block_timestamps.values,
+            "supply": np.cumsum(per_block),
+        })
+
+    def frame(self, columns):
+        if pd is not None:
+            return pd.DataFrame(columns)
+        return {name: np.asarray(values) for name, values in columns.items()}
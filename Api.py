@@ -0,0 +1,266 @@
+import argparse
+import asyncio
+import json
+import threading
+from urllib.parse import parse_qs, unquote
+
+from Admission import MEMPOOL_FULL, RATE_LIMITED, AdmissionControl, reject_code
+from Blockchain import Blockchain
+from Events import start_stream_server
+from Metrics import metrics
+from Miner import MiningWorker
+
+STATUS_TEXT = {
+    200: "OK",
+    201: "Created",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    503: "Service Unavailable",
+}
+REJECT_STATUS = {RATE_LIMITED: 429, MEMPOOL_FULL: 503}
+MAX_BODY = 64 * 1024
+MAX_CACHE_ENTRIES = 10000
+
+
+class ChainAPI:
+    """Headless JSON/HTTP API over a Blockchain.
+
+    GET  /tip                  height and hash of the last block
+    GET  /blocks/<height>      block by height
+    GET  /blocks/hash/<hash>   block by hash
+    GET  /balance/<node>       balance of a registered node
+    GET  /mempool              pending transactions
+    GET  /headers?start=&count=  block headers for light clients
+    GET  /proof/tx/<hash>      transaction with its Merkle inclusion proof
+    GET  /proof/account/<node> proven transaction history of a node
+    GET  /state                account state root at the tip
+    GET  /state/<bits>         state subtree at a bit prefix, for diff sync
+    GET  /metrics              Prometheus text dump of the chain metrics
+    POST /transactions         {"sender", "receiver", "amount"} or
+                               {"sender", "outputs": [[receiver, amount], ...]}
+
+    GET responses carry an ETag derived from the tip hash (plus the mempool
+    size for /mempool) and are cached until the tip moves, so repeated reads
+    of the same state never touch the chain. Transactions turned away by
+    the chain's AdmissionControl answer 429 (rate-limited), 503 (mempool
+    full) or 400, with the reject code in the body.
+    """
+
+    def __init__(self, blockchain, lock=None):
+        self.blockchain = blockchain
+        self.lock = lock or getattr(blockchain, "lock", None) or threading.Lock()
+        self.cache = {}
+        self.cache_tip = None
+        self.hits = 0
+        self.misses = 0
+
+    def tip(self):
+        index = self.blockchain.index
+        return len(index) - 1, index.tip()
+
+    def etag_for(self, path, tip_hash):
+        if path == "/mempool":
+            # A counter, not the list's identity or length: both repeat
+            return f'"{tip_hash[:16]}-{self.blockchain.mempool_version}"'
+        return f'"{tip_hash[:16]}"'
+
+    def get(self, target):
+        height, tip_hash = self.tip()
+        if tip_hash != self.cache_tip or len(self.cache) >= MAX_CACHE_ENTRIES:
+            self.cache = {}
+            self.cache_tip = tip_hash
+        etag = self.etag_for(target.partition("?")[0], tip_hash)
+        cached = self.cache.get(target)
+        if cached and cached[0] == etag:
+            self.hits += 1
+            metrics.inc("api_cache_hits_total")
+            return cached[1], cached[2], etag
+        self.misses += 1
+        metrics.inc("api_cache_misses_total")
+        status, payload = self.route_get(target, height, tip_hash)
+        body = json.dumps(payload).encode()
+        if status == 200:
+            self.cache[target] = (etag, status, body)
+        return status, body, etag
+
+    def route_get(self, target, height, tip_hash):
+        path, _, query = target.partition("?")
+        parts = [unquote(p) for p in path.split("/") if p]
+        chain = self.blockchain.chain
+        if parts == ["tip"]:
+            return 200, {"height": height, "hash": tip_hash}
+        if parts == ["mempool"]:
+            return 200, [tx.to_dict() for tx in list(self.blockchain.current_transactions)]
+        if len(parts) == 2 and parts[0] == "blocks":
+            if not parts[1].isdigit() or int(parts[1]) > height:
+                return 404, {"error": "Block not found"}
+            return 200, chain[int(parts[1])].to_dict()
+        if len(parts) == 3 and parts[:2] == ["blocks", "hash"]:
+            block_height = self.blockchain.index.block_height(parts[2])
+            if block_height is None:
+                return 404, {"error": "Block not found"}
+            return 200, chain[block_height].to_dict()
+        if len(parts) == 2 and parts[0] == "balance":
+            balance = self.blockchain.check_balance(parts[1])
+            if isinstance(balance, str):
+                return 404, {"error": balance}
+            return 200, {"node": parts[1], "balance": balance}
+        if parts == ["headers"]:
+            params = parse_qs(query)
+            try:
+                start = int(params.get("start", ["0"])[0])
+                count = min(int(params.get("count", ["500"])[0]), 2000)
+            except ValueError:
+                return 400, {"error": "start and count must be integers"}
+            return 200, self.blockchain.get_headers(start, count)
+        if len(parts) == 3 and parts[:2] == ["proof", "tx"]:
+            proof = self.blockchain.prove_transaction(parts[2])
+            if proof is None:
+                return 404, {"error": "Transaction not found"}
+            return 200, proof
+        if len(parts) == 3 and parts[:2] == ["proof", "account"]:
+            return 200, self.blockchain.prove_account(parts[2])
+        if parts == ["state"]:
+            return 200, {"height": height, "root": self.blockchain.state_root(), **self.blockchain.state.tree.view()}
+        if len(parts) == 2 and parts[0] == "state":
+            if len(parts[1]) > 256 or parts[1].strip("01"):
+                return 400, {"error": "State prefix must be a string of 0s and 1s"}
+            return 200, self.blockchain.state.tree.view(parts[1])
+        return 404, {"error": "Unknown endpoint"}
+
+    def post(self, path, body):
+        if path != "/transactions":
+            return 404, {"error": "Unknown endpoint"}
+        try:
+            data = json.loads(body or b"{}")
+            if "outputs" in data:
+                sender = data["sender"]
+                outputs = [(str(receiver), float(amount)) for receiver, amount in data["outputs"]]
+            else:
+                sender, receiver, amount = data["sender"], data["receiver"], float(data["amount"])
+        except (ValueError, KeyError, TypeError):
+            return 400, {"error": "Expected JSON with sender and either receiver and amount or outputs"}
+        if "outputs" in data:
+            with self.lock:
+                result = self.blockchain.create_batch_transaction(sender, outputs)
+        else:
+            if amount <= 0:
+                return 400, {"error": "Amount must be positive"}
+            with self.lock:
+                result = self.blockchain.create_transaction(sender, receiver, amount)
+        if "added" in result:
+            return 201, {"result": result}
+        code = reject_code(result)
+        if code:
+            return REJECT_STATUS.get(code, 400), {"error": result, "code": code}
+        return 400, {"error": result}
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get("connection", "").lower() != "close"
+                if version == "HTTP/1.0":
+                    keep_alive = headers.get("connection", "").lower() == "keep-alive"
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    self.respond(writer, 400, b'{"error": "Invalid Content-Length"}', keep_alive=False)
+                    await writer.drain()
+                    break
+                if length > MAX_BODY:
+                    self.respond(writer, 413, b'{"error": "Body too large"}', keep_alive=False)
+                    await writer.drain()
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                path = target.split("?", 1)[0]
+                if method == "GET" and path == "/metrics":
+                    body = metrics.render_prometheus().encode()
+                    self.respond(writer, 200, body, keep_alive=keep_alive, content_type="text/plain; version=0.0.4")
+                elif method == "GET":
+                    status, payload, etag = self.get(target)
+                    if status == 200 and headers.get("if-none-match") == etag:
+                        self.respond(writer, 304, b"", etag, keep_alive)
+                    else:
+                        self.respond(writer, status, payload, etag if status == 200 else None, keep_alive)
+                elif method == "POST":
+                    status, payload = self.post(path, body)
+                    self.respond(writer, status, json.dumps(payload).encode(), keep_alive=keep_alive)
+                else:
+                    self.respond(writer, 405, b'{"error": "Method not allowed"}', keep_alive=keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def respond(self, writer, status, body, etag=None, keep_alive=True, content_type="application/json"):
+        head = [
+            f"HTTP/1.1 {status} {STATUS_TEXT[status]}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            "Cache-Control: no-cache",
+            "Connection: keep-alive" if keep_alive else "Connection: close",
+        ]
+        if etag:
+            head.append(f"ETag: {etag}")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+
+    async def serve(self, host="127.0.0.1", port=8000):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a Blockchain over JSON/HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--nodes", nargs="*", default=[], help="Nodes to register at startup")
+    parser.add_argument("--mine", help="Keep mining blocks in the background for this node")
+    parser.add_argument("--events-port", type=int, help="Also stream chain events (NDJSON/WebSocket) on this port")
+    parser.add_argument("--rate", type=float, default=20.0, help="Transactions per second allowed per sender")
+    parser.add_argument("--mempool-capacity", type=int, default=50000)
+    args = parser.parse_args()
+
+    # Transactions carry no fee on this chain, so no fee floor
+    admission = AdmissionControl(capacity=args.mempool_capacity, fee_step=0, rate=args.rate)
+    blockchain = Blockchain(admission=admission)
+    for node in args.nodes + ([args.mine] if args.mine else []):
+        blockchain.register_node(node)
+
+    if args.events_port:
+        start_stream_server(host=args.host, port=args.events_port)
+    worker = MiningWorker(blockchain, args.mine, continuous=True) if args.mine else None
+    if worker:
+        worker.start()
+    try:
+        asyncio.run(ChainAPI(blockchain).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if worker:
+            worker.stop()
@@ -1,7 +1,20 @@
 import hashlib
 import json
+import threading
 from time import time
 import streamlit as st
+from Admission import AdmissionControl, valid_amount, valid_name
+from Contracts import CONTRACTS, DEFAULT_GAS_LIMIT, DEPLOY, ContractRuntime
+from Engine import ChainEngine
+from Events import bus
+from Indexes import ChainIndex, tx_hash
+from Merkle import leaf_hash, merkle_levels, merkle_proof, merkle_root
+from Metrics import metrics, profile_call, render_panel
+from State import AccountState
+
+MAX_BATCH_OUTPUTS = 1000
+MINT = "System"  # Pays the mining rewards; reserved, so no one can send as it
+MINING_REWARD = 10
 
 
 class Transaction:
@@ -14,72 +27,349 @@ class Transaction:
         return {"sender": self.sender, "receiver": self.receiver, "amount": self.amount}
 
 
+class BatchTransaction:
+    """One sender paying many receivers, hashed, indexed and applied as a
+    single transaction."""
+
+    def __init__(self, sender, outputs):
+        self.sender = sender
+        self.outputs = [(receiver, amount) for receiver, amount in outputs]
+        self.amount = sum(amount for _, amount in self.outputs)  # Total debited from the sender
+
+    def to_dict(self):
+        return {"sender": self.sender, "outputs": [[receiver, amount] for receiver, amount in self.outputs]}
+
+
+class ContractCall:
+    """A call to a contract method, carrying `value` coins from the sender to
+    the contract. The receipt (status, gas used, result, coins paid out) is
+    filled in when the block is mined and kept beside the call: to_dict(),
+    and so the transaction hash, cover the call alone, while the block
+    stores and commits to both (see tx_record)."""
+
+    def __init__(self, sender, contract, method, args=(), value=0, gas_limit=DEFAULT_GAS_LIMIT, receipt=None):
+        self.sender = sender
+        self.contract = contract
+        self.method = method
+        self.args = list(args)
+        self.amount = value
+        self.gas_limit = gas_limit
+        self.receipt = receipt
+
+    @property
+    def receiver(self):
+        # The value is paid to the contract's account
+        return self.contract
+
+    def to_dict(self):
+        return {
+            "sender": self.sender,
+            "contract": self.contract,
+            "method": self.method,
+            "args": self.args,
+            "value": self.amount,
+            "gas_limit": self.gas_limit,
+        }
+
+
+def tx_record(tx):
+    # What a block stores and its Merkle leaf commits to: the transaction,
+    # plus a contract call's receipt once it has run
+    data = tx.to_dict()
+    receipt = getattr(tx, "receipt", None)
+    if receipt is not None:
+        data["receipt"] = receipt
+    return data
+
+
+def transaction_from_dict(data):
+    if "contract" in data:
+        return ContractCall(data["sender"], data["contract"], data["method"], data["args"],
+                            data["value"], data["gas_limit"], data.get("receipt"))
+    if "outputs" in data:
+        return BatchTransaction(data["sender"], data["outputs"])
+    return Transaction(data["sender"], data["receiver"], data["amount"])
+
+
 class Block:
-    def __init__(self, index, previous_hash, proof, transactions, timestamp=None):
+    def __init__(self, index, previous_hash, proof, transactions, timestamp=None, state_root=None):
         self.index = index
         self.timestamp = timestamp or time()
         self.transactions = transactions
         self.proof = proof
         self.previous_hash = previous_hash
+        self.state_root = state_root  # Account state after this block
+        self._merkle_root = None
 
-    def to_dict(self):
+    def leaves(self):
+        return [leaf_hash(tx_record(tx)) for tx in self.transactions]
+
+    def merkle_root(self):
+        if self._merkle_root is None:
+            self._merkle_root = merkle_root(self.leaves())
+        return self._merkle_root
+
+    def header(self):
+        # The block hash commits to the transactions through merkle_root and
+        # to the resulting balances through state_root, so headers alone can
+        # be chained and checked by light clients
         return {
             "index": self.index,
             "timestamp": self.timestamp,
-            "transactions": [tx.to_dict() for tx in self.transactions],
             "proof": self.proof,
             "previous_hash": self.previous_hash,
+            "merkle_root": self.merkle_root(),
+            "tx_count": len(self.transactions),  # bounds the positions a proof may claim
+            "state_root": self.state_root,
         }
 
+    def to_dict(self):
+        return {**self.header(), "transactions": [tx_record(tx) for tx in self.transactions]}
+
     def hash(self):
-        block_string = json.dumps(self.to_dict(), sort_keys=True).encode()
+        block_string = json.dumps(self.header(), sort_keys=True).encode()
+        metrics.inc("block_hash_total")
+        metrics.inc("block_serialized_bytes_total", len(block_string))
         return hashlib.sha256(block_string).hexdigest()
 
 
 class Blockchain:
-    def __init__(self):
+    def __init__(self, admission=None):
         self.chain = []
         self.current_transactions = []
+        self.pending_debits = {}  # sender -> total its mempool transactions spend
+        self.deploying = set()  # contract addresses with a deploy not yet mined
         self.nodes = set()
+        self.index = ChainIndex()
+        self.state = AccountState()
+        self.lock = threading.RLock()  # Guards chain and mempool writes
+        self.listeners = []  # Called as listener(kind, item) after each commit
+        self.mempool_version = 0  # Bumped whenever the mempool changes
+        self.admission = admission  # Optional AdmissionControl for untrusted callers
+        self.contracts = ContractRuntime()
         self.create_genesis_block()
 
     def create_genesis_block(self):
-        genesis_block = Block(0, "0", 100, [])
+        genesis_block = Block(0, "0", 100, [], state_root=self.state.commit())
         self.chain.append(genesis_block)
+        self.index.add_block(genesis_block)
+
+    def notify(self, kind, item):
+        if kind in ("transaction", "block"):
+            self.mempool_version += 1
+        for listener in self.listeners:
+            listener(kind, item)
+        if kind == "block":
+            bus.publish("block", lambda: {**item.to_dict(), "hash": self.index.tip()})
+        elif kind == "transaction":
+            bus.publish("transaction", item.to_dict)
+        else:
+            bus.publish(kind, {"node": item})
+
+    def spendable(self, account):
+        # Confirmed balance less what the account's pending transactions spend
+        return self.state.balance(account) - self.pending_debits.get(account, 0)
+
+    def reserve(self, transaction):
+        # Caller holds self.lock; None when the sender can cover the debit
+        if self.spendable(transaction.sender) < transaction.amount:
+            return "Sender has insufficient balance!"
+        self.pending_debits[transaction.sender] = self.pending_debits.get(transaction.sender, 0) + transaction.amount
+        return None
+
+    def reserved(self, address):
+        # MINT and contract accounts move coins only through mining and
+        # contract execution, never as the sender of a transaction
+        if address == MINT:
+            return f"Address {MINT} is reserved!"
+        if address in self.contracts or address in self.deploying:
+            return f"Address {address} belongs to a contract!"
+        return None
 
     def register_node(self, address):
-        self.nodes.add(address)
+        with self.lock:
+            rejected = self.reserved(address)
+            if rejected:
+                return rejected
+            if address not in self.nodes:
+                if self.admission:
+                    rejected = self.admission.admit_registration(address, len(self.nodes))
+                    if rejected:
+                        return rejected
+                self.nodes.add(address)
+                self.notify("node", address)
         return f"Node {address} added to the network."
 
     def create_transaction(self, sender, receiver, amount):
+        if self.admission:
+            rejected = self.admission.precheck(sender, [receiver], [amount])
+            if rejected:
+                return rejected
         if sender not in self.nodes or receiver not in self.nodes:
             return "Sender or receiver is not a registered node!"
+        if not valid_amount(amount):
+            return "Amount must be a positive finite number!"
         transaction = Transaction(sender, receiver, amount)
-        self.current_transactions.append(transaction)
+        with self.lock:
+            rejected = self.reserved(sender)
+            if rejected:
+                return rejected
+            if self.admission:
+                rejected = self.admission.admit(sender, len(self.current_transactions))
+                if rejected:
+                    return rejected
+            rejected = self.reserve(transaction)
+            if rejected:
+                return rejected
+            self.current_transactions.append(transaction)
+            self.notify("transaction", transaction)
         return f"Transaction from {sender} to {receiver} for {amount} added."
 
+    def create_batch_transaction(self, sender, outputs):
+        outputs = list(outputs)
+        if not outputs or len(outputs) > MAX_BATCH_OUTPUTS:
+            return f"A batch needs between 1 and {MAX_BATCH_OUTPUTS} outputs!"
+        if self.admission:
+            rejected = self.admission.precheck(sender, [receiver for receiver, _ in outputs], [amount for _, amount in outputs])
+            if rejected:
+                return rejected
+        if sender not in self.nodes or any(receiver not in self.nodes for receiver, _ in outputs):
+            return "Sender or receiver is not a registered node!"
+        if not all(valid_amount(amount) for _, amount in outputs):
+            return "Every output amount must be a positive finite number!"
+        transaction = BatchTransaction(sender, outputs)
+        with self.lock:
+            rejected = self.reserved(sender)
+            if rejected:
+                return rejected
+            if self.admission:
+                rejected = self.admission.admit(sender, len(self.current_transactions))
+                if rejected:
+                    return rejected
+            rejected = self.reserve(transaction)
+            if rejected:
+                return rejected
+            self.current_transactions.append(transaction)
+            self.notify("transaction", transaction)
+        return f"Batch from {sender} to {len(outputs)} receivers for {transaction.amount} added."
+
+    def deploy_contract(self, sender, address, kind, args=()):
+        if kind not in CONTRACTS:
+            return f"Unknown contract kind {kind}; choose from {', '.join(CONTRACTS)}."
+        if not valid_name(address):
+            return "Contract address must be a short printable name!"
+        with self.lock:
+            if address in self.nodes or address in self.contracts or address in self.deploying:
+                return f"Address {address} is already in use!"
+            result = self.submit_call(ContractCall(sender, address, DEPLOY, [kind, *args]))
+            if "added" in result:
+                # Held until the deploy runs; registered only if it succeeds
+                self.deploying.add(address)
+        return result
+
+    def call_contract(self, sender, contract, method, args=(), value=0, gas_limit=DEFAULT_GAS_LIMIT):
+        if contract not in self.contracts and contract not in self.deploying:
+            return f"No contract at {contract}!"
+        if not valid_amount(value, positive=False) or not 0 < gas_limit <= 10 * DEFAULT_GAS_LIMIT:
+            return "Value must be non-negative and the gas limit within bounds!"
+        return self.submit_call(ContractCall(sender, contract, method, args, value, gas_limit))
+
+    def submit_call(self, transaction):
+        if transaction.sender not in self.nodes:
+            return "Sender is not a registered node!"
+        with self.lock:
+            rejected = self.reserved(transaction.sender)
+            if rejected:
+                return rejected
+            if self.admission:
+                rejected = self.admission.admit(transaction.sender, len(self.current_transactions))
+                if rejected:
+                    return rejected
+            rejected = self.reserve(transaction)
+            if rejected:
+                return rejected
+            self.current_transactions.append(transaction)
+            self.notify("transaction", transaction)
+        return f"Call {transaction.method} on {transaction.contract} from {transaction.sender} added."
+
     def mine_block(self, miner):
         if miner not in self.nodes:
             return "Miner must be a registered node!"
 
-        proof = self.proof_of_work(self.chain[-1])
-        block = Block(
-            index=len(self.chain),
-            previous_hash=self.chain[-1].hash(),
-            proof=proof,
-            transactions=self.current_transactions,
-        )
-        self.chain.append(block)
-        self.current_transactions = []
-
-        # Reward miner
-        self.create_transaction("System", miner, 10)
+        while True:
+            with self.lock:
+                tip = self.chain[-1]
+                transactions = list(self.current_transactions)
+            proof = self.proof_of_work(tip)
+            with self.lock:
+                # Another miner (e.g. the background worker) may have moved
+                # the tip during the search; that proof is worthless now
+                if self.chain[-1] is tip:
+                    return self.add_mined_block(miner, proof, transactions)
+            metrics.inc("mining_restarts_total")
+
+    def add_mined_block(self, miner, proof, transactions):
+        with self.lock:
+            previous_hash = self.chain[-1].hash()
+            if not self.valid_proof(previous_hash, proof):
+                return "Stale proof: the chain tip moved while mining!"
+            block = Block(
+                index=len(self.chain),
+                previous_hash=previous_hash,
+                proof=proof,
+                transactions=transactions,
+            )
+            # Contract calls run first: their receipts go into the block
+            with metrics.timer("contract_execution"):
+                self.contracts.execute_block(block)
+            block.state_root = self.state.apply_block(block)
+            deployed = self.finish_deploys(block)
+            self.chain.append(block)
+            self.index.add_block(block)
+            metrics.inc("blocks_mined_total")
+            metrics.inc("block_transactions_total", len(transactions))
+            # Keep whatever arrived while the proof was being searched
+            included = {id(tx) for tx in transactions}
+            self.current_transactions = [tx for tx in self.current_transactions if id(tx) not in included]
+            self.pending_debits = {}
+            for tx in self.current_transactions:
+                self.pending_debits[tx.sender] = self.pending_debits.get(tx.sender, 0) + tx.amount
+            for address in deployed:
+                self.notify("node", address)
+            self.notify("block", block)
+
+        self.issue(MINT, miner, MINING_REWARD)
         return f"Block {block.index} mined successfully by {miner}!"
 
+    def finish_deploys(self, block):
+        # Caller holds self.lock; a deployed contract's account holds the
+        # coins sent to it, so it becomes a node once its deploy succeeds
+        deployed = []
+        for tx in block.transactions:
+            if getattr(tx, "method", None) == DEPLOY:
+                self.deploying.discard(tx.contract)
+                if tx.receipt["status"] == "ok" and tx.contract not in self.nodes:
+                    self.nodes.add(tx.contract)
+                    deployed.append(tx.contract)
+        return deployed
+
+    def issue(self, issuer, receiver, amount):
+        # Coins that come from outside this chain's balances (mining rewards,
+        # proven cross-shard credits), so the debit is not checked against
+        # the issuer's balance. Never reachable from user input.
+        transaction = Transaction(issuer, receiver, amount)
+        with self.lock:
+            self.current_transactions.append(transaction)
+            self.notify("transaction", transaction)
+        return f"Transaction from {issuer} to {receiver} for {amount} added."
+
+    @metrics.timed("proof_of_work")
     def proof_of_work(self, last_block):
+        last_hash = last_block.hash()
         proof = 0
-        while not self.valid_proof(last_block.hash(), proof):
+        while not self.valid_proof(last_hash, proof):
             proof += 1
+        metrics.inc("pow_hashes_total", proof + 1)
         return proof
 
     def valid_proof(self, last_hash, proof):
@@ -87,107 +377,300 @@ class Blockchain:
         guess_hash = hashlib.sha256(guess).hexdigest()
         return guess_hash[:4] == "0000"
 
+    @metrics.timed("check_balance")
     def check_balance(self, node):
         if node not in self.nodes:
             return f"Node {node} is not registered!"
-        balance = 0
-        for block in self.chain:
-            for tx in block.transactions:
-                if tx.sender == node:
-                    balance -= tx.amount
-                if tx.receiver == node:
-                    balance += tx.amount
-        return balance
+        return self.state.balance(node)
+
+    def state_root(self):
+        return self.state.root()
+
+    def get_transaction(self, hash_value):
+        position = self.index.lookup(hash_value)
+        if position is None:
+            return None
+        height, offset = position
+        return {"block": height, "position": offset, **tx_record(self.chain[height].transactions[offset])}
+
+    def account_history(self, node, page=0, page_size=10):
+        history = []
+        for height, position in self.index.history(node, page, page_size):
+            tx = self.chain[height].transactions[position]
+            history.append({"block": height, "position": position, "hash": tx_hash(tx), **tx_record(tx)})
+        return history
+
+    def get_headers(self, start=0, count=500):
+        return [block.header() for block in self.chain[start:start + count]]
+
+    def prove_transaction(self, hash_value):
+        position = self.index.lookup(hash_value)
+        if position is None:
+            return None
+        height, offset = position
+        block = self.chain[height]
+        return {
+            "height": height,
+            "position": offset,
+            "transaction": tx_record(block.transactions[offset]),
+            "proof": merkle_proof(block.leaves(), offset),
+        }
 
+    def prove_account(self, node):
+        proofs = []
+        levels = {}
+        for height, offset in self.index.accounts.get(node, []):
+            block = self.chain[height]
+            if height not in levels:
+                levels[height] = merkle_levels(block.leaves())
+            proofs.append({
+                "height": height,
+                "position": offset,
+                "transaction": tx_record(block.transactions[offset]),
+                "proof": merkle_proof(None, offset, levels[height]),
+            })
+        return proofs
+
+    def save_index(self, path):
+        self.index.save(path)
+
+    def load_index(self, path):
+        self.index = ChainIndex.load(path, self.chain)
+
+    def rebuild_state(self):
+        self.state.rebuild(self.chain)
+        return self.state.root()
+
+    @metrics.timed("validate_chain")
     def validate_chain(self):
+        # Replays balances into a scratch tree to check every state_root, and
+        # re-runs every contract call against its stored receipt
+        state = AccountState(history=1)
+        contracts = ContractRuntime()
+        if self.chain[0].state_root != state.apply_block(self.chain[0]):
+            return False
         for i in range(1, len(self.chain)):
             current = self.chain[i]
             previous = self.chain[i - 1]
+            previous_hash = previous.hash()
 
-            if current.previous_hash != previous.hash():
+            if current.previous_hash != previous_hash:
                 return False
 
-            if not self.valid_proof(previous.hash(), current.proof):
+            if not self.valid_proof(previous_hash, current.proof):
                 return False
 
+            if not contracts.execute_block(current, check=True):
+                return False
+
+            if current.state_root != state.apply_block(current):
+                return False
+            metrics.inc("blocks_validated_total")
+
         return True
 
     def display_chain(self):
         return [block.to_dict() for block in self.chain]
 
 
-# Initialize Blockchain in Session State
-if "blockchain" not in st.session_state:
-    st.session_state.blockchain = Blockchain()
+# Only build the UI when run as a script (`streamlit run Blockchain.py`)
+if __name__ == "__main__":
+    # Imported here because Export itself imports this module
+    from Export import EXPORT_DIR, export_jsonl, export_parquet, export_path, iter_blocks
 
-blockchain = st.session_state.blockchain
+    # One ledger shared by every browser session; sessions read snapshots
+    @st.cache_resource
+    def get_engine():
+        # Transactions here carry no fee, so only the rate and size limits apply
+        return ChainEngine(Blockchain(admission=AdmissionControl(fee_step=0)))
 
-# Streamlit Interface
-st.title("Blockchain Interactive Visualizer")
+    engine = get_engine()
+    blockchain = engine.blockchain
 
-# Add Nodes
-st.subheader("Register Nodes")
-new_node = st.text_input("Enter Node Name (Unique)", key="new_node")
-if st.button("Register Node"):
-    if new_node:
-        result = blockchain.register_node(new_node)
-        st.success(result)
-    else:
-        st.error("Please enter a valid node name.")
-
-# Add Transactions
-st.subheader("Add Transactions")
-sender = st.text_input("Sender", key="sender")
-receiver = st.text_input("Receiver", key="receiver")
-amount = st.number_input("Amount", min_value=0.0, step=0.1, key="amount")
-if st.button("Add Transaction"):
-    if sender and receiver and amount > 0:
-        result = blockchain.create_transaction(sender, receiver, amount)
-        if "added" in result:
+    # Streamlit Interface
+    st.title("Blockchain Interactive Visualizer")
+
+    # Add Nodes
+    st.subheader("Register Nodes")
+    new_node = st.text_input("Enter Node Name (Unique)", key="new_node")
+    if st.button("Register Node"):
+        if new_node:
+            result = blockchain.register_node(new_node)
             st.success(result)
         else:
-            st.error(result)
-    else:
-        st.error("Please fill in all fields correctly.")
-
-# Mine Block
-st.subheader("Mine a Block")
-miner = st.text_input("Miner", key="miner")
-if st.button("Mine Block"):
-    if miner:
-        result = blockchain.mine_block(miner)
-        if "mined" in result:
-            st.success(result)
+            st.error("Please enter a valid node name.")
+
+    # Add Transactions
+    st.subheader("Add Transactions")
+    sender = st.text_input("Sender", key="sender")
+    receiver = st.text_input("Receiver", key="receiver")
+    amount = st.number_input("Amount", min_value=0.0, step=0.1, key="amount")
+    if st.button("Add Transaction"):
+        if sender and receiver and amount > 0:
+            result = blockchain.create_transaction(sender, receiver, amount)
+            if "added" in result:
+                st.success(result)
+            else:
+                st.error(result)
         else:
-            st.error(result)
-    else:
-        st.error("Please specify a miner.")
-
-# Display Blockchain
-st.subheader("Blockchain")
-if st.button("Show Blockchain"):
-    chain = blockchain.display_chain()
-    for block in chain:
-        st.json(block)
-
-# Check Balance
-st.subheader("Check Balance")
-balance_node = st.text_input("Node to Check Balance", key="balance_node")
-if st.button("Check Balance"):
-    if balance_node:
-        balance = blockchain.check_balance(balance_node)
-        if isinstance(balance, str):
-            st.error(balance)
+            st.error("Please fill in all fields correctly.")
+
+    # Batch Payment: one sender, one transaction, many receivers
+    st.subheader("Batch Payment")
+    batch_sender = st.text_input("Sender", key="batch_sender")
+    batch_lines = st.text_area("Outputs (one 'receiver, amount' per line)", key="batch_outputs")
+    if st.button("Add Batch Payment"):
+        try:
+            outputs = [
+                (receiver.strip(), float(amount))
+                for receiver, amount in (line.rsplit(",", 1) for line in batch_lines.splitlines() if line.strip())
+            ]
+        except ValueError:
+            st.error("Each line must look like 'receiver, amount'.")
         else:
-            st.info(f"Balance of {balance_node}: {balance}")
-    else:
-        st.error("Please enter a valid node name.")
-
-# Validate Blockchain
-st.subheader("Validate Blockchain")
-if st.button("Validate Blockchain"):
-    is_valid = blockchain.validate_chain()
-    if is_valid:
-        st.success("Blockchain is valid!")
+            result = blockchain.create_batch_transaction(batch_sender, outputs)
+            if "added" in result:
+                st.success(result)
+            else:
+                st.error(result)
+
+    # Contracts: Python ports of the bundled .sol contracts, run as transactions
+    st.subheader("Contracts")
+    contract_sender = st.text_input("Caller", key="contract_sender")
+    contract_address = st.text_input("Contract Address", key="contract_address")
+    contract_kind = st.selectbox("Contract Kind", list(CONTRACTS), key="contract_kind")
+    contract_method = st.text_input("Method (or view)", key="contract_method")
+    contract_args = st.text_input("Arguments (JSON list)", value="[]", key="contract_args")
+    contract_value = st.number_input("Value", min_value=0.0, step=1.0, key="contract_value")
+    contract_gas = st.number_input("Gas Limit", min_value=1, max_value=10 * DEFAULT_GAS_LIMIT, value=DEFAULT_GAS_LIMIT, step=10000, key="contract_gas")
+    try:
+        call_args = json.loads(contract_args or "[]")
+    except ValueError:
+        call_args = None
+    if call_args is None or not isinstance(call_args, list):
+        st.error("Arguments must be a JSON list.")
     else:
-        st.error("Blockchain is invalid!")
+        deploy_column, call_column, query_column = st.columns(3)
+        if deploy_column.button("Deploy"):
+            result = engine.deploy_contract(contract_sender, contract_address, contract_kind, call_args)
+            (st.success if "added" in result else st.error)(result)
+        if call_column.button("Call"):
+            result = engine.call_contract(contract_sender, contract_address, contract_method, call_args, contract_value, int(contract_gas))
+            (st.success if "added" in result else st.error)(result)
+        if query_column.button("Query View"):
+            try:
+                st.json(blockchain.contracts.query(contract_address, contract_method, *call_args, sender=contract_sender))
+            except (KeyError, TypeError) as error:
+                st.error(str(error))
+    if blockchain.contracts.contracts:
+        st.table(blockchain.contracts.display_contracts())
+
+    # Mine Block
+    st.subheader("Mine a Block")
+    miner = st.text_input("Miner", key="miner")
+    if st.button("Mine Block"):
+        if miner:
+            result = engine.start_mining(miner)
+            if "started" in result:
+                st.info(result)
+            else:
+                st.error(result)
+        else:
+            st.error("Please specify a miner.")
+    worker = engine.worker
+    if worker:
+        progress = worker.progress
+        st.write(
+            f"Mining status: {progress['state']} | block {progress['height']} | "
+            f"{progress['nonces']} nonces in {progress['elapsed']:.1f}s "
+            f"({progress['rate']:.0f} nonces/s) | restarts: {progress['restarts']}"
+        )
+        if progress["last_result"]:
+            st.success(progress["last_result"])
+        if worker.is_alive() and st.button("Stop Mining"):
+            worker.stop()
+        st.button("Refresh Mining Status")
+
+    # Display Blockchain
+    st.subheader("Blockchain")
+    if st.button("Show Blockchain"):
+        for block in iter_blocks(engine.snapshot.chain):
+            st.json(block)
+
+    # Export Blockchain
+    st.subheader("Export Blockchain")
+    export_name = st.text_input(f"Export File Name in {EXPORT_DIR} (.jsonl, .jsonl.gz or .parquet)", key="export_name")
+    if st.button("Export Chain"):
+        target = export_path(export_name)
+        if target is None:
+            st.error("Enter a file name (letters, digits, - and _) ending in .jsonl, .jsonl.gz or .parquet.")
+        elif target.endswith(".parquet"):
+            try:
+                count = export_parquet(engine.snapshot.chain, target, target[:-len(".parquet")] + "_transactions.parquet")
+                st.success(f"Exported {count} blocks to {target}.")
+            except RuntimeError as error:
+                st.error(str(error))
+        else:
+            count = export_jsonl(blockchain, target)
+            st.success(f"Exported {count} blocks to {target}.")
+
+    # Check Balance
+    st.subheader("Check Balance")
+    balance_node = st.text_input("Node to Check Balance", key="balance_node")
+    if st.button("Check Balance"):
+        if balance_node:
+            balance = engine.snapshot.check_balance(balance_node)
+            if isinstance(balance, str):
+                st.error(balance)
+            else:
+                st.info(f"Balance of {balance_node}: {balance}")
+        else:
+            st.error("Please enter a valid node name.")
+
+    # Transaction Explorer
+    st.subheader("Transaction Explorer")
+    lookup_hash = st.text_input("Transaction Hash", key="lookup_hash")
+    if st.button("Find Transaction"):
+        result = blockchain.get_transaction(lookup_hash)
+        if result:
+            st.json(result)
+        else:
+            st.error("Transaction not found in the chain.")
+
+    history_node = st.text_input("Node History", key="history_node")
+    history_page = st.number_input("Page", min_value=0, step=1, key="history_page")
+    if st.button("Show History"):
+        history = blockchain.account_history(history_node, int(history_page))
+        if history:
+            st.table(history)
+        else:
+            st.info("No transactions on this page.")
+
+    # Validate Blockchain
+    st.subheader("Validate Blockchain")
+    if st.button("Validate Blockchain"):
+        is_valid = blockchain.validate_chain()
+        if is_valid:
+            st.success("Blockchain is valid!")
+        else:
+            st.error("Blockchain is invalid!")
+
+    # Diagnostics
+    st.subheader("Diagnostics")
+    if st.button("Profile One Mining Run"):
+        if miner in blockchain.nodes:
+            # Pause the background worker so the profiled run is the only
+            # miner (and profiles only mining), then let it carry on
+            worker = engine.worker
+            paused = worker is not None and worker.is_alive()
+            if paused:
+                worker.stop(wait=True)
+            result, stats = profile_call(blockchain.mine_block, miner)
+            if paused:
+                worker.start()
+            st.success(result)
+            st.code(stats, language="text")
+        else:
+            st.error("Enter a registered miner above to profile mining.")
+    if st.checkbox("Show Metrics", key="show_metrics"):
+        render_panel(st)
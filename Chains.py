@@ -0,0 +1,96 @@
+class PersistentChain:
+    """Immutable chain of blocks that shares its prefix with every chain it
+    was extended from.
+
+    `append` returns a new chain in O(1) and never changes the receiver, so
+    many nodes can hold chains with a common history while storing it once.
+    Supports len(), iteration, chain[i] (O(log n) via skip pointers, O(1)
+    for the tip) and slicing, which is all Blockchain needs from a list.
+    Skip pointers follow Myers' deterministic skip list: each one is built
+    from the parent's in O(1) and any ancestor is O(log n) hops away.
+    """
+
+    __slots__ = ("block", "parent", "skip", "length")
+
+    def __init__(self, block=None, parent=None):
+        self.block = block
+        self.parent = parent
+        self.length = 0 if block is None else (parent.length if parent else 0) + 1
+        self.skip = parent
+        if parent is not None:
+            jump = parent.skip
+            # Two equal jumps in a row merge into one twice as long
+            if jump is not None and jump.skip is not None and parent.length - jump.length == jump.length - jump.skip.length:
+                self.skip = jump.skip
+
+    def append(self, block):
+        return PersistentChain(block, self if self.length else None)
+
+    def __len__(self):
+        return self.length
+
+    def ancestor(self, height):
+        # Node whose tip sits at `height` (0-based)
+        if height < 0 or height >= self.length:
+            raise IndexError("chain index out of range")
+        node = self
+        while node.length - 1 > height:
+            if node.skip is not None and node.skip.length - 1 >= height:
+                node = node.skip
+            else:
+                node = node.parent
+        return node
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.length)
+            if step != 1:
+                return list(self)[key]
+            if start >= stop:
+                return []
+            blocks = []
+            node = self.ancestor(stop - 1)
+            for _ in range(stop - start):
+                blocks.append(node.block)
+                node = node.parent
+            blocks.reverse()
+            return blocks
+        if key < 0:
+            key += self.length
+        if key == self.length - 1:
+            return self.block
+        return self.ancestor(key).block
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __reversed__(self):
+        node = self if self.length else None
+        while node is not None:
+            yield node.block
+            node = node.parent
+
+    def __bool__(self):
+        return self.length > 0
+
+    def common_ancestor(self, other):
+        # Length of the shared prefix, found by node identity
+        a, b = self, other
+        if not a.length or not b.length:
+            return 0
+        if a.length > b.length:
+            a = a.ancestor(b.length - 1)
+        elif b.length > a.length:
+            b = b.ancestor(a.length - 1)
+        while a is not b:
+            if a.parent is None or b.parent is None:
+                return 0
+            a, b = a.parent, b.parent
+        return a.length
+
+    @classmethod
+    def from_blocks(cls, blocks):
+        chain = cls()
+        for block in blocks:
+            chain = chain.append(block)
+        return chain
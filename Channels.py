@@ -0,0 +1,215 @@
+import secrets
+
+from Keys import KeyRing
+
+OPEN, CLOSING, CLOSED = "open", "closing", "closed"
+
+
+class ChannelState:
+    """One balance split of a channel, signed by both parties."""
+
+    __slots__ = ("channel_id", "nonce", "balance_a", "balance_b", "signatures")
+
+    def __init__(self, channel_id, nonce, balance_a, balance_b, signatures=None):
+        self.channel_id = channel_id
+        self.nonce = nonce
+        self.balance_a = balance_a
+        self.balance_b = balance_b
+        self.signatures = signatures or {}
+
+    def message(self):
+        return f"{self.channel_id}|{self.nonce}|{self.balance_a!r}|{self.balance_b!r}".encode()
+
+    def to_dict(self):
+        return {
+            "channel_id": self.channel_id,
+            "nonce": self.nonce,
+            "balance_a": self.balance_a,
+            "balance_b": self.balance_b,
+        }
+
+
+class PaymentChannel:
+    def __init__(self, channel_id, party_a, party_b, deposit_a, deposit_b, escrow):
+        self.id = channel_id
+        self.party_a = party_a
+        self.party_b = party_b
+        self.capacity = deposit_a + deposit_b
+        self.escrow = escrow
+        self.status = OPEN
+        self.latest = None
+        self.submitted = None  # State a party closed with, while closing
+        self.close_deadline = None
+        self.payments = 0
+        self.paid_out = set()  # Parties already paid, if a settlement was cut short
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "party_a": self.party_a,
+            "party_b": self.party_b,
+            "capacity": self.capacity,
+            "status": self.status,
+            "nonce": self.latest.nonce,
+            "balance_a": self.latest.balance_a,
+            "balance_b": self.latest.balance_b,
+            "payments": self.payments,
+            "close_deadline": self.close_deadline,
+        }
+
+
+class ChannelManager:
+    # Deposits go on-chain to an escrow, payments are co-signed states off-chain
+
+    def __init__(self, blockchain, dispute_period=5):
+        self.blockchain = blockchain
+        self.dispute_period = dispute_period  # blocks the other party has to answer a lone close
+        self.keys = KeyRing()
+        self.channels = {}
+
+    def sign(self, node, state):
+        state.signatures[node] = self.keys.sign(node, state.message())
+
+    def verify(self, channel, state):
+        if state.channel_id != channel.id:
+            return False
+        if state.balance_a < 0 or state.balance_b < 0:
+            return False
+        if abs(state.balance_a + state.balance_b - channel.capacity) > 1e-9 * max(channel.capacity, 1):
+            return False
+        message = state.message()
+        for node in (channel.party_a, channel.party_b):
+            if not self.keys.verify(node, message, state.signatures.get(node, b"")):
+                return False
+        return True
+
+    def height(self):
+        return len(self.blockchain.chain) - 1
+
+    def spendable(self, node):
+        # Balance left after the node's pending transactions
+        if hasattr(self.blockchain, "spendable"):
+            return self.blockchain.spendable(node)
+        return self.blockchain.participants.get(node, 0)
+
+    def open_channel(self, party_a, party_b, deposit_a, deposit_b=0):
+        if party_a == party_b:
+            return "A channel needs two different parties!"
+        if deposit_a < 0 or deposit_b < 0 or deposit_a + deposit_b <= 0:
+            return "Deposits must be positive!"
+        # Both deposits are checked before either is submitted: a deposit
+        # already in the mempool cannot be refunded from an escrow whose
+        # funding is not confirmed yet
+        for party, deposit in ((party_a, deposit_a), (party_b, deposit_b)):
+            if party not in self.blockchain.nodes:
+                return f"{party} is not a registered node!"
+            if deposit and self.spendable(party) < deposit:
+                return f"{party} has insufficient balance for the deposit!"
+        channel_id = secrets.token_hex(8)
+        escrow = f"channel:{channel_id}"
+        self.blockchain.register_node(escrow)
+        if deposit_a:
+            result = self.blockchain.create_transaction(party_a, escrow, deposit_a)
+            if "added" not in result:
+                return result
+        refused = None
+        if deposit_b:
+            result = self.blockchain.create_transaction(party_b, escrow, deposit_b)
+            if "added" not in result:
+                if not deposit_a:
+                    return result
+                # A's deposit is already locked: open on it alone, so A can
+                # close the channel and get it back
+                refused, deposit_b = result, 0
+        channel = PaymentChannel(channel_id, party_a, party_b, deposit_a, deposit_b, escrow)
+        channel.latest = ChannelState(channel_id, 0, deposit_a, deposit_b)
+        self.sign(party_a, channel.latest)
+        self.sign(party_b, channel.latest)
+        self.channels[channel_id] = channel
+        if refused:
+            return f"Channel {channel_id} opened between {party_a} and {party_b} on {party_a}'s deposit only ({refused})"
+        return f"Channel {channel_id} opened between {party_a} and {party_b}."
+
+    def pay(self, channel_id, payer, amount):
+        # Off-chain: a new state co-signed by both parties, nothing on-chain
+        channel = self.channels.get(channel_id)
+        if channel is None or channel.status != OPEN:
+            return "Channel is not open!"
+        latest = channel.latest
+        if payer == channel.party_a:
+            balance_a, balance_b = latest.balance_a - amount, latest.balance_b + amount
+        elif payer == channel.party_b:
+            balance_a, balance_b = latest.balance_a + amount, latest.balance_b - amount
+        else:
+            return "Payer is not a party of this channel!"
+        if amount <= 0 or balance_a < 0 or balance_b < 0:
+            return "Insufficient channel balance!"
+        state = ChannelState(channel_id, latest.nonce + 1, balance_a, balance_b)
+        self.sign(channel.party_a, state)
+        self.sign(channel.party_b, state)
+        channel.latest = state
+        channel.payments += 1
+        return f"Paid {amount} in channel {channel_id}."
+
+    def settle(self, channel, state):
+        payouts = [(party, payout) for party, payout in ((channel.party_a, state.balance_a), (channel.party_b, state.balance_b)) if payout]
+        # The channel stays as it is when the payout is refused (e.g. its
+        # funding is still pending), so the close can be retried
+        if hasattr(self.blockchain, "create_batch_transaction"):
+            # Both payouts leave the escrow in one transaction
+            result = self.blockchain.create_batch_transaction(channel.escrow, payouts)
+            if "added" not in result:
+                return result
+        else:
+            payouts = [(party, payout) for party, payout in payouts if party not in channel.paid_out]
+            if self.spendable(channel.escrow) < sum(payout for _, payout in payouts):
+                return f"Escrow {channel.escrow} cannot cover the payout yet!"
+            for party, payout in payouts:
+                result = self.blockchain.create_transaction(channel.escrow, party, payout)
+                if "added" not in result:
+                    return result
+                channel.paid_out.add(party)
+        channel.latest = state
+        channel.status = CLOSED
+        return f"Channel {channel.id} settled: {channel.party_a} {state.balance_a}, {channel.party_b} {state.balance_b}."
+
+    def close(self, channel_id):
+        # Cooperative close on the latest co-signed state
+        channel = self.channels.get(channel_id)
+        if channel is None or channel.status == CLOSED:
+            return "Channel is not open!"
+        return self.settle(channel, channel.latest)
+
+    def start_close(self, channel_id, party, state):
+        # Unilateral close with whatever signed state `party` submits
+        channel = self.channels.get(channel_id)
+        if channel is None or channel.status != OPEN:
+            return "Channel is not open!"
+        if party not in (channel.party_a, channel.party_b) or not self.verify(channel, state):
+            return "Invalid channel state!"
+        channel.status = CLOSING
+        channel.submitted = state
+        channel.close_deadline = self.height() + self.dispute_period
+        return f"Channel {channel_id} closing at block {channel.close_deadline} unless disputed."
+
+    def dispute(self, channel_id, state):
+        channel = self.channels.get(channel_id)
+        if channel is None or channel.status != CLOSING:
+            return "Channel is not closing!"
+        if self.height() >= channel.close_deadline:
+            return "Dispute period is over!"
+        if not self.verify(channel, state) or state.nonce <= channel.submitted.nonce:
+            return "Dispute needs a newer signed state!"
+        channel.submitted = state
+        return f"Channel {channel_id} will settle on state {state.nonce}."
+
+    def finalize(self, channel_id):
+        channel = self.channels.get(channel_id)
+        if channel is None or channel.status != CLOSING:
+            return "Channel is not closing!"
+        if self.height() < channel.close_deadline:
+            return f"Dispute period ends at block {channel.close_deadline}."
+        return self.settle(channel, channel.submitted)
+
+    def display_channels(self):
+        return [channel.to_dict() for channel in self.channels.values()]
@@ -0,0 +1,549 @@
+import argparse
+import json
+import random
+from time import perf_counter
+
+from Metrics import metrics
+
+DEPLOY = "constructor"
+DEFAULT_GAS_LIMIT = 200000
+
+# Gas schedule, after the EVM's
+GAS_CALL = 21000
+GAS_DEPLOY = 32000
+GAS_ARG_BYTE = 16
+GAS_SLOAD = 2100
+GAS_SSTORE_SET = 20000
+GAS_SSTORE_UPDATE = 5000
+GAS_LOG = 375
+GAS_TRANSFER = 2300
+
+BALANCE = ("balance",)  # storage slot holding the contract's coins
+MISSING = object()
+
+
+class Revert(Exception):
+    pass
+
+
+class OutOfGas(Revert):
+    pass
+
+
+def require(condition, message):
+    if not condition:
+        raise Revert(message)
+
+
+class Call:
+    """Execution context of one contract call: msg.sender, msg.value,
+    block.timestamp, and metered access to the contract's storage.
+
+    Writes land in `overlay`, shared by every call of the batch, and are
+    journaled so a revert undoes exactly this call's writes.
+    """
+
+    __slots__ = ("address", "sender", "value", "timestamp", "gas_limit", "gas_used",
+                 "storage", "overlay", "journal", "events", "payouts")
+
+    def __init__(self, address, sender, value, timestamp, gas_limit, storage, overlay):
+        self.address = address
+        self.sender = sender
+        self.value = value
+        self.timestamp = timestamp
+        self.gas_limit = gas_limit
+        self.gas_used = 0
+        self.storage = storage
+        self.overlay = overlay
+        self.journal = []  # (key, overlay value before this call's write)
+        self.events = []
+        self.payouts = []  # [payer, receiver, amount] paid out of the contract
+
+    def charge(self, gas):
+        self.gas_used += gas
+        if self.gas_used > self.gas_limit:
+            raise OutOfGas("Out of gas")
+
+    def get(self, key, default):
+        value = self.overlay.get(key, MISSING)
+        if value is MISSING:
+            value = self.storage.get(key, default)
+        return value
+
+    def set(self, key, value):
+        self.journal.append((key, self.overlay.get(key, MISSING)))
+        self.overlay[key] = value
+
+    def load(self, key, default=0):
+        self.charge(GAS_SLOAD)
+        return self.get(key, default)
+
+    def store(self, key, value):
+        exists = key in self.overlay or key in self.storage
+        self.charge(GAS_SSTORE_UPDATE if exists else GAS_SSTORE_SET)
+        self.set(key, value)
+
+    def emit(self, event, **fields):
+        self.charge(GAS_LOG)
+        self.events.append([event, fields])
+
+    def transfer(self, receiver, amount):
+        # payable(receiver).transfer(amount)
+        self.charge(GAS_TRANSFER)
+        balance = self.get(BALANCE, 0)
+        require(amount <= balance, "Contract balance too low for transfer")
+        self.set(BALANCE, balance - amount)
+        self.payouts.append([self.address, receiver, amount])
+
+    def revert(self):
+        for key, previous in reversed(self.journal):
+            if previous is MISSING:
+                del self.overlay[key]
+            else:
+                self.overlay[key] = previous
+
+
+class Contract:
+    """Python port of a Solidity contract.
+
+    Methods take the Call first, then the call's arguments, and reach
+    storage only through call.load/call.store so every access is metered.
+    `methods` may be sent as transactions (`payable` ones may carry coins);
+    `views` are read-only and answered by ContractRuntime.query.
+    """
+
+    methods = ()
+    payable = ()
+    views = ()
+
+    def __init__(self, address):
+        self.address = address
+        self.storage = {}
+
+    @property
+    def balance(self):
+        return self.storage.get(BALANCE, 0)
+
+    def constructor(self, call):
+        pass
+
+
+class Voting(Contract):
+    methods = ("addCandidate", "vote")
+    views = ("getCandidates",)
+
+    def constructor(self, call):
+        call.store("owner", call.sender)
+
+    def addCandidate(self, call, name):
+        require(call.sender == call.load("owner", None), "Only the owner can add candidates")
+        count = call.load("count")
+        call.store(("name", count), str(name))
+        call.store(("votes", count), 0)
+        call.store("count", count + 1)
+
+    def vote(self, call, candidate_index):
+        require(not call.load(("voted", call.sender), False), "You have already voted")
+        require(0 <= candidate_index < call.load("count"), "Invalid candidate")
+        call.store(("voted", call.sender), True)
+        call.store(("votes", candidate_index), call.load(("votes", candidate_index)) + 1)
+
+    def getCandidates(self, call):
+        return [
+            {"name": call.load(("name", i)), "voteCount": call.load(("votes", i))}
+            for i in range(call.load("count"))
+        ]
+
+
+class AuctionPlatform(Contract):
+    methods = ("startAuction", "placeBid", "withdraw", "endAuction")
+    payable = ("placeBid",)
+    views = ("getAuctionDetails",)
+
+    def startAuction(self, call, item_name, starting_price, duration_in_minutes):
+        require(call.load("endTime") == 0 or call.load("ended", False), "An auction is already ongoing")
+        call.store("owner", call.sender)
+        call.store("item", str(item_name))
+        call.store("startingPrice", starting_price)
+        call.store("highestBid", 0)
+        call.store("highestBidder", None)
+        call.store("endTime", call.timestamp + duration_in_minutes * 60)
+        call.store("ended", False)
+        call.emit("AuctionStarted", itemName=item_name, startingPrice=starting_price, endTime=call.load("endTime"))
+
+    def placeBid(self, call):
+        require(call.timestamp < call.load("endTime"), "Auction has ended")
+        highest_bid = call.load("highestBid")
+        require(call.value > highest_bid, "Your bid must be higher than the current highest bid")
+        require(call.value >= call.load("startingPrice"), "Your bid must be at least the starting price")
+        highest_bidder = call.load("highestBidder", None)
+        if highest_bidder is not None:
+            # Refund the previous highest bidder
+            call.store(("pendingReturns", highest_bidder), call.load(("pendingReturns", highest_bidder)) + highest_bid)
+        call.store("highestBid", call.value)
+        call.store("highestBidder", call.sender)
+        call.emit("NewHighestBid", bidder=call.sender, bidAmount=call.value)
+
+    def withdraw(self, call):
+        amount = call.load(("pendingReturns", call.sender))
+        require(amount > 0, "No funds to withdraw")
+        call.store(("pendingReturns", call.sender), 0)
+        call.transfer(call.sender, amount)
+
+    def endAuction(self, call):
+        require(call.sender == call.load("owner", None), "Only the auction owner can call this")
+        require(call.timestamp >= call.load("endTime"), "Auction is still ongoing")
+        require(not call.load("ended", False), "Auction has already been ended")
+        call.store("ended", True)
+        highest_bid = call.load("highestBid")
+        call.emit("AuctionEnded", winner=call.load("highestBidder", None), amount=highest_bid)
+        if highest_bid > 0:
+            call.transfer(call.sender, highest_bid)
+
+    def getAuctionDetails(self, call):
+        return [
+            call.load("item", ""),
+            call.load("startingPrice"),
+            call.load("highestBid"),
+            call.load("highestBidder", None),
+            call.load("endTime"),
+        ]
+
+
+class BankingSystem(Contract):
+    methods = ("deposit", "withdraw")
+    payable = ("deposit",)
+    views = ("checkBalance",)
+
+    def deposit(self, call):
+        require(call.value > 0, "Deposit amount must be greater than zero")
+        call.store(("balances", call.sender), call.load(("balances", call.sender)) + call.value)
+
+    def withdraw(self, call, amount):
+        require(amount > 0, "Withdrawal amount must be greater than zero")
+        balance = call.load(("balances", call.sender))
+        require(balance >= amount, "Insufficient balance")
+        call.store(("balances", call.sender), balance - amount)
+        call.transfer(call.sender, amount)
+        call.emit("Withdrawal", user=call.sender, amount=amount)
+
+    def checkBalance(self, call):
+        return call.load(("balances", call.sender))
+
+
+class LandRegistry(Contract):
+    methods = ("registerLand", "claimOwnership")
+    views = ("getLand",)
+
+    def registerLand(self, call, land_id, location, price):
+        require(call.load(("land", land_id), None) is None, "Land ID already exists")
+        call.store("landCount", call.load("landCount") + 1)
+        call.store(("land", land_id), [land_id, str(location), price, call.sender])
+        call.emit("LandRegistered", id=land_id, location=location, price=price, owner=call.sender)
+
+    def claimOwnership(self, call, land_id):
+        land = call.load(("land", land_id), None)
+        require(land is not None, "Land does not exist")
+        require(land[3] != call.sender, "You already own this land")
+        previous_owner = land[3]
+        require(previous_owner is not None, "Land has no current owner")
+        call.store(("land", land_id), land[:3] + [call.sender])
+        call.emit("OwnershipTransferred", id=land_id, previousOwner=previous_owner, newOwner=call.sender)
+
+    def getLand(self, call, land_id):
+        land = call.load(("land", land_id), None)
+        require(land is not None, "Land does not exist")
+        return land
+
+
+class CrowdfundingPlatform(Contract):
+    methods = ("startCampaign", "contribute", "withdrawFunds")
+    payable = ("contribute",)
+    views = ("getCampaignDetails",)
+
+    def startCampaign(self, call, name, goal, duration_in_days):
+        require(goal > 0, "Funding goal must be greater than 0")
+        require(duration_in_days > 0, "Duration must be at least 1 day")
+        campaign_id = call.load("campaignCount") + 1
+        call.store("campaignCount", campaign_id)
+        call.store(("campaign", campaign_id), {
+            "name": str(name),
+            "goal": goal,
+            "deadline": call.timestamp + duration_in_days * 86400,
+            "creator": call.sender,
+            "totalContributions": 0,
+            "withdrawn": False,
+        })
+        return campaign_id
+
+    def contribute(self, call, campaign_id):
+        require(call.value > 0, "Contribution amount must be greater than 0")
+        campaign = call.load(("campaign", campaign_id), None)
+        require(campaign is not None and call.timestamp < campaign["deadline"], "The campaign deadline has passed")
+        call.store(("campaign", campaign_id), {**campaign, "totalContributions": campaign["totalContributions"] + call.value})
+
+    def withdrawFunds(self, call, campaign_id):
+        campaign = call.load(("campaign", campaign_id), None)
+        require(campaign is not None and call.sender == campaign["creator"], "Only the campaign creator can withdraw funds")
+        require(call.timestamp >= campaign["deadline"], "Cannot withdraw before the deadline")
+        require(campaign["totalContributions"] >= campaign["goal"], "Funding goal has not been met")
+        require(not campaign["withdrawn"], "Funds have already been withdrawn")
+        call.store(("campaign", campaign_id), {**campaign, "withdrawn": True})
+        call.transfer(campaign["creator"], campaign["totalContributions"])
+
+    def getCampaignDetails(self, call, campaign_id):
+        return call.load(("campaign", campaign_id), None)
+
+
+class RentalAgreementManagement(Contract):
+    methods = ("createAgreement", "payRent", "terminateAgreement")
+    payable = ("payRent",)
+    views = ("getAgreementDetails",)
+
+    def createAgreement(self, call, tenant, rent_amount):
+        require(tenant, "Invalid tenant address")
+        require(rent_amount > 0, "Rent amount must be greater than 0")
+        agreement_id = call.load("agreementCounter") + 1
+        call.store("agreementCounter", agreement_id)
+        call.store(("agreement", agreement_id), [agreement_id, call.sender, tenant, rent_amount, True])
+        call.emit("AgreementCreated", id=agreement_id, landlord=call.sender, tenant=tenant, rentAmount=rent_amount)
+
+    def payRent(self, call, agreement_id):
+        agreement = call.load(("agreement", agreement_id), None)
+        require(agreement is not None and agreement[2] == call.sender, "Only tenant can perform this action")
+        require(agreement[4], "Agreement is not active")
+        require(call.value >= agreement[3], "Insufficient rent amount")
+        call.store(("rentPayments", agreement_id), call.load(("rentPayments", agreement_id)) + call.value)
+        call.emit("RentPaid", id=agreement_id, tenant=call.sender, amount=call.value)
+
+    def terminateAgreement(self, call, agreement_id):
+        agreement = call.load(("agreement", agreement_id), None)
+        require(agreement is not None and agreement[1] == call.sender, "Only landlord can perform this action")
+        require(agreement[4], "Agreement is already terminated")
+        call.store(("agreement", agreement_id), agreement[:4] + [False])
+        call.emit("AgreementTerminated", id=agreement_id, landlord=call.sender)
+
+    def getAgreementDetails(self, call, agreement_id):
+        return call.load(("agreement", agreement_id), None)
+
+
+class Calculator(Contract):
+    views = ("add", "subtract", "multiply", "divide", "modulo", "square")
+
+    def add(self, call, a, b):
+        return a + b
+
+    def subtract(self, call, a, b):
+        require(a >= b, "Subtraction overflow")
+        return a - b
+
+    def multiply(self, call, a, b):
+        return a * b
+
+    def divide(self, call, a, b):
+        require(b != 0, "Division by zero")
+        return a // b
+
+    def modulo(self, call, a, b):
+        require(b != 0, "Modulo by zero")
+        return a % b
+
+    def square(self, call, a):
+        return a * a
+
+
+# Deployable contract kinds, named after the .sol files they port
+CONTRACTS = {
+    "Voting": Voting,
+    "Auction": AuctionPlatform,
+    "Bank": BankingSystem,
+    "Land": LandRegistry,
+    "Contribution": CrowdfundingPlatform,
+    "Rental": RentalAgreementManagement,
+    "Calculator": Calculator,
+}
+
+
+class ContractRuntime:
+    """Deployed contracts and their storage.
+
+    execute_block() groups a block's contract calls by contract and runs
+    each group in one pass: the contract and its method table are looked
+    up once, every call writes to one shared overlay (a reverted call
+    undoes only its own journaled writes), and the overlay is merged into
+    storage once at the end. Contracts never call each other, so calls to
+    different contracts commute and only the order within a contract
+    matters.
+
+    Each call gets a receipt: status, gas used, result or error, events,
+    and the coins the contract paid out. A reverted call pays its value
+    back to the sender.
+    """
+
+    def __init__(self):
+        self.contracts = {}  # address -> Contract
+
+    def __contains__(self, address):
+        return address in self.contracts
+
+    def execute_block(self, block, check=False):
+        """Run the block's contract calls and fill in their receipts; with
+        `check`, re-run them and return False if any stored receipt differs."""
+        groups = {}
+        for tx in block.transactions:
+            address = getattr(tx, "contract", None)
+            if address is not None:
+                groups.setdefault(address, []).append(tx)
+        for address, calls in groups.items():
+            receipts = self.run_batch(address, calls, block.timestamp)
+            for tx, receipt in zip(calls, receipts):
+                if check and tx.receipt != receipt:
+                    return False
+                tx.receipt = receipt
+        return True
+
+    def run_batch(self, address, calls, timestamp):
+        contract = self.contracts.get(address)
+        storage = contract.storage if contract else {}
+        overlay = {}
+        receipts = []
+        gas_used = reverts = 0
+        for tx in calls:
+            call = Call(address, tx.sender, tx.amount, timestamp, tx.gas_limit, storage, overlay)
+            deployed = None
+            try:
+                call.charge(GAS_CALL + GAS_ARG_BYTE * len(json.dumps(tx.args)))
+                if tx.amount:
+                    call.set(BALANCE, call.get(BALANCE, 0) + tx.amount)
+                if tx.method == DEPLOY:
+                    require(contract is None, "A contract is already deployed at this address")
+                    require(tx.args and tx.args[0] in CONTRACTS, "Unknown contract kind")
+                    require(not tx.amount, "Constructor is not payable")
+                    call.charge(GAS_DEPLOY)
+                    deployed = CONTRACTS[tx.args[0]](address)
+                    deployed.storage = storage
+                    result = deployed.constructor(call, *tx.args[1:])
+                else:
+                    require(contract is not None, "No contract at this address")
+                    require(tx.method in contract.methods, f"Unknown method {tx.method}")
+                    require(not tx.amount or tx.method in contract.payable, f"{tx.method} is not payable")
+                    result = getattr(contract, tx.method)(call, *tx.args)
+            except OutOfGas as e:
+                call.gas_used = call.gas_limit
+                receipts.append(self.reverted(call, tx, str(e)))
+            except (Revert, TypeError, ValueError, KeyError) as e:
+                # Bad arguments revert like a failed require
+                receipts.append(self.reverted(call, tx, str(e)))
+            else:
+                if deployed is not None:
+                    contract = deployed
+                receipt = {"status": "ok", "gas_used": call.gas_used, "result": result, "events": call.events}
+                receipt["payouts"] = call.payouts
+                receipts.append(receipt)
+            if receipts[-1]["status"] != "ok":
+                reverts += 1
+            gas_used += call.gas_used
+        if contract is not None:
+            contract.storage.update(overlay)
+            self.contracts[address] = contract
+        metrics.inc("contract_calls_total", len(calls))
+        metrics.inc("contract_reverts_total", reverts)
+        metrics.inc("contract_gas_used_total", gas_used)
+        return receipts
+
+    def reverted(self, call, tx, error):
+        call.revert()
+        # The call's value goes back; nothing else it did survives
+        payouts = [[call.address, tx.sender, tx.amount]] if tx.amount else []
+        return {"status": "reverted", "gas_used": call.gas_used, "error": error, "events": [], "payouts": payouts}
+
+    def query(self, address, method, *args, sender=None):
+        # Read-only call to a view; runs unmetered and never writes
+        contract = self.contracts.get(address)
+        if contract is None:
+            raise KeyError(f"No contract at {address}")
+        if method not in contract.views:
+            raise KeyError(f"{method} is not a view of {address}")
+        call = Call(address, sender, 0, None, float("inf"), contract.storage, {})
+        return getattr(contract, method)(call, *args)
+
+    def rebuild(self, chain):
+        self.contracts = {}
+        for block in chain:
+            self.execute_block(block)
+
+    def display_contracts(self):
+        return [
+            {"address": address, "kind": type(contract).__name__, "balance": contract.balance,
+             "storage_slots": len(contract.storage)}
+            for address, contract in self.contracts.items()
+        ]
+
+
+if __name__ == "__main__":
+    from Blockchain import MINT, Blockchain
+
+    parser = argparse.ArgumentParser(description="Benchmark contract calls mined into Mycoin blocks")
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--accounts", type=int, default=2000)
+    parser.add_argument("--block-size", type=int, default=5000, help="calls per mined block")
+    parser.add_argument("--pow", action="store_true", help="keep the real proof of work")
+    args = parser.parse_args()
+
+    blockchain = Blockchain()
+    if not args.pow:
+        blockchain.valid_proof = lambda last_hash, proof: True
+    accounts = [f"user{i}" for i in range(args.accounts)]
+    for account in ["owner"] + accounts:
+        blockchain.register_node(account)
+    for account in accounts:
+        # Enough for every deposit and bid the account can draw
+        blockchain.issue(MINT, account, 100 * args.calls)
+    blockchain.deploy_contract("owner", "voting", "Voting")
+    blockchain.deploy_contract("owner", "bank", "Bank")
+    blockchain.deploy_contract("owner", "auction", "Auction")
+    for name in ("alice", "bob", "carol"):
+        blockchain.call_contract("owner", "voting", "addCandidate", [name])
+    blockchain.call_contract("owner", "auction", "startAuction", ["painting", 1, 60])
+    blockchain.mine_block("owner")
+
+    blockchain.mine_block("owner")  # confirm the funding
+
+    rng = random.Random(1)
+    bids = 1
+    rejected = 0
+    before = metrics.snapshot()
+    started = perf_counter()
+    for i in range(args.calls):
+        sender = rng.choice(accounts)
+        kind = i % 4
+        if kind == 0:
+            result = blockchain.call_contract(sender, "voting", "vote", [rng.randrange(3)])
+        elif kind == 1:
+            result = blockchain.call_contract(sender, "bank", "deposit", value=rng.randint(1, 100))
+        elif kind == 2:
+            result = blockchain.call_contract(sender, "bank", "withdraw", [1])
+        else:
+            bids += 1
+            result = blockchain.call_contract(sender, "auction", "placeBid", value=bids)
+        if "added" not in result:
+            rejected += 1
+        if len(blockchain.current_transactions) >= args.block_size or i == args.calls - 1:
+            blockchain.mine_block("owner")
+    elapsed = perf_counter() - started
+    after = metrics.snapshot()
+
+    def delta(name):
+        return after["counters"].get(name, 0) - before["counters"].get(name, 0)
+
+    # Only calls that were admitted and executed count toward throughput
+    executed = delta("contract_calls_total")
+    executing = (after["timers"]["contract_execution"]["total_seconds"]
+                 - before["timers"]["contract_execution"]["total_seconds"])
+    print(f"{executed} of {args.calls} calls executed in {len(blockchain.chain) - 1} blocks, "
+          f"{delta('contract_reverts_total')} of them reverted, {rejected} rejected at submission, "
+          f"{delta('contract_gas_used_total')} gas")
+    print(f"{executed / elapsed:.0f} calls/s end to end (submit, execute, mine) in {elapsed:.2f}s; "
+          f"{executed / executing:.0f} calls/s in contract execution alone")
+    print("Votes:", blockchain.contracts.query("voting", "getCandidates"))
+    print("Chain valid:", blockchain.validate_chain())
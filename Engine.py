@@ -0,0 +1,119 @@
+import threading
+
+from Chains import PersistentChain
+from Contracts import DEFAULT_GAS_LIMIT
+from Miner import MiningWorker
+from State import SparseMerkleTree, account_key
+
+
+class Snapshot:
+    """Immutable view of the ledger at one version.
+
+    Built by the single writer and published by swapping one reference, so
+    readers never take a lock and never see a half-applied block. Balances
+    come from the account state tree as of the snapshot's block: the tree
+    copies paths on update, so holding its root keeps that version.
+    """
+
+    __slots__ = ("version", "chain", "tip_hash", "nodes", "state", "mempool")
+
+    def __init__(self, version, chain, tip_hash, nodes, state, mempool):
+        self.version = version
+        self.chain = chain
+        self.tip_hash = tip_hash
+        self.nodes = nodes
+        self.state = state
+        self.mempool = mempool
+
+    @property
+    def height(self):
+        return len(self.chain) - 1
+
+    def check_balance(self, node):
+        if node not in self.nodes:
+            return f"Node {node} is not registered!"
+        return self.balance(node)
+
+    def balance(self, node):
+        data = self.state.get(account_key(node))
+        return data["balance"] if data else 0
+
+    def display_balances(self):
+        return {node: self.balance(node) for node in self.nodes}
+
+    def display_chain(self):
+        return [block.to_dict() for block in self.chain]
+
+    def pending(self):
+        return [tx.to_dict() for tx in self.mempool]
+
+
+class ChainEngine:
+    """Process-wide owner of one Blockchain shared by every session.
+
+    All writes go through the Blockchain under its lock (the single-writer
+    path); after each commit the engine publishes a new Snapshot that shares
+    its chain history with the previous one. Reads use `engine.snapshot`.
+    """
+
+    def __init__(self, blockchain):
+        self.blockchain = blockchain
+        self.worker = None
+        self._worker_lock = threading.Lock()
+        with blockchain.lock:
+            self.snapshot = Snapshot(
+                version=0,
+                chain=PersistentChain.from_blocks(blockchain.chain),
+                tip_hash=blockchain.chain[-1].hash(),
+                nodes=frozenset(blockchain.nodes),
+                state=SparseMerkleTree(blockchain.state.tree.root_node),
+                mempool=PersistentChain.from_blocks(blockchain.current_transactions),
+            )
+            blockchain.listeners.append(self.on_commit)
+
+    def on_commit(self, kind, item):
+        # Runs on the writer, inside blockchain.lock
+        current = self.snapshot
+        chain, tip_hash = current.chain, current.tip_hash
+        nodes, state, mempool = current.nodes, current.state, current.mempool
+        if kind == "node":
+            nodes = nodes | {item}
+        elif kind == "transaction":
+            mempool = mempool.append(item)
+        elif kind == "block":
+            chain = chain.append(item)
+            tip_hash = self.blockchain.index.tip()
+            # The block is already applied to blockchain.state: share its
+            # tree rather than copying every balance
+            state = SparseMerkleTree(self.blockchain.state.tree.root_node)
+            mempool = PersistentChain.from_blocks(self.blockchain.current_transactions)
+        self.snapshot = Snapshot(current.version + 1, chain, tip_hash, nodes, state, mempool)
+
+    def register_node(self, address):
+        return self.blockchain.register_node(address)
+
+    def create_transaction(self, sender, receiver, amount):
+        return self.blockchain.create_transaction(sender, receiver, amount)
+
+    def create_batch_transaction(self, sender, outputs):
+        return self.blockchain.create_batch_transaction(sender, outputs)
+
+    def deploy_contract(self, sender, address, kind, args=()):
+        return self.blockchain.deploy_contract(sender, address, kind, args)
+
+    def call_contract(self, sender, contract, method, args=(), value=0, gas_limit=DEFAULT_GAS_LIMIT):
+        return self.blockchain.call_contract(sender, contract, method, args, value, gas_limit)
+
+    def start_mining(self, miner, continuous=False):
+        with self._worker_lock:
+            if miner not in self.snapshot.nodes:
+                return "Miner must be a registered node!"
+            if self.worker and self.worker.is_alive():
+                return "A block is already being mined."
+            self.worker = MiningWorker(self.blockchain, miner, continuous=continuous)
+            self.worker.start()
+            return f"Mining started in the background for {miner}."
+
+    def stop_mining(self):
+        if self.worker:
+            self.worker.stop()
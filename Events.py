@@ -0,0 +1,245 @@
+import asyncio
+import base64
+import hashlib
+import itertools
+import json
+import threading
+from collections import deque
+from time import time
+from urllib.parse import parse_qs
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+BLOCK = "block"  # Slow the bus's dispatcher down, up to `block_timeout`, then drop
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class Subscription:
+    """Bounded queue of events for one consumer thread."""
+
+    def __init__(self, bus, topics, maxsize, policy, block_timeout):
+        self.bus = bus
+        self.topics = set(topics) if topics else None
+        self.maxsize = maxsize
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.queue = deque()
+        self.dropped = 0
+        self.closed = False
+        self.ready = threading.Condition()
+
+    def wants(self, topic):
+        return self.topics is None or topic in self.topics
+
+    def offer(self, event):
+        with self.ready:
+            if len(self.queue) >= self.maxsize and self.policy == BLOCK:
+                self.ready.wait_for(lambda: len(self.queue) < self.maxsize or self.closed, self.block_timeout)
+            if len(self.queue) >= self.maxsize:
+                self.dropped += 1
+                if self.policy == DROP_NEWEST or self.policy == BLOCK:
+                    return
+                self.queue.popleft()
+            self.queue.append(event)
+            self.ready.notify_all()
+
+    def get(self, timeout=None):
+        with self.ready:
+            if not self.ready.wait_for(lambda: self.queue or self.closed, timeout):
+                return None
+            if not self.queue:
+                return None
+            event = self.queue.popleft()
+            self.ready.notify_all()
+            return event
+
+    def __iter__(self):
+        while True:
+            event = self.get()
+            if event is None:
+                return
+            yield event
+
+    def close(self):
+        self.bus.unsubscribe(self)
+        with self.ready:
+            self.closed = True
+            self.ready.notify_all()
+
+
+class AsyncSubscription(Subscription):
+    """Same policies, but consumed from an asyncio event loop."""
+
+    def __init__(self, bus, topics, maxsize, policy, loop):
+        super().__init__(bus, topics, maxsize, DROP_NEWEST if policy == BLOCK else policy, 0)
+        self.loop = loop
+        self.items = asyncio.Queue()
+
+    def offer(self, event):
+        self.loop.call_soon_threadsafe(self._offer, event)
+
+    def _offer(self, event):
+        if self.items.qsize() >= self.maxsize:
+            self.dropped += 1
+            if self.policy == DROP_NEWEST:
+                return
+            self.items.get_nowait()
+        self.items.put_nowait(event)
+
+    async def get_async(self):
+        return await self.items.get()
+
+
+class EventBus:
+    """In-process pub/sub for chain events ("block", "transaction", "stake",
+    "reorg", "node", "finality", "expired").
+
+    publish() never waits on a consumer, so it is safe to call while
+    holding a chain lock. BLOCK subscriptions are fed by one dispatcher
+    thread, which is what they slow down; at most `dispatch_maxsize` events
+    wait for it, after which they count as dropped for those subscribers.
+    `data` may be a zero-argument callable, evaluated (by the publisher)
+    only when someone is subscribed to the topic.
+    """
+
+    def __init__(self, dispatch_maxsize=10000):
+        self.subscriptions = []
+        self.lock = threading.Lock()
+        self.sequence = itertools.count(1)
+        self.dispatch_maxsize = dispatch_maxsize
+        self.pending = deque()  # (event, BLOCK subscriptions) for the dispatcher
+        self.pending_ready = threading.Condition()
+        self.dispatcher = None
+
+    def subscribe(self, topics=None, maxsize=1000, policy=DROP_OLDEST, block_timeout=0.05):
+        subscription = Subscription(self, topics, maxsize, policy, block_timeout)
+        with self.lock:
+            self.subscriptions = self.subscriptions + [subscription]
+        return subscription
+
+    def subscribe_async(self, loop, topics=None, maxsize=1000, policy=DROP_OLDEST):
+        subscription = AsyncSubscription(self, topics, maxsize, policy, loop)
+        with self.lock:
+            self.subscriptions = self.subscriptions + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions = [s for s in self.subscriptions if s is not subscription]
+
+    def publish(self, topic, data=None):
+        subscriptions = [s for s in self.subscriptions if s.wants(topic)]
+        if not subscriptions:
+            return None
+        event = {
+            "seq": next(self.sequence),
+            "topic": topic,
+            "time": time(),
+            "data": data() if callable(data) else data,
+        }
+        blocking = []
+        for subscription in subscriptions:
+            if subscription.policy == BLOCK:
+                blocking.append(subscription)
+            else:
+                subscription.offer(event)
+        if blocking:
+            self.dispatch(event, blocking)
+        return event
+
+    def dispatch(self, event, subscriptions):
+        with self.pending_ready:
+            if len(self.pending) >= self.dispatch_maxsize:
+                for subscription in subscriptions:
+                    subscription.dropped += 1
+                return
+            self.pending.append((event, subscriptions))
+            if self.dispatcher is None:
+                self.dispatcher = threading.Thread(target=self.run_dispatcher, daemon=True)
+                self.dispatcher.start()
+            self.pending_ready.notify()
+
+    def run_dispatcher(self):
+        while True:
+            with self.pending_ready:
+                self.pending_ready.wait_for(lambda: self.pending)
+                event, subscriptions = self.pending.popleft()
+            for subscription in subscriptions:
+                subscription.offer(event)
+
+
+bus = EventBus()
+
+
+# --- Stream endpoint: newline-delimited JSON over TCP, or WebSocket ---
+
+def websocket_frame(text):
+    payload = text.encode()
+    length = len(payload)
+    if length < 126:
+        header = bytes([0x81, length])
+    elif length < 1 << 16:
+        header = bytes([0x81, 126]) + length.to_bytes(2, "big")
+    else:
+        header = bytes([0x81, 127]) + length.to_bytes(8, "big")
+    return header + payload
+
+
+async def stream_client(event_bus, reader, writer, maxsize, policy):
+    loop = asyncio.get_running_loop()
+    first_line = (await reader.readline()).decode("latin-1").strip()
+    websocket = first_line.startswith("GET ")
+    if websocket:
+        # WebSocket: GET /?topics=block,reorg
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        key = headers.get("sec-websocket-key", "")
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        writer.write((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode())
+        query = first_line.split()[1].partition("?")[2]
+        topics = parse_qs(query).get("topics", [""])[0]
+    else:
+        # Raw TCP: the first line is a comma-separated topic list (empty = all)
+        topics = first_line
+    topics = [t for t in topics.split(",") if t] or None
+    subscription = event_bus.subscribe_async(loop, topics, maxsize, policy)
+    try:
+        while True:
+            event = await subscription.get_async()
+            message = json.dumps(event, default=str)
+            writer.write(websocket_frame(message) if websocket else (message + "\n").encode())
+            await writer.drain()
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        subscription.close()
+        writer.close()
+
+
+async def serve_stream(event_bus=bus, host="127.0.0.1", port=8001, maxsize=1000, policy=DROP_OLDEST):
+    async def handle(reader, writer):
+        await stream_client(event_bus, reader, writer, maxsize, policy)
+
+    server = await asyncio.start_server(handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def start_stream_server(event_bus=bus, host="127.0.0.1", port=8001, **options):
+    # Runs the stream endpoint on its own event loop thread
+    thread = threading.Thread(
+        target=lambda: asyncio.run(serve_stream(event_bus, host, port, **options)),
+        daemon=True,
+    )
+    thread.start()
+    return thread
@@ -0,0 +1,123 @@
+import math
+
+SLOT_BITS = 6
+SLOTS = 1 << SLOT_BITS  # slots per wheel level
+
+
+class TimingWheel:
+    """Hierarchical timing wheel over integer ticks.
+
+    Level k has 64 slots each spanning 64**k ticks. schedule() and cancel()
+    are O(1); advance() expires due entries, and an entry cascades down at
+    most once per level on its way out, so expiry is O(1) amortized. Entries
+    further out than the top level park in it and are re-filed as they
+    cascade.
+    """
+
+    def __init__(self, now=0, levels=4):
+        self.now = now
+        self.levels = levels
+        self.slots = [[{} for _ in range(SLOTS)] for _ in range(levels)]
+        self.where = {}  # key -> (level, slot)
+        self.deadlines = {}  # key -> deadline tick
+
+    def __len__(self):
+        return len(self.where)
+
+    def __contains__(self, key):
+        return key in self.where
+
+    def schedule(self, key, deadline, item):
+        # False when the deadline has already passed; the caller expires it
+        self.cancel(key)
+        if deadline <= self.now:
+            return False
+        self._place(key, deadline, item)
+        return True
+
+    def _place(self, key, deadline, item):
+        delta = min(deadline - self.now, SLOTS ** self.levels - 1)
+        level = 0
+        while delta >= SLOTS ** (level + 1):
+            level += 1
+        slot = ((self.now + delta) >> (SLOT_BITS * level)) & (SLOTS - 1)
+        self.slots[level][slot][key] = item
+        self.where[key] = (level, slot)
+        self.deadlines[key] = deadline
+
+    def cancel(self, key):
+        location = self.where.pop(key, None)
+        if location is None:
+            return None
+        del self.deadlines[key]
+        level, slot = location
+        return self.slots[level][slot].pop(key)
+
+    def advance(self, now):
+        """Move the wheel to tick `now` and return the items that expired."""
+        expired = []
+        if not self.where:
+            self.now = max(self.now, now)
+            return expired
+        while self.now < now:
+            self.now += 1
+            for level in range(1, self.levels):
+                if self.now & ((1 << (SLOT_BITS * level)) - 1):
+                    break
+                # Crossed a level boundary: re-file that slot one level down
+                slot = self.slots[level][(self.now >> (SLOT_BITS * level)) & (SLOTS - 1)]
+                for key, item in list(slot.items()):
+                    del slot[key]
+                    deadline = self.deadlines.pop(key)
+                    del self.where[key]
+                    if deadline <= self.now:
+                        expired.append(item)
+                    else:
+                        self._place(key, deadline, item)
+            slot = self.slots[0][self.now & (SLOTS - 1)]
+            if slot:
+                for key, item in slot.items():
+                    del self.where[key]
+                    del self.deadlines[key]
+                    expired.append(item)
+                slot.clear()
+            if not self.where:
+                self.now = max(self.now, now)
+        return expired
+
+
+class MempoolExpiry:
+    """Expiry deadlines of pending transactions, by wall-clock time and by
+    block height, each on its own TimingWheel."""
+
+    def __init__(self, resolution=1.0, now=0.0, height=0):
+        self.resolution = resolution
+        self.by_time = TimingWheel(self.tick(now))
+        self.by_height = TimingWheel(height)
+
+    def tick(self, now):
+        return int(now // self.resolution)
+
+    def schedule(self, tx):
+        # Returns False when the transaction has already expired
+        key = id(tx)
+        if tx.expires_at is not None:
+            if not self.by_time.schedule(key, math.ceil(tx.expires_at / self.resolution), tx):
+                return False
+        if tx.expires_height is not None:
+            # Still valid in the block at expires_height, gone after it
+            if not self.by_height.schedule(key, tx.expires_height + 1, tx):
+                self.by_time.cancel(key)
+                return False
+        return True
+
+    def cancel(self, tx):
+        self.by_time.cancel(id(tx))
+        self.by_height.cancel(id(tx))
+
+    def advance(self, now, height):
+        expired = self.by_time.advance(self.tick(now)) + self.by_height.advance(height)
+        unique = {id(tx): tx for tx in expired}
+        for tx in unique.values():
+            self.cancel(tx)
+        return list(unique.values())
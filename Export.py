@@ -0,0 +1,270 @@
+import argparse
+import gzip
+import json
+import os
+import re
+from itertools import islice
+
+from Blockchain import Block, Blockchain, transaction_from_dict, tx_record
+from Indexes import ChainIndex
+from State import AccountState
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = pq = None
+
+FORMAT = "mycoin-chain"
+FORMAT_VERSION = 1
+# The UI only ever writes here, under a name it has checked
+EXPORT_DIR = os.path.abspath("exports")
+EXPORT_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]{0,63}\.(jsonl|jsonl\.gz|parquet)")
+
+
+def open_text(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def export_path(name):
+    # A plain file name inside EXPORT_DIR, or None: no directories, no
+    # dot files, one of the supported extensions
+    if not isinstance(name, str) or not EXPORT_NAME.fullmatch(name):
+        return None
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    return os.path.join(EXPORT_DIR, name)
+
+
+def require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Parquet support needs pyarrow: pip install pyarrow")
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+# --- Streaming export ---
+
+def iter_blocks(chain):
+    for block in chain:
+        yield {**block.to_dict(), "hash": block.hash()}
+
+
+def iter_transactions(chain):
+    for block in chain:
+        block_hash = block.hash()
+        for position, tx in enumerate(block.transactions):
+            yield from payment_rows(block.index, position, block_hash, block.timestamp, tx_record(tx))
+
+
+def payment_rows(height, position, block_hash, timestamp, tx):
+    # One row per payment: a batch transaction yields one row per output, a
+    # contract call one for its value and one per coin transfer it made
+    if "contract" in tx:
+        payments = [[tx["sender"], tx["contract"], tx["value"]]] if tx["value"] else []
+        payments += tx.get("receipt", {}).get("payouts", [])
+    else:
+        outputs = tx["outputs"] if "outputs" in tx else [[tx["receiver"], tx["amount"]]]
+        payments = [[tx["sender"], receiver, amount] for receiver, amount in outputs]
+    for sender, receiver, amount in payments:
+        yield {
+            "height": height,
+            "position": position,
+            "block_hash": block_hash,
+            "timestamp": timestamp,
+            "sender": sender,
+            "receiver": receiver,
+            "amount": amount,
+        }
+
+
+def export_jsonl(blockchain, path):
+    # One metadata line, then one block per line; never holds more than a block
+    count = 0
+    with open_text(path, "w") as f:
+        meta = {"format": FORMAT, "version": FORMAT_VERSION, "nodes": sorted(blockchain.nodes)}
+        f.write(json.dumps(meta) + "\n")
+        for block in iter_blocks(blockchain.chain):
+            f.write(json.dumps(block, sort_keys=True) + "\n")
+            count += 1
+    return count
+
+
+def export_transactions_jsonl(chain, path):
+    count = 0
+    with open_text(path, "w") as f:
+        for row in iter_transactions(chain):
+            f.write(json.dumps(row) + "\n")
+            count += 1
+    return count
+
+
+def block_rows_to_table(rows):
+    # Transactions stay JSON-encoded so re-imported blocks hash identically
+    return pa.table({
+        "index": pa.array([r["index"] for r in rows], pa.int64()),
+        "timestamp": pa.array([r["timestamp"] for r in rows], pa.float64()),
+        "proof": pa.array([r["proof"] for r in rows], pa.int64()),
+        "previous_hash": pa.array([r["previous_hash"] for r in rows], pa.string()),
+        "merkle_root": pa.array([r["merkle_root"] for r in rows], pa.string()),
+        "state_root": pa.array([r.get("state_root") for r in rows], pa.string()),
+        "hash": pa.array([r["hash"] for r in rows], pa.string()),
+        "tx_count": pa.array([len(r["transactions"]) for r in rows], pa.int64()),
+        "transactions_json": pa.array([json.dumps(r["transactions"]) for r in rows], pa.string()),
+    })
+
+
+def tx_rows_to_table(rows):
+    return pa.table({
+        "height": pa.array([r["height"] for r in rows], pa.int64()),
+        "position": pa.array([r["position"] for r in rows], pa.int64()),
+        "block_hash": pa.array([r["block_hash"] for r in rows], pa.string()),
+        "timestamp": pa.array([r["timestamp"] for r in rows], pa.float64()),
+        "sender": pa.array([r["sender"] for r in rows], pa.string()),
+        "receiver": pa.array([r["receiver"] for r in rows], pa.string()),
+        "amount": pa.array([float(r["amount"]) for r in rows], pa.float64()),
+    })
+
+
+def write_parquet(rows, to_table, path, batch_size):
+    require_pyarrow()
+    writer = None
+    count = 0
+    try:
+        for batch in batched(rows, batch_size):
+            table = to_table(batch)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            count += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+def export_parquet(chain, blocks_path, transactions_path=None, batch_size=10000):
+    count = write_parquet(iter_blocks(chain), block_rows_to_table, blocks_path, batch_size)
+    if transactions_path:
+        write_parquet(iter_transactions(chain), tx_rows_to_table, transactions_path, batch_size)
+    return count
+
+
+# --- Streaming import ---
+
+def read_jsonl(path):
+    # Yields (meta, block dict) pairs; meta is None when the file has none
+    meta = None
+    with open_text(path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if row.get("format") == FORMAT:
+                meta = row
+                continue
+            yield meta, row
+
+
+def read_parquet(path, batch_size=10000):
+    require_pyarrow()
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        for row in batch.to_pylist():
+            row["transactions"] = json.loads(row.pop("transactions_json"))
+            yield None, row
+
+
+def block_from_dict(data):
+    transactions = [transaction_from_dict(tx) for tx in data["transactions"]]
+    return Block(data["index"], data["previous_hash"], data["proof"], transactions, data["timestamp"], data.get("state_root"))
+
+
+def import_rows(rows, batch_size=1000, progress=None):
+    """Rebuild and validate a Blockchain from streamed block dicts.
+
+    Blocks are checked in batches against the previous block (linkage, proof
+    of work, stored hash) and against the replayed account state
+    (state_root), so memory is the chain itself plus the state tree.
+    """
+    blockchain = Blockchain()
+    blockchain.chain = []
+    blockchain.index = ChainIndex()
+    blockchain.state = AccountState()
+    previous = None
+    previous_hash = None
+    for batch in batched(rows, batch_size):
+        for meta, data in batch:
+            if meta and not blockchain.nodes:
+                blockchain.nodes.update(meta.get("nodes", []))
+            block = block_from_dict(data)
+            block_hash = block.hash()
+            if data.get("hash") and data["hash"] != block_hash:
+                raise ValueError(f"Block {block.index}: stored hash does not match its contents")
+            if block.index != len(blockchain.chain):
+                raise ValueError(f"Block {block.index}: expected height {len(blockchain.chain)}")
+            if previous is not None:
+                if block.previous_hash != previous_hash:
+                    raise ValueError(f"Block {block.index}: previous_hash does not link to block {previous.index}")
+                if not blockchain.valid_proof(previous_hash, block.proof):
+                    raise ValueError(f"Block {block.index}: invalid proof of work")
+            if not blockchain.contracts.execute_block(block, check=True):
+                raise ValueError(f"Block {block.index}: contract receipts do not match a re-run of the calls")
+            if blockchain.state.apply_block(block) != block.state_root:
+                raise ValueError(f"Block {block.index}: state_root does not match the replayed balances")
+            blockchain.chain.append(block)
+            blockchain.index.add_block(block)
+            previous, previous_hash = block, block_hash
+        if progress:
+            progress(len(blockchain.chain))
+    if not blockchain.chain:
+        raise ValueError("No blocks to import")
+    return blockchain
+
+
+def import_jsonl(path, batch_size=1000, progress=None):
+    return import_rows(read_jsonl(path), batch_size, progress)
+
+
+def import_parquet(path, batch_size=1000, progress=None):
+    return import_rows(read_parquet(path, batch_size), batch_size, progress)
+
+
+def convert_jsonl_to_parquet(source, blocks_path, transactions_path=None, batch_size=10000):
+    # Straight file-to-file conversion without building a Blockchain
+    blocks = (row for _, row in read_jsonl(source))
+    count = write_parquet(blocks, block_rows_to_table, blocks_path, batch_size)
+    if transactions_path:
+        def rows():
+            for _, block in read_jsonl(source):
+                for position, tx in enumerate(block["transactions"]):
+                    yield from payment_rows(block["index"], position, block["hash"], block["timestamp"], tx)
+        write_parquet(rows(), tx_rows_to_table, transactions_path, batch_size)
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream Mycoin chains between files")
+    commands = parser.add_subparsers(dest="command", required=True)
+    validate = commands.add_parser("validate", help="Import a JSONL/Parquet chain and validate it")
+    validate.add_argument("path")
+    convert = commands.add_parser("convert", help="Convert a JSONL chain to Parquet")
+    convert.add_argument("source")
+    convert.add_argument("blocks")
+    convert.add_argument("--transactions")
+    args = parser.parse_args()
+
+    if args.command == "validate":
+        loader = import_parquet if args.path.endswith(".parquet") else import_jsonl
+        chain = loader(args.path, progress=lambda n: print(f"... {n} blocks", flush=True))
+        print(f"Imported and validated {len(chain.chain)} blocks, tip {chain.index.tip()}")
+    else:
+        count = convert_jsonl_to_parquet(args.source, args.blocks, args.transactions)
+        print(f"Converted {count} blocks")
@@ -0,0 +1,114 @@
+from Keys import KeyRing
+
+
+class EpochTally:
+    # Votes for one epoch's checkpoint, weighted by a stake snapshot
+
+    def __init__(self, epoch, height, block_hash, stakes):
+        self.epoch = epoch
+        self.height = height
+        self.block_hash = block_hash
+        self.stakes = {v: s for v, s in stakes.items() if s > 0}  # frozen at the checkpoint
+        self.total = sum(self.stakes.values())
+        self.votes = {}  # validator -> voted block hash
+        self.weight = {}  # block hash -> stake voting for it
+
+    def to_dict(self):
+        return {
+            "epoch": self.epoch,
+            "height": self.height,
+            "checkpoint": self.block_hash,
+            "voters": len(self.votes),
+            "validators": len(self.stakes),
+            "voted_stake": self.weight.get(self.block_hash, 0),
+            "total_stake": self.total,
+        }
+
+
+class FinalityGadget:
+    # Epoch checkpoints, final once `threshold` of the stake votes for them
+
+    def __init__(self, epoch_length=4, threshold=2 / 3):
+        self.epoch_length = epoch_length
+        self.threshold = threshold
+        self.keys = KeyRing()
+        self.tallies = {}  # open epoch -> EpochTally
+        self.finalized_epoch = 0
+        self.finalized_height = 0  # genesis is final by definition
+        self.finalized_hash = None
+        self.checkpoint_epoch = 0  # latest epoch that has had a checkpoint
+        self.finalized = []  # EpochTally of every finalized checkpoint
+        self.slashed = {}  # validator -> epoch of the double vote
+
+    def message(self, epoch, block_hash):
+        return f"{self.finalized_epoch}|{epoch}|{block_hash}".encode()
+
+    def sign(self, validator, epoch, block_hash):
+        return self.keys.sign(validator, self.message(epoch, block_hash))
+
+    def is_checkpoint(self, height):
+        return height > 0 and height // self.epoch_length > self.checkpoint_epoch
+
+    def open_epoch(self, height, block_hash, stakes):
+        epoch = height // self.epoch_length
+        self.checkpoint_epoch = max(self.checkpoint_epoch, epoch)
+        self.tallies[epoch] = EpochTally(epoch, height, block_hash, stakes)
+        return epoch
+
+    def vote(self, validator, epoch, block_hash, signature):
+        tally = self.tallies.get(epoch)
+        if tally is None:
+            return "Epoch is not open for voting!"
+        if validator not in tally.stakes or validator in self.slashed:
+            return "Not a validator for this epoch!"
+        if not self.keys.verify(validator, self.message(epoch, block_hash), signature):
+            return "Invalid vote signature!"
+        previous = tally.votes.get(validator)
+        if previous == block_hash:
+            return "Vote already counted."
+        stake = tally.stakes[validator]
+        if previous is not None:
+            # Equivocation: withdraw the first vote and stop counting this validator
+            tally.weight[previous] -= stake
+            self.slashed[validator] = epoch
+            return f"{validator} voted twice in epoch {epoch} and was slashed!"
+        tally.votes[validator] = block_hash
+        tally.weight[block_hash] = tally.weight.get(block_hash, 0) + stake
+        if block_hash == tally.block_hash and tally.weight[block_hash] >= self.threshold * tally.total:
+            self.finalize(tally)
+            return f"Epoch {epoch} finalized at block {tally.height}."
+        return f"Vote from {validator} counted."
+
+    def finalize(self, tally):
+        self.finalized_epoch = tally.epoch
+        self.finalized_height = tally.height
+        self.finalized_hash = tally.block_hash
+        self.finalized.append(tally)
+        # Older epochs can no longer finalize anything
+        self.tallies = {e: t for e, t in self.tallies.items() if e > tally.epoch}
+
+    def on_block(self, chain, stakes, voters=None):
+        # Open an epoch when the tip is a checkpoint; `voters` defaults to every staked validator
+        height = len(chain) - 1
+        if not self.is_checkpoint(height) or not any(s > 0 for s in stakes.values()):
+            return None
+        block_hash = chain[-1].hash()
+        epoch = self.open_epoch(height, block_hash, stakes)
+        for validator in (stakes if voters is None else voters):
+            if stakes.get(validator, 0) > 0 and validator not in self.slashed:
+                self.vote(validator, epoch, block_hash, self.sign(validator, epoch, block_hash))
+        return epoch
+
+    def is_final(self, height):
+        return height <= self.finalized_height
+
+    def conflicts(self, chain):
+        # A chain that does not contain the finalized checkpoint can never be adopted
+        if self.finalized_hash is None:
+            return False
+        if len(chain) <= self.finalized_height:
+            return True
+        return chain[self.finalized_height].hash() != self.finalized_hash
+
+    def display_epochs(self):
+        return [tally.to_dict() for tally in self.finalized[-10:]] + [t.to_dict() for t in self.tallies.values()]
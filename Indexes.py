@@ -0,0 +1,301 @@
+import hashlib
+import json
+import os
+import re
+from bisect import bisect_left, insort
+
+
+def tx_outputs(tx):
+    # (receiver, amount) pairs paid by a transaction; batch payments have many
+    outputs = getattr(tx, "outputs", None)
+    return outputs if outputs is not None else ((tx.receiver, tx.amount),)
+
+
+def tx_payouts(tx):
+    # [payer, receiver, amount] paid out by a contract while running the call
+    receipt = getattr(tx, "receipt", None)
+    return receipt["payouts"] if receipt else ()
+
+
+def tx_hash(tx):
+    tx_string = json.dumps(tx.to_dict(), sort_keys=True).encode()
+    return hashlib.sha256(tx_string).hexdigest()
+
+
+# Strings (with escapes) and brackets of a canonical JSON entry
+TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}\[\]]')
+
+
+def json_string(token):
+    return json.loads(token) if b"\\" in token else token[1:-1].decode()
+
+
+def entry_accounts(entry):
+    # Accounts a transaction's canonical JSON touches, the same set the
+    # objects give, picked out of the bytes without decoding the entry
+    fields = {}  # top-level key -> account strings found in its value
+    key = inner = None  # keys being read at depth 1 and depth 2
+    depth = 0
+    strings = 0  # strings seen in the innermost open list
+    for match in TOKEN.finditer(entry):
+        token = match.group()
+        if token in (b"{", b"["):
+            depth += 1
+            strings = 0
+        elif token in (b"}", b"]"):
+            depth -= 1
+        elif entry[match.end():match.end() + 1] == b":":
+            if depth == 1:
+                key, inner = token, None
+            elif depth == 2:
+                inner = token
+        else:
+            strings += 1
+            if (depth == 1 and key in (b'"sender"', b'"receiver"', b'"contract"')
+                    or depth == 3 and key == b'"outputs"' and strings == 1
+                    or depth == 4 and key == b'"receipt"' and inner == b'"payouts"' and strings == 2):
+                fields.setdefault(key, []).append(json_string(token))
+    accounts = set(fields[b'"sender"'])
+    receivers = fields.get(b'"outputs"', fields.get(b'"contract"', fields.get(b'"receiver"')))
+    accounts.update(receivers or ())
+    accounts.update(fields.get(b'"receipt"', ()))
+    return accounts
+
+
+def block_entries(block):
+    """(tx hash, accounts) for every transaction of a block. Buffer-backed
+    blocks (Lazy.LazyBlock) are read from their canonical bytes: the hash is
+    a digest of the stored entry and neither a transaction object nor its
+    JSON is built."""
+    transactions = block.transactions
+    raw = getattr(transactions, "raw", None)
+    if raw is None:
+        for tx in transactions:
+            accounts = {tx.sender, *(receiver for receiver, _ in tx_outputs(tx))}
+            accounts.update(receiver for _, receiver, _ in tx_payouts(tx))
+            yield tx_hash(tx), accounts
+        return
+    for position in range(len(transactions)):
+        entry = bytes(raw(position))
+        yield hashlib.sha256(entry).hexdigest(), entry_accounts(entry)
+
+
+class ChainIndex:
+    """Secondary indexes over a chain: tx hash -> (height, position) and
+    account -> list of (height, position), kept sorted by chain order.
+
+    Identical transactions share a hash; the index points at the first one.
+    """
+
+    def __init__(self):
+        self.block_hashes = []  # block hash at every indexed height
+        self.block_heights = {}  # block hash -> height
+        self.tx_positions = {}  # tx hash -> (height, position)
+        self.accounts = {}  # account -> [(height, position), ...]
+        self.added_hashes = []  # tx hashes first seen at every height
+        self.touched = []  # accounts appearing at every height
+
+    def __len__(self):
+        return len(self.block_hashes)
+
+    def add_block(self, block):
+        height = len(self.block_hashes)
+        added = []
+        touched = []
+        for position, tx in enumerate(block.transactions):
+            h = tx_hash(tx)
+            if h not in self.tx_positions:
+                self.tx_positions[h] = (height, position)
+                added.append(h)
+            accounts = {tx.sender, *(receiver for receiver, _ in tx_outputs(tx))}
+            accounts.update(receiver for _, receiver, _ in tx_payouts(tx))
+            for account in accounts:
+                positions = self.accounts.setdefault(account, [])
+                if not positions or positions[-1][0] != height:
+                    touched.append(account)
+                positions.append((height, position))
+        self.block_hashes.append(block.hash())
+        self.block_heights[self.block_hashes[-1]] = height
+        self.added_hashes.append(added)
+        self.touched.append(touched)
+
+    def truncate(self, height):
+        # Drop every indexed block at or above `height`
+        while len(self.block_hashes) > height:
+            top = len(self.block_hashes) - 1
+            for h in self.added_hashes.pop():
+                del self.tx_positions[h]
+            del self.block_heights[self.block_hashes.pop()]
+            for account in self.touched.pop():
+                positions = self.accounts[account]
+                del positions[bisect_left(positions, (top, -1)):]
+                if not positions:
+                    del self.accounts[account]
+
+    def fork_point(self, chain):
+        height = min(len(chain), len(self.block_hashes))
+        while height > 0 and chain[height - 1].hash() != self.block_hashes[height - 1]:
+            height -= 1
+        return height
+
+    def reorg(self, chain):
+        fork = self.fork_point(chain)
+        self.truncate(fork)
+        for block in chain[fork:]:
+            self.add_block(block)
+        return fork
+
+    def rebuild(self, chain):
+        self.__init__()
+        for block in chain:
+            self.add_block(block)
+
+    def block_height(self, block_hash):
+        return self.block_heights.get(block_hash)
+
+    def lookup(self, tx_hash_value):
+        return self.tx_positions.get(tx_hash_value)
+
+    def history(self, account, page=0, page_size=10, newest_first=True):
+        positions = self.accounts.get(account, [])
+        if newest_first:
+            end = len(positions) - page * page_size
+            start = max(end - page_size, 0)
+            return positions[start:end][::-1] if end > 0 else []
+        start = page * page_size
+        return positions[start:start + page_size]
+
+    def history_between(self, account, start_height, end_height):
+        positions = self.accounts.get(account, [])
+        lo = bisect_left(positions, (start_height, -1))
+        hi = bisect_left(positions, (end_height, -1))
+        return positions[lo:hi]
+
+    def tip(self):
+        return self.block_hashes[-1] if self.block_hashes else None
+
+    def to_dict(self):
+        return {
+            "block_hashes": self.block_hashes,
+            "tx_positions": {h: list(pos) for h, pos in self.tx_positions.items()},
+            "accounts": {a: [list(p) for p in ps] for a, ps in self.accounts.items()},
+            "added_hashes": self.added_hashes,
+            "touched": self.touched,
+        }
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, chain=None):
+        index = cls()
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            index.block_hashes = data["block_hashes"]
+            index.block_heights = {h: i for i, h in enumerate(index.block_hashes)}
+            index.tx_positions = {h: tuple(pos) for h, pos in data["tx_positions"].items()}
+            index.accounts = {a: [tuple(p) for p in ps] for a, ps in data["accounts"].items()}
+            index.added_hashes = data["added_hashes"]
+            index.touched = data["touched"]
+        if chain is not None:
+            # Catch up (or roll back) to the chain the index is stored next to
+            index.reorg(chain)
+        return index
+
+
+class BlockTreeIndex:
+    """Secondary indexes shared by every chain grown from the same blocks.
+
+    Entries are keyed by block hash rather than height, so nodes whose
+    PersistentChains share a history index it once between them, the way
+    the chains store it once. A block that is already indexed is skipped
+    with one dict lookup, so syncing to a peer's chain only indexes the
+    blocks nobody had seen. view(chain) answers ChainIndex's queries for
+    one chain by keeping the entries whose block sits on it.
+    """
+
+    def __init__(self):
+        self.block_heights = {}  # block hash -> height
+        self.tx_positions = {}  # tx hash -> sorted [(height, position, block hash), ...]
+        self.accounts = {}  # account -> sorted [(height, position, block hash), ...]
+
+    def __len__(self):
+        return len(self.block_heights)
+
+    def add_block(self, block):
+        block_hash = block.hash()
+        if block_hash in self.block_heights:
+            return False
+        height = block.index
+        self.block_heights[block_hash] = height
+        for position, (h, accounts) in enumerate(block_entries(block)):
+            entry = (height, position, block_hash)
+            insort(self.tx_positions.setdefault(h, []), entry)
+            for account in accounts:
+                insort(self.accounts.setdefault(account, []), entry)
+        return True
+
+    def view(self, chain, previous=None):
+        return ChainView(self, chain, previous)
+
+
+class ChainView:
+    # One chain's window onto a BlockTreeIndex, with ChainIndex's queries.
+    # An account's on-chain positions are filtered once and cached; a view
+    # made from the node's previous view takes over its cache below the
+    # fork point, so only entries of the new blocks are checked again.
+
+    def __init__(self, index, chain, previous=None):
+        self.index = index
+        self.chain = chain
+        self.cache = {}  # account -> [on-chain positions, heights below this are complete]
+        if previous is not None:
+            common = getattr(previous.chain, "common_ancestor", None)
+            fork = common(chain) if common is not None and type(chain) is type(previous.chain) else 0
+            # The previous view's lists move here; it must not be queried again
+            for account, (positions, complete) in previous.cache.items():
+                self.cache[account] = [positions, min(complete, fork)]
+            previous.cache = {}
+
+    def on_chain(self, height, block_hash):
+        return height < len(self.chain) and self.chain[height].hash() == block_hash
+
+    def block_height(self, block_hash):
+        height = self.index.block_heights.get(block_hash)
+        return height if height is not None and self.on_chain(height, block_hash) else None
+
+    def lookup(self, tx_hash_value):
+        for height, position, block_hash in self.index.tx_positions.get(tx_hash_value, ()):
+            if self.on_chain(height, block_hash):
+                return height, position
+        return None
+
+    def positions(self, account):
+        cached = self.cache.get(account)
+        if cached is None:
+            cached = self.cache[account] = [[], 0]
+        positions, complete = cached
+        if complete < len(self.chain):
+            del positions[bisect_left(positions, (complete, -1)):]
+            entries = self.index.accounts.get(account, [])
+            for height, position, block_hash in entries[bisect_left(entries, (complete,)):]:
+                if self.on_chain(height, block_hash):
+                    positions.append((height, position))
+            cached[1] = len(self.chain)
+        return positions
+
+    def history(self, account, page=0, page_size=10, newest_first=True):
+        positions = self.positions(account)
+        if newest_first:
+            end = len(positions) - page * page_size
+            start = max(end - page_size, 0)
+            return positions[start:end][::-1] if end > 0 else []
+        start = page * page_size
+        return positions[start:start + page_size]
+
+    def tip(self):
+        return self.chain[-1].hash() if self.chain else None
@@ -0,0 +1,22 @@
+import hashlib
+import hmac
+import secrets
+
+
+class KeyRing:
+    # HMAC-SHA256 under per-node keys held in this process stands in for
+    # public-key signatures in this simulated network
+
+    def __init__(self):
+        self.keys = {}
+
+    def key_for(self, node):
+        if node not in self.keys:
+            self.keys[node] = secrets.token_bytes(32)
+        return self.keys[node]
+
+    def sign(self, node, message):
+        return hmac.new(self.key_for(node), message, hashlib.sha256).digest()
+
+    def verify(self, node, message, signature):
+        return hmac.compare_digest(self.sign(node, message), signature)
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import re
+import struct
+from collections.abc import Sequence
+
+from Metrics import metrics
+
+TRANSACTIONS_KEY = b', "transactions": ['
+# Strings (with escapes) and braces; enough to find object boundaries
+TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}]')
+LENGTH = struct.Struct(">I")
+
+
+def canonical(data):
+    return json.dumps(data, sort_keys=True).encode()
+
+
+def object_spans(buffer, start, end):
+    """(start, end) of every top-level {...} in buffer[start:end], found
+    without decoding anything."""
+    spans = []
+    depth = 0
+    for match in TOKEN.finditer(buffer, start, end):
+        token = match.group()
+        if token == b"{":
+            if depth == 0:
+                first = match.start()
+            depth += 1
+        elif token == b"}":
+            depth -= 1
+            if depth == 0:
+                spans.append((first, match.end()))
+    return spans
+
+
+class LazyTransactions(Sequence):
+    """Read-only sequence over the canonical JSON of a block's transactions.
+
+    Entries stay bytes in the block's buffer until indexed; each access
+    decodes just that entry. raw() hands out a memoryview of the entry
+    without copying or decoding it.
+    """
+
+    __slots__ = ("view", "start", "end", "decode", "_spans")
+
+    def __init__(self, view, start, end, decode, spans=None):
+        self.view = view  # whole underlying buffer; offsets are absolute
+        self.start = start
+        self.end = end
+        self.decode = decode  # tx dict -> transaction object
+        self._spans = spans  # located on first use when not given
+
+    @property
+    def spans(self):
+        if self._spans is None:
+            self._spans = object_spans(self.view.obj, self.start, self.end)
+        return self._spans
+
+    def __len__(self):
+        return len(self.spans)
+
+    def raw(self, position):
+        start, end = self.spans[position]
+        return self.view[start:end]
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        metrics.inc("block_tx_decoded_total")
+        return self.decode(json.loads(bytes(self.raw(position))))
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    def __bool__(self):
+        # An empty array is "[]", so no scan is needed to answer this
+        return self.end > self.start
+
+
+class LazyBlock:
+    """Block backed by its canonical JSON bytes.
+
+    Works for blocks whose hash is the sha256 of their sorted-key JSON and
+    whose last key is "transactions", as in Mycoin*.py. The header fields
+    are parsed when the block is built; the hash is the digest of the
+    buffer, so linking, proof checks and length comparisons never decode a
+    transaction. `buffer[start:end]` is the block when several blocks share
+    one buffer.
+    """
+
+    __slots__ = ("view", "index", "timestamp", "proof", "previous_hash", "transactions", "_hash")
+
+    def __init__(self, buffer, decode, spans=None, start=0, end=None):
+        end = len(buffer) if end is None else end
+        split = buffer.find(TRANSACTIONS_KEY, start, end)
+        if split < 0 or buffer[end - 2:end] != b"]}":
+            raise ValueError("Block buffer does not end with its transactions")
+        self.view = memoryview(buffer)[start:end]
+        header = json.loads(buffer[start:split] + b"}")
+        self.index = header["index"]
+        self.timestamp = header["timestamp"]
+        self.proof = header["proof"]
+        self.previous_hash = header["previous_hash"]
+        self.transactions = LazyTransactions(memoryview(buffer), split + len(TRANSACTIONS_KEY), end - 2, decode, spans)
+        self._hash = None
+
+    @classmethod
+    def from_block(cls, block, decode):
+        # Serializes each transaction once and records where it sits
+        head = canonical({
+            "index": block.index,
+            "previous_hash": block.previous_hash,
+            "proof": block.proof,
+            "timestamp": block.timestamp,
+        })
+        parts = [head[:-1], TRANSACTIONS_KEY]
+        offset = len(head) - 1 + len(TRANSACTIONS_KEY)
+        spans = []
+        for position, tx in enumerate(block.transactions):
+            if position:
+                parts.append(b", ")
+                offset += 2
+            tx_bytes = canonical(tx.to_dict())
+            parts.append(tx_bytes)
+            spans.append((offset, offset + len(tx_bytes)))
+            offset += len(tx_bytes)
+        parts.append(b"]}")
+        return cls(b"".join(parts), decode, spans)
+
+    def hash(self):
+        if self._hash is None:
+            metrics.inc("block_hash_total")
+            metrics.inc("block_serialized_bytes_total", len(self.view))
+            self._hash = hashlib.sha256(self.view).hexdigest()
+        return self._hash
+
+    def to_dict(self):
+        return json.loads(bytes(self.view))
+
+
+def encode_chain(chain):
+    # Length-prefixed block buffers, ready to send or store as one blob
+    return b"".join(part for block in chain for part in (LENGTH.pack(len(block.view)), block.view))
+
+
+def decode_chain(data, decode):
+    """LazyBlocks over one received buffer; every block is a window into
+    `data`, not a copy of it."""
+    blocks = []
+    offset = 0
+    while offset < len(data):
+        (size,) = LENGTH.unpack_from(data, offset)
+        offset += LENGTH.size
+        blocks.append(LazyBlock(data, decode, start=offset, end=offset + size))
+        offset += size
+    return blocks
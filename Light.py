@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+from urllib.parse import quote
+from urllib.request import urlopen
+
+from Merkle import header_hash, leaf_hash, proof_position, verify_proof
+
+
+def valid_proof(last_hash, proof, difficulty="0000"):
+    guess = f"{last_hash}{proof}".encode()
+    return hashlib.sha256(guess).hexdigest().startswith(difficulty)
+
+
+def tx_deltas(tx):
+    """(account, change) pairs of one transaction record, as State applies
+    them: every batch output, a contract call's value paid to the contract,
+    and the coins its receipt says the contract paid out."""
+    if "outputs" in tx:
+        outputs = tx["outputs"]
+    elif "contract" in tx:
+        outputs = [[tx["contract"], tx["value"]]]
+    else:
+        outputs = [[tx["receiver"], tx["amount"]]]
+    deltas = [(tx["sender"], -sum(amount for _, amount in outputs))]
+    deltas.extend((receiver, amount) for receiver, amount in outputs)
+    for payer, receiver, amount in (tx.get("receipt") or {}).get("payouts", ()):
+        deltas.append((payer, -amount))
+        deltas.append((receiver, amount))
+    return deltas
+
+
+def call_fields(record):
+    # The transaction itself, which its hash covers, without the receipt
+    return {key: value for key, value in record.items() if key != "receipt"}
+
+
+class HttpFullNode:
+    """Fetches headers and proofs from a full node running Api.py."""
+
+    def __init__(self, base_url="http://127.0.0.1:8000"):
+        self.base_url = base_url.rstrip("/")
+
+    def fetch(self, path):
+        with urlopen(f"{self.base_url}{path}") as response:
+            return json.loads(response.read())
+
+    def get_headers(self, start=0, count=500):
+        return self.fetch(f"/headers?start={start}&count={count}")
+
+    def prove_transaction(self, hash_value):
+        try:
+            return self.fetch(f"/proof/tx/{hash_value}")
+        except OSError:
+            return None
+
+    def prove_account(self, node):
+        return self.fetch(f"/proof/account/{quote(node)}")
+
+    def state_view(self, prefix=""):
+        # Serves AccountState.sync / SparseMerkleTree.diff on another node
+        return self.fetch(f"/state/{prefix}" if prefix else "/state")
+
+
+class LightClient:
+    """Header-only mode of Blockchain.
+
+    Keeps 68 bytes per block (block hash, merkle root and transaction
+    count, packed into bytearrays), checks proof-of-work linkage while
+    syncing headers and answers inclusion and balance queries with Merkle
+    proofs fetched from a full node. A proof only counts for the position
+    its path leads to, and only below the block's transaction count, so one
+    transaction cannot be proven at several positions. The first header
+    synced is the trust anchor.
+    """
+
+    HASH_BYTES = 32
+    COUNT_BYTES = 4
+
+    def __init__(self, difficulty="0000"):
+        self.difficulty = difficulty
+        self.hashes = bytearray()
+        self.roots = bytearray()
+        self.counts = bytearray()
+
+    def __len__(self):
+        return len(self.hashes) // self.HASH_BYTES
+
+    def _at(self, packed, height):
+        start = height * self.HASH_BYTES
+        return packed[start:start + self.HASH_BYTES].hex()
+
+    def block_hash(self, height):
+        return self._at(self.hashes, height)
+
+    def merkle_root(self, height):
+        return self._at(self.roots, height)
+
+    def tx_count(self, height):
+        start = height * self.COUNT_BYTES
+        return int.from_bytes(self.counts[start:start + self.COUNT_BYTES], "big")
+
+    def add_header(self, header):
+        height = len(self)
+        if header["index"] != height:
+            return False
+        if height:
+            last_hash = self.block_hash(height - 1)
+            if header["previous_hash"] != last_hash:
+                return False
+            if not valid_proof(last_hash, header["proof"], self.difficulty):
+                return False
+        self.hashes += bytes.fromhex(header_hash(header))
+        self.roots += bytes.fromhex(header["merkle_root"])
+        self.counts += header["tx_count"].to_bytes(self.COUNT_BYTES, "big")
+        return True
+
+    def sync(self, full_node, batch=500):
+        added = 0
+        while True:
+            headers = full_node.get_headers(len(self), batch)
+            for header in headers:
+                if not self.add_header(header):
+                    return f"Header {header['index']} failed validation after {added} new headers."
+                added += 1
+            if len(headers) < batch:
+                return f"Synced {added} headers, tip at block {len(self) - 1}."
+
+    def verify(self, proof):
+        height = proof["height"]
+        if not 0 <= height < len(self):
+            return False
+        count = self.tx_count(height)
+        path = proof["proof"]
+        # The claimed position must be the one the path proves, inside the block
+        if len(path) != (count - 1).bit_length() or proof_position(path) != proof["position"]:
+            return False
+        if proof["position"] >= count:
+            return False
+        return verify_proof(leaf_hash(proof["transaction"]), path, self.merkle_root(height))
+
+    def is_included(self, full_node, hash_value):
+        proof = full_node.prove_transaction(hash_value)
+        if not proof or leaf_hash(call_fields(proof["transaction"])) != hash_value:
+            return False
+        return self.verify(proof)
+
+    def check_balance(self, full_node, node):
+        # Every counted transaction is proven; completeness still relies on
+        # the full node returning the whole history
+        balance = 0
+        seen = set()
+        for proof in full_node.prove_account(node):
+            key = (proof["height"], proof["position"])
+            if key in seen or not self.verify(proof):
+                continue
+            seen.add(key)
+            for account, change in tx_deltas(proof["transaction"]):
+                if account == node:
+                    balance += change
+        return balance
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.difficulty.encode().ljust(self.HASH_BYTES, b"\0"))
+            f.write(bytes(self.hashes))
+            f.write(bytes(self.roots))
+            f.write(bytes(self.counts))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        client = cls(data[:cls.HASH_BYTES].rstrip(b"\0").decode())
+        body = data[cls.HASH_BYTES:]
+        size = len(body) // (2 * cls.HASH_BYTES + cls.COUNT_BYTES) * cls.HASH_BYTES
+        client.hashes = bytearray(body[:size])
+        client.roots = bytearray(body[size:2 * size])
+        client.counts = bytearray(body[2 * size:])
+        return client
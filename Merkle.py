@@ -0,0 +1,62 @@
+import hashlib
+import json
+
+EMPTY_ROOT = hashlib.sha256(b"").hexdigest()
+
+
+def leaf_hash(tx_dict):
+    # Same as Indexes.tx_hash, so index lookups and proofs share one ID
+    return hashlib.sha256(json.dumps(tx_dict, sort_keys=True).encode()).hexdigest()
+
+
+def parent_hash(left, right):
+    return hashlib.sha256((left + right).encode()).hexdigest()
+
+
+def merkle_levels(leaves):
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        if len(level) % 2:
+            level = level + [level[-1]]
+        levels.append([parent_hash(level[i], level[i + 1]) for i in range(0, len(level), 2)])
+    return levels
+
+
+def merkle_root(leaves):
+    if not leaves:
+        return EMPTY_ROOT
+    return merkle_levels(leaves)[-1][0]
+
+
+def merkle_proof(leaves, position, levels=None):
+    # [sibling hash, sibling is on the right] from the leaf up to the root;
+    # pass precomputed `levels` when proving many leaves of one block
+    proof = []
+    for level in (levels or merkle_levels(leaves))[:-1]:
+        sibling = position ^ 1
+        if sibling >= len(level):
+            sibling = position
+        proof.append([level[sibling], sibling > position or sibling == position])
+        position //= 2
+    return proof
+
+
+def proof_position(proof):
+    # The leaf index a proof's left/right path leads to
+    position = 0
+    for depth, (_, sibling_on_right) in enumerate(proof):
+        if not sibling_on_right:
+            position |= 1 << depth
+    return position
+
+
+def verify_proof(leaf, proof, root):
+    current = leaf
+    for sibling, sibling_on_right in proof:
+        current = parent_hash(current, sibling) if sibling_on_right else parent_hash(sibling, current)
+    return current == root
+
+
+def header_hash(header):
+    return hashlib.sha256(json.dumps(header, sort_keys=True).encode()).hexdigest()
@@ -0,0 +1,154 @@
+import cProfile
+import io
+import pstats
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+
+
+class Metrics:
+    """Process-wide counters, gauges and timers for the chain hot paths.
+
+    Updates are dict operations under one uncontended lock, cheap enough to
+    sit inside loops such as Block.hash and safe from the mining worker,
+    API and session threads at once; set `enabled = False` to turn them
+    into a single branch.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.timers = {}  # name -> [count, total seconds, max seconds]
+
+    def inc(self, name, amount=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set(self, name, value):
+        if self.enabled:
+            with self.lock:
+                self.gauges[name] = value
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self.lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                self.timers[name] = [1, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                if seconds > timer[2]:
+                    timer[2] = seconds
+
+    @contextmanager
+    def timer(self, name):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, perf_counter() - start)
+
+    def timed(self, name):
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(name, perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def hit_ratios(self, counters=None):
+        counters = self.copy()[0] if counters is None else counters
+        ratios = {}
+        for name, hits in counters.items():
+            if name.endswith("_hits_total"):
+                base = name[: -len("_hits_total")]
+                total = hits + counters.get(f"{base}_misses_total", 0)
+                ratios[f"{base}_hit_ratio"] = hits / total if total else 0.0
+        return ratios
+
+    def copy(self):
+        # Consistent copies to read from while other threads keep updating
+        with self.lock:
+            return dict(self.counters), dict(self.gauges), {name: tuple(t) for name, t in self.timers.items()}
+
+    def snapshot(self):
+        counters, gauges, timers = self.copy()
+        return {
+            "counters": counters,
+            "gauges": {**gauges, **self.hit_ratios(counters)},
+            "timers": {
+                name: {"count": count, "total_seconds": total, "max_seconds": peak}
+                for name, (count, total, peak) in timers.items()
+            },
+        }
+
+    def render_prometheus(self, prefix="mycoin_"):
+        counters, gauges, timers = self.copy()
+        lines = []
+        for name, value in sorted(counters.items()):
+            lines.append(f"# TYPE {prefix}{name} counter")
+            lines.append(f"{prefix}{name} {value}")
+        for name, value in sorted({**gauges, **self.hit_ratios(counters)}.items()):
+            lines.append(f"# TYPE {prefix}{name} gauge")
+            lines.append(f"{prefix}{name} {value}")
+        for name, (count, total, peak) in sorted(timers.items()):
+            lines.append(f"# TYPE {prefix}{name}_seconds summary")
+            lines.append(f"{prefix}{name}_seconds_count {count}")
+            lines.append(f"{prefix}{name}_seconds_sum {total:.6f}")
+            lines.append(f"# TYPE {prefix}{name}_seconds_max gauge")
+            lines.append(f"{prefix}{name}_seconds_max {peak:.6f}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.timers.clear()
+
+
+metrics = Metrics()
+
+
+def profile_call(func, *args, sort="cumulative", limit=25, **kwargs):
+    """Run one call (e.g. a single mine_block or sync) under cProfile and
+    return (result, formatted stats)."""
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats(sort).print_stats(limit)
+    return result, out.getvalue()
+
+
+def render_panel(st, registry=metrics):
+    # Streamlit diagnostics panel; the caller passes its streamlit module
+    snapshot = registry.snapshot()
+    st.write("Counters")
+    st.json(snapshot["counters"])
+    if snapshot["gauges"]:
+        st.write("Gauges")
+        st.json(snapshot["gauges"])
+    if snapshot["timers"]:
+        st.write("Timers")
+        st.table([
+            {
+                "timer": name,
+                "count": t["count"],
+                "total (s)": round(t["total_seconds"], 4),
+                "mean (ms)": round(1000 * t["total_seconds"] / t["count"], 3),
+                "max (ms)": round(1000 * t["max_seconds"], 3),
+            }
+            for name, t in sorted(snapshot["timers"].items())
+        ])
+    st.code(registry.render_prometheus(), language="text")
@@ -0,0 +1,100 @@
+import threading
+from time import time
+
+from Metrics import metrics
+
+
+class MiningWorker:
+    """Mines blocks on a background thread so the caller never blocks on
+    proof_of_work.
+
+    The worker snapshots the tip and the mempool, searches nonces in small
+    chunks and abandons the search (then starts over on the new tip) as soon
+    as another block lands on the chain. Transactions submitted while mining
+    stay in the mempool for the next block. `progress` is replaced as a whole
+    on every update, so readers can poll it without locking.
+    """
+
+    def __init__(self, blockchain, miner, chunk_size=2000, continuous=False):
+        self.blockchain = blockchain
+        self.miner = miner
+        self.chunk_size = chunk_size
+        self.continuous = continuous
+        self.blocks_mined = 0
+        self.restarts = 0
+        self.last_result = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.progress = self._progress("idle", len(blockchain.chain), 0, 0.0)
+
+    def _progress(self, state, height, nonces, elapsed):
+        return {
+            "state": state,
+            "height": height,
+            "nonces": nonces,
+            "elapsed": elapsed,
+            "rate": nonces / elapsed if elapsed else 0.0,
+            "restarts": self.restarts,
+            "blocks_mined": self.blocks_mined,
+            "last_result": self.last_result,
+        }
+
+    def start(self):
+        if self.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def stop(self, wait=False):
+        self._stop.set()
+        if wait and self._thread:
+            self._thread.join()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def snapshot(self):
+        with self.blockchain.lock:
+            tip = self.blockchain.chain[-1]
+            return tip, tip.hash(), list(self.blockchain.current_transactions)
+
+    def search(self, tip, last_hash):
+        # Returns the proof, or None if the tip moved or we were stopped
+        chain = self.blockchain
+        height = len(chain.chain)
+        started = time()
+        proof = 0
+        while not self._stop.is_set():
+            for candidate in range(proof, proof + self.chunk_size):
+                if chain.valid_proof(last_hash, candidate):
+                    metrics.inc("pow_hashes_total", candidate + 1 - proof)
+                    self.progress = self._progress("found", height, candidate + 1, time() - started)
+                    return candidate
+            proof += self.chunk_size
+            metrics.inc("pow_hashes_total", self.chunk_size)
+            self.progress = self._progress("mining", height, proof, time() - started)
+            if chain.chain[-1] is not tip:
+                self.restarts += 1
+                metrics.inc("mining_restarts_total")
+                return None
+        return None
+
+    def run(self):
+        while not self._stop.is_set():
+            tip, last_hash, transactions = self.snapshot()
+            proof = self.search(tip, last_hash)
+            if proof is None:
+                continue
+            with self.blockchain.lock:
+                if self.blockchain.chain[-1] is not tip:
+                    self.restarts += 1
+                    metrics.inc("mining_restarts_total")
+                    continue
+                self.last_result = self.blockchain.add_mined_block(self.miner, proof, transactions)
+            self.blocks_mined += 1
+            self.progress = dict(self.progress, state="mined", blocks_mined=self.blocks_mined, last_result=self.last_result)
+            if not self.continuous:
+                break
+        if self._stop.is_set():
+            self.progress = dict(self.progress, state="stopped")
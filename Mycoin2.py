@@ -3,6 +3,8 @@ import json
 import random
 from time import time
 import streamlit as st
+from Events import bus
+from Finality import FinalityGadget
 
 
 class Transaction:
@@ -16,12 +18,18 @@ class Transaction:
 
 
 class Block:
-    def __init__(self, index, previous_hash, proof, transactions, timestamp=None):
+    def __init__(self, index, previous_hash, proof, transactions, timestamp=None, consensus="PoW"):
         self.index = index
         self.timestamp = timestamp or time()
         self.transactions = transactions
         self.proof = proof
         self.previous_hash = previous_hash
+        self.consensus = consensus  # "PoW" blocks must carry a valid proof of work
+        self.pruned_hash = None  # Set once the body is dropped behind a finalized checkpoint
+
+    def prune(self):
+        self.pruned_hash = self.hash()
+        self.transactions = []
 
     def to_dict(self):
         return {
@@ -30,9 +38,12 @@ class Block:
             "transactions": [tx.to_dict() for tx in self.transactions],
             "proof": self.proof,
             "previous_hash": self.previous_hash,
+            "consensus": self.consensus,
         }
 
     def hash(self):
+        if self.pruned_hash:
+            return self.pruned_hash
         block_string = json.dumps(self.to_dict(), sort_keys=True).encode()
         return hashlib.sha256(block_string).hexdigest()
 
@@ -45,6 +56,9 @@ class Blockchain:
         self.stakes = {}
         self.total_supply = 0
         self.mining_method = "PoW"  # Default to Proof of Work
+        self.finality = FinalityGadget(epoch_length=4)
+        self.offline_validators = set()  # Staked nodes that skip checkpoint votes
+        self.pruned_height = 0
         self.create_genesis_block()
 
     def create_genesis_block(self):
@@ -63,6 +77,7 @@ class Blockchain:
             return "Sender or receiver is not a registered node!"
         transaction = Transaction(sender, receiver, amount)
         self.current_transactions.append(transaction)
+        bus.publish("transaction", transaction.to_dict)
         return f"Transaction from {sender} to {receiver} for {amount} MyCoins added."
 
     def mine_block(self, miner=None):
@@ -89,6 +104,7 @@ class Blockchain:
         reward_transaction = Transaction("System", miner, 10)
         self.total_supply += 10
         self.nodes[miner] += 10
+        bus.publish("block", lambda: {**block.to_dict(), "hash": block.hash(), "miner": miner})
         return f"Block {block.index} mined successfully by {miner} using Proof of Work!"
 
     def mine_block_pos(self):
@@ -101,6 +117,7 @@ class Blockchain:
             previous_hash=self.chain[-1].hash(),
             proof=0,  # Proof is not needed in PoS
             transactions=self.current_transactions,
+            consensus="PoS",
         )
         self.chain.append(block)
         self.current_transactions = []
@@ -109,8 +126,45 @@ class Blockchain:
         reward_transaction = Transaction("System", miner, 10)
         self.total_supply += 10
         self.nodes[miner] += 10
+        bus.publish("block", lambda: {**block.to_dict(), "hash": block.hash(), "miner": miner})
+        self.vote_checkpoint()
         return f"Block {block.index} mined successfully by {miner} using Proof of Stake!"
 
+    def vote_checkpoint(self):
+        finalized = self.finality.finalized_height
+        voters = [node for node in self.stakes if node not in self.offline_validators]
+        self.finality.on_block(self.chain, self.stakes, voters)
+        if self.finality.finalized_height != finalized:
+            bus.publish("finality", {
+                "epoch": self.finality.finalized_epoch,
+                "height": self.finality.finalized_height,
+                "hash": self.finality.finalized_hash,
+            })
+
+    def validate_chain(self, chain=None):
+        # PoW blocks must carry a valid proof; PoS blocks carry none and are
+        # secured by finality. Blocks up to the finalized checkpoint are
+        # immutable and not re-checked.
+        chain = self.chain if chain is None else chain
+        if self.finality.conflicts(chain):
+            return False
+        for i in range(max(self.finality.finalized_height, 0) + 1, len(chain)):
+            previous_hash = chain[i - 1].hash()
+            if chain[i].previous_hash != previous_hash:
+                return False
+            if chain[i].consensus == "PoW" and not self.valid_proof(previous_hash, chain[i].proof):
+                return False
+        return True
+
+    def prune_finalized(self):
+        # Drop transaction bodies behind the finalized checkpoint; hashes stay
+        pruned = 0
+        for block in self.chain[self.pruned_height + 1:self.finality.finalized_height]:
+            block.prune()
+            pruned += 1
+        self.pruned_height = max(self.pruned_height, self.finality.finalized_height - 1)
+        return pruned
+
     def proof_of_work(self, last_block):
         proof = 0
         while not self.valid_proof(last_block.hash(), proof):
@@ -129,6 +183,7 @@ class Blockchain:
             return "Insufficient balance to stake!"
         self.nodes[participant] -= amount
         self.stakes[participant] += amount
+        bus.publish("stake", {"participant": participant, "amount": amount, "stake": self.stakes[participant]})
         return f"{participant} staked {amount} MyCoins."
 
     def select_miner_by_stake(self):
@@ -217,6 +272,25 @@ if st.button("Mine Block"):
         else:
             st.error(result)
 
+# Finality
+st.subheader("Finality Checkpoints")
+st.caption(f"The first PoS block at or past every {blockchain.finality.epoch_length}th height is a checkpoint; 2/3 of stake finalizes it.")
+blockchain.offline_validators = set(st.multiselect(
+    "Offline Validators",
+    [node for node, stake in blockchain.stakes.items() if stake > 0],
+    key="offline_validators",
+))
+st.info(
+    f"Finalized up to block {blockchain.finality.finalized_height} "
+    f"(epoch {blockchain.finality.finalized_epoch}), chain height {len(blockchain.chain) - 1}."
+)
+if blockchain.finality.slashed:
+    st.warning(f"Slashed validators: {', '.join(blockchain.finality.slashed)}")
+if blockchain.finality.display_epochs():
+    st.table(blockchain.finality.display_epochs())
+if st.button("Prune Finalized Blocks"):
+    st.success(f"Pruned {blockchain.prune_finalized()} block bodies; chain valid: {blockchain.validate_chain()}")
+
 # Display Balances and Stakes
 st.subheader("Balances and Stakes")
 if st.button("Show Balances and Stakes"):
@@ -3,6 +3,13 @@ import json
 import random
 from time import time
 import streamlit as st
+from Chains import PersistentChain
+from Events import bus
+from Indexes import BlockTreeIndex
+from Lazy import LazyBlock, canonical
+from Metrics import metrics, profile_call, render_panel
+from Relay import CompactBlock, full_block_size, reconstruct, respond_block_txn
+from Simulator import MAX_FULL_NODES, simulate
 
 
 class Transaction:
@@ -15,6 +22,10 @@ class Transaction:
         return {"sender": self.sender, "receiver": self.receiver, "amount": self.amount}
 
 
+def transaction_from_dict(data):
+    return Transaction(**data)
+
+
 class Block:
     def __init__(self, index, previous_hash, proof, transactions, timestamp=None):
         self.index = index
@@ -34,20 +45,32 @@ class Block:
 
     def hash(self):
         block_string = json.dumps(self.to_dict(), sort_keys=True).encode()
+        metrics.inc("block_hash_total")
+        metrics.inc("block_serialized_bytes_total", len(block_string))
         return hashlib.sha256(block_string).hexdigest()
 
 
+def seal(block):
+    # Chains hold buffer-backed blocks: hashing, linking and length checks
+    # never decode their transactions
+    return LazyBlock.from_block(block, transaction_from_dict)
+
+
 class Blockchain:
-    def __init__(self):
-        self.chain = []
+    def __init__(self, index=None):
+        self.chain = PersistentChain()  # Immutable, shares history with synced nodes
         self.current_transactions = []
         self.nodes = {}
         self.total_supply = 0
+        # Shared between nodes like the chains are; query it via history()
+        self.index = index if index is not None else BlockTreeIndex()
+        self.view = None  # Last view of the index, reused while the chain grows
         self.create_genesis_block()
 
     def create_genesis_block(self):
-        genesis_block = Block(0, "0", 100, [])
-        self.chain.append(genesis_block)
+        genesis_block = seal(Block(0, "0", 100, []))
+        self.chain = self.chain.append(genesis_block)
+        self.index.add_block(genesis_block)
 
     def register_node(self, address):
         if address in self.nodes:
@@ -60,29 +83,35 @@ class Blockchain:
             return "Sender or receiver is not a registered node!"
         transaction = Transaction(sender, receiver, amount)
         self.current_transactions.append(transaction)
+        bus.publish("transaction", transaction.to_dict)
         return f"Transaction from {sender} to {receiver} for {amount} MyCoins added."
 
     def mine_block(self, miner):
         if miner not in self.nodes:
             return "Miner must be a registered node!"
         proof = self.proof_of_work(self.chain[-1])
-        block = Block(
+        block = seal(Block(
             index=len(self.chain),
             previous_hash=self.chain[-1].hash(),
             proof=proof,
             transactions=self.current_transactions,
-        )
-        self.chain.append(block)
+        ))
+        self.chain = self.chain.append(block)
+        self.index.add_block(block)
         self.current_transactions = []
 
         # Reward miner
         self.nodes[miner] += 10
+        bus.publish("block", lambda: {**block.to_dict(), "hash": block.hash(), "miner": miner})
         return f"Block {block.index} mined successfully by {miner}!"
 
+    @metrics.timed("proof_of_work")
     def proof_of_work(self, last_block):
+        last_hash = last_block.hash()
         proof = 0
-        while not self.valid_proof(last_block.hash(), proof):
+        while not self.valid_proof(last_hash, proof):
             proof += 1
+        metrics.inc("pow_hashes_total", proof + 1)
         return proof
 
     def valid_proof(self, last_hash, proof):
@@ -90,22 +119,68 @@ class Blockchain:
         guess_hash = hashlib.sha256(guess).hexdigest()
         return guess_hash[:4] == "0000"
 
-    def validate_chain(self, chain):
-        for i in range(1, len(chain)):
-            current = chain[i]
-            previous = chain[i - 1]
-            if current.previous_hash != previous.hash():
+    @metrics.timed("validate_chain")
+    def validate_chain(self, chain, start=1):
+        # Blocks before `start` are trusted (e.g. a prefix we already hold)
+        blocks = chain[max(start, 1) - 1:]
+        for previous, current in zip(blocks, blocks[1:]):
+            previous_hash = previous.hash()
+            if current.previous_hash != previous_hash:
                 return False
-            if not self.valid_proof(previous.hash(), current.proof):
+            if not self.valid_proof(previous_hash, current.proof):
                 return False
+            metrics.inc("blocks_validated_total")
         return True
 
+    @metrics.timed("replace_chain")
     def replace_chain(self, new_chain):
-        if len(new_chain) > len(self.chain) and self.validate_chain(new_chain):
+        if len(new_chain) <= len(self.chain):
+            return False
+        shared = self.chain.common_ancestor(new_chain) if isinstance(new_chain, PersistentChain) else 0
+        if self.validate_chain(new_chain, start=max(shared, 1)):
+            old_tip = self.chain[-1]
+            fork = shared
             self.chain = new_chain
+            # Nodes share the index, so only blocks nobody has seen get added
+            for block in reversed(new_chain):
+                if not self.index.add_block(block):
+                    break
+            bus.publish("reorg", lambda: {
+                "fork_height": fork,
+                "old_tip": old_tip.hash(),
+                "new_tip": new_chain[-1].hash(),
+                "height": len(new_chain) - 1,
+            })
             return True
         return False
 
+    def accept_transaction(self, transaction):
+        # Gossiped from a peer; the peer already checked it
+        self.current_transactions.append(transaction)
+
+    def receive_block(self, block):
+        tip = self.chain[-1]
+        if block.previous_hash != tip.hash() or not self.valid_proof(block.previous_hash, block.proof):
+            return False
+        if not isinstance(block, LazyBlock):
+            block = seal(block)
+        self.chain = self.chain.append(block)
+        self.index.add_block(block)
+        # Compared as canonical bytes, straight from the block's buffer
+        included = {bytes(block.transactions.raw(i)) for i in range(len(block.transactions))}
+        self.current_transactions = [
+            tx for tx in self.current_transactions
+            if canonical(tx.to_dict()) not in included
+        ]
+        bus.publish("block", lambda: {**block.to_dict(), "hash": block.hash()})
+        return True
+
+    def history(self):
+        # This node's view of the shared index
+        if self.view is None or self.view.chain is not self.chain:
+            self.view = self.index.view(self.chain, self.view)
+        return self.view
+
     def display_chain(self):
         return [block.to_dict() for block in self.chain]
 
@@ -113,16 +188,42 @@ class Blockchain:
 # Initialize Nodes in Session State
 if "nodes" not in st.session_state:
     st.session_state.nodes = {}
+    st.session_state.index = BlockTreeIndex()  # One index for every node's chain
 
 
 # Helper Functions
 def create_new_node(node_name):
     if node_name in st.session_state.nodes:
         return f"Node {node_name} already exists!"
-    st.session_state.nodes[node_name] = Blockchain()
+    st.session_state.nodes[node_name] = Blockchain(index=st.session_state.index)
     return f"Node {node_name} created!"
 
 
+def relay_block(source_name, target_name):
+    source = st.session_state.nodes[source_name]
+    target = st.session_state.nodes[target_name]
+    block = source.chain[-1]
+    message = CompactBlock.from_block(block).encode()
+    partial = reconstruct(CompactBlock.decode(message), target.current_transactions, Transaction)
+    request = partial.request()
+    missing_txs = respond_block_txn(block, request) if request["indexes"] else []
+    rebuilt = partial.complete(missing_txs, Transaction, Block)
+    if rebuilt is None:
+        # Fall back to the full block, e.g. after a short-ID collision
+        rebuilt = block
+    relayed = len(message) + len(json.dumps(request)) + len(json.dumps(missing_txs))
+    metrics.inc("relay_compact_bytes_total", relayed)
+    metrics.inc("relay_full_bytes_total", full_block_size(block))
+    return {
+        "accepted": target.receive_block(rebuilt),
+        "transactions": len(block.transactions),
+        "missing": len(request["indexes"]),
+        "compact_bytes": relayed,
+        "full_block_bytes": full_block_size(block),
+    }
+
+
+@metrics.timed("sync_all_nodes")
 def sync_all_nodes():
     longest_chain = max(
         [node.chain for node in st.session_state.nodes.values()], key=len
@@ -172,19 +273,38 @@ selected_node_tx = st.selectbox("Select Node for Transaction", st.session_state.
 sender = st.text_input("Sender", key="tx_sender")
 receiver = st.text_input("Receiver", key="tx_receiver")
 amount = st.number_input("Amount", min_value=0.0, step=0.1, key="tx_amount")
+broadcast = st.checkbox("Gossip to all other nodes' mempools", key="tx_broadcast")
 if st.button("Add Transaction"):
     if selected_node_tx and sender and receiver and amount > 0:
         blockchain = st.session_state.nodes[selected_node_tx]
         result = blockchain.create_transaction(sender, receiver, amount)
+        if broadcast and "added" in result:
+            for name, node in st.session_state.nodes.items():
+                if name != selected_node_tx:
+                    node.accept_transaction(blockchain.current_transactions[-1])
         st.success(result)
     else:
         st.error("Please fill in all fields correctly.")
 
+# Relay a Block
+st.subheader("Relay Latest Block (Compact)")
+relay_from = st.selectbox("From Node", st.session_state.nodes.keys(), key="relay_from")
+relay_to = st.selectbox("To Node", st.session_state.nodes.keys(), key="relay_to")
+if st.button("Relay Block"):
+    if relay_from and relay_to and relay_from != relay_to:
+        st.json(relay_block(relay_from, relay_to))
+    else:
+        st.error("Please select two different nodes.")
+
 # Sync Nodes
 st.subheader("Sync All Nodes")
 if st.button("Sync Nodes"):
     result = sync_all_nodes()
     st.success(result)
+if st.button("Profile One Sync"):
+    result, stats = profile_call(sync_all_nodes)
+    st.success(result)
+    st.code(stats, language="text")
 
 # Display Blockchain of a Node
 st.subheader("Display Node Blockchain")
@@ -197,3 +317,29 @@ if st.button("Show Blockchain"):
             st.json(block)
     else:
         st.error("Please select a node.")
+
+# Large-Scale Network Simulation
+st.subheader("Simulate a Large Network")
+sim_nodes = st.number_input("Nodes", min_value=2, max_value=20000, value=1000, step=100, key="sim_nodes")
+sim_topology = st.selectbox("Topology", ["random", "ring", "star", "full"], key="sim_topology")
+sim_interval = st.number_input("Block Interval (s)", min_value=0.1, value=10.0, key="sim_interval")
+sim_tx_rate = st.number_input("Transactions per Second", min_value=0.0, value=50.0, key="sim_tx_rate")
+sim_duration = st.number_input("Simulated Duration (s)", min_value=1.0, value=600.0, key="sim_duration")
+sim_seed = st.number_input("Seed", min_value=0, value=0, step=1, key="sim_seed")
+if sim_topology == "full" and sim_nodes > MAX_FULL_NODES:
+    st.warning(f"A full topology is limited to {MAX_FULL_NODES} nodes; use random for larger networks.")
+elif st.button("Run Simulation"):
+    report = simulate(
+        duration=sim_duration,
+        n_nodes=int(sim_nodes),
+        topology=sim_topology,
+        block_interval=sim_interval,
+        tx_rate=sim_tx_rate,
+        seed=int(sim_seed),
+    )
+    st.json(report)
+
+# Diagnostics
+st.subheader("Diagnostics")
+if st.checkbox("Show Metrics", key="show_metrics"):
+    render_panel(st)
@@ -5,27 +5,54 @@ import networkx as nx
 import matplotlib.pyplot as plt
 import streamlit as st
 import plotly.express as px
-from time import time
+from time import perf_counter, time
+from Admission import AdmissionControl
+from Analytics import LedgerAnalytics
+from Channels import ChannelManager
+from Events import bus
+from Expiry import MempoolExpiry
+from Finality import FinalityGadget
+from Metrics import metrics, render_panel
+from State import AccountState, block_deltas
+from Wal import LogLockedError, MempoolLog
+
+MEMPOOL_WAL = "mempool.wal"
+DEFAULT_TTL = 3600  # Seconds a transaction may wait in the mempool
 
 # --- Blockchain Classes ---
 class Transaction:
-    def __init__(self, sender, receiver, amount, fee=0):
+    def __init__(self, sender, receiver, amount, fee=0, expires_at=None, expires_height=None):
         self.sender = sender
         self.receiver = receiver
         self.amount = amount
         self.fee = fee
+        self.expires_at = expires_at  # Unix time after which it can no longer be mined
+        self.expires_height = expires_height  # Last block height it may be included in
+        self.wal_id = None  # Record id in the mempool log, once logged
 
     def to_dict(self):
-        return {"sender": self.sender, "receiver": self.receiver, "amount": self.amount, "fee": self.fee}
+        data = {"sender": self.sender, "receiver": self.receiver, "amount": self.amount, "fee": self.fee}
+        if self.expires_at is not None:
+            data["expires_at"] = self.expires_at
+        if self.expires_height is not None:
+            data["expires_height"] = self.expires_height
+        return data
 
 
 class Block:
-    def __init__(self, index, previous_hash, proof, transactions, timestamp=None):
+    def __init__(self, index, previous_hash, proof, transactions, timestamp=None, state_root=None, consensus="PoW"):
         self.index = index
         self.timestamp = timestamp or time()
         self.transactions = transactions
         self.proof = proof
         self.previous_hash = previous_hash
+        self.state_root = state_root  # Confirmed balances and stakes after this block
+        self.consensus = consensus  # "PoW" blocks must carry a valid proof of work
+        self.pruned_hash = None  # Set once the body is dropped behind a finalized checkpoint
+
+    def prune(self):
+        self.pruned_hash = self.hash()
+        self.transactions = []
 
     def to_dict(self):
         return {
@@ -34,42 +61,118 @@ class Block:
             "transactions": [tx.to_dict() for tx in self.transactions],
             "proof": self.proof,
             "previous_hash": self.previous_hash,
+            "state_root": self.state_root,
+            "consensus": self.consensus,
         }
 
     def hash(self):
+        if self.pruned_hash:
+            return self.pruned_hash
         block_string = json.dumps(self.to_dict(), sort_keys=True).encode()
+        metrics.inc("block_hash_total")
+        metrics.inc("block_serialized_bytes_total", len(block_string))
         return hashlib.sha256(block_string).hexdigest()
 
 
 class Blockchain:
-    def __init__(self):
+    def __init__(self, wal_path=None, admission=None):
         self.chain = []
         self.current_transactions = []
         self.nodes = set()
-        self.create_genesis_block()
         self.total_supply = 1000000  # MyCoin total supply
         self.participants = {"System": self.total_supply}  # Initial supply goes to "System"
         self.stakes = {}  # Track participants' stakes for PoS
+        # Confirmed balances and stakes; each header's state_root commits to them
+        self.state = AccountState()
+        self.state.put("System", self.total_supply, 0)
+        self.pending_stakes = {}  # Staked since the last block, recorded with the next one
+        self.wal = None
+        if wal_path:
+            self.wal = MempoolLog(wal_path)
+            self.restore_confirmed()
+        self.create_genesis_block()
         self.mining_mode = 'PoW'  # Default to PoW mode
+        self.finality = FinalityGadget(epoch_length=4)
+        self.offline_validators = set()  # Staked nodes that withhold their checkpoint votes
+        self.pruned_height = 0
+        self.expiry = MempoolExpiry(now=time(), height=len(self.chain))
+        self.admission = admission  # Optional AdmissionControl: rate limits and fee floors
+        if self.wal:
+            self.recover_mempool()
+
+    def restore_confirmed(self):
+        # Confirmed balances and stakes as of the last block mined before
+        # the restart; the chain restarts from a genesis that commits to them
+        for name, (balance, stake) in self.wal.confirmed_accounts().items():
+            if name != "System":
+                self.nodes.add(name)
+            self.participants[name] = balance
+            self.stakes[name] = stake
+            self.state.put(name, balance, stake)
+
+    def recover_mempool(self):
+        # Re-admit logged transactions and re-apply their pending debits on
+        # top of the restored confirmed balances. Every entry was checked
+        # against those when it was admitted, so it is replayed as logged.
+        expired = []
+        for wal_id, tx in self.wal.pending_transactions():
+            for node in (tx["sender"], tx["receiver"]):
+                self.nodes.add(node)
+                self.participants.setdefault(node, 0)
+                self.stakes.setdefault(node, 0)
+            transaction = Transaction(
+                tx["sender"], tx["receiver"], tx["amount"], tx.get("fee", 0),
+                tx.get("expires_at"), tx.get("expires_height"),
+            )
+            transaction.wal_id = wal_id
+            self.current_transactions.append(transaction)
+            self.participants[transaction.sender] -= (transaction.amount + transaction.fee)
+            self.participants[transaction.receiver] += transaction.amount
+            if not self.expiry.schedule(transaction):
+                expired.append(transaction)
+        # Whatever expired while the node was down is refunded right away
+        self.expire(expired)
+        self.expire_transactions()
+        return len(self.current_transactions)
 
     def create_genesis_block(self):
-        genesis_block = Block(0, "0", 100, [])
+        genesis_block = Block(0, "0", 100, [], state_root=self.state.commit())
         self.chain.append(genesis_block)
 
     def register_node(self, address):
+        if self.admission and address not in self.nodes:
+            rejected = self.admission.admit_registration(address, len(self.nodes))
+            if rejected:
+                return rejected
         self.nodes.add(address)
         self.participants[address] = 0  # Add new participant with zero balance
         self.stakes[address] = 0  # Initial stake of 0
         return f"Node {address} added to the network."
 
-    def create_transaction(self, sender, receiver, amount, fee=0):
+    def create_transaction(self, sender, receiver, amount, fee=0, ttl=DEFAULT_TTL, expires_height=None):
+        self.expire_transactions()
+        if self.admission:
+            rejected = self.admission.precheck(sender, [receiver], [amount], fee)
+            if rejected:
+                return rejected
         if sender not in self.nodes or receiver not in self.nodes:
             return "Sender or receiver is not a registered node!"
+        if self.admission:
+            rejected = self.admission.admit(sender, len(self.current_transactions), fee)
+            if rejected:
+                return rejected
         if self.participants[sender] < amount + fee:
             return "Sender has insufficient balance!"
         
-        transaction = Transaction(sender, receiver, amount, fee)
+        expires_at = time() + ttl if ttl else None
+        transaction = Transaction(sender, receiver, amount, fee, expires_at, expires_height)
+        if not self.expiry.schedule(transaction):
+            return "Transaction has already expired!"
+        if self.wal:
+            # Blocks until the record is durable (shared group-commit fsync)
+            transaction.wal_id = self.wal.add(transaction.to_dict())
         self.current_transactions.append(transaction)
+        bus.publish("transaction", transaction.to_dict)
         self.participants[sender] -= (amount + fee)
         self.participants[receiver] += amount
         return f"Transaction from {sender} to {receiver} for {amount} MyCoins added."
@@ -82,24 +185,41 @@ class Blockchain:
             proof = self.proof_of_work(self.chain[-1])
         elif self.mining_mode == 'PoS':
             proof = self.proof_of_stake(miner)
+        # Nothing that expired (by time, or before this height) gets mined
+        self.expire_transactions(height=len(self.chain))
 
         block = Block(
             index=len(self.chain),
             previous_hash=self.chain[-1].hash(),
             proof=proof,
             transactions=self.current_transactions,
+            consensus=self.mining_mode,
         )
+        block.state_root = self.state.apply_block(block, self.pending_stakes)
+        touched = block_deltas(block.transactions).keys() | self.pending_stakes.keys()
+        self.pending_stakes = {}
         self.chain.append(block)
         self.current_transactions = []
+        for tx in block.transactions:
+            self.expiry.cancel(tx)
+        if self.wal:
+            confirmed = {name: [self.state.balance(name), self.state.stake(name)] for name in touched}
+            self.wal.confirm([tx.wal_id for tx in block.transactions], confirmed)
+        bus.publish("block", lambda: {**block.to_dict(), "hash": block.hash(), "miner": miner})
+        if self.mining_mode == 'PoS':
+            self.vote_checkpoint()
 
         # Reward miner
         self.create_transaction("System", miner, 10)  # Reward 10 MyCoins for mining
         return f"Block {block.index} mined successfully by {miner}!"
 
+    @metrics.timed("proof_of_work")
     def proof_of_work(self, last_block):
+        last_hash = last_block.hash()
         proof = 0
-        while not self.valid_proof(last_block.hash(), proof):
+        while not self.valid_proof(last_hash, proof):
             proof += 1
+        metrics.inc("pow_hashes_total", proof + 1)
         return proof
 
     def proof_of_stake(self, miner):
@@ -114,9 +234,125 @@ class Blockchain:
         guess_hash = hashlib.sha256(guess).hexdigest()
         return guess_hash[:4] == "0000"
 
+    def stake_currency(self, participant, amount):
+        if participant not in self.nodes:
+            return "Participant must be a registered node!"
+        if self.participants[participant] < amount:
+            return "Insufficient balance to stake!"
+        self.participants[participant] -= amount
+        self.stakes[participant] += amount
+        self.pending_stakes[participant] = self.pending_stakes.get(participant, 0) + amount
+        bus.publish("stake", {"participant": participant, "amount": amount, "stake": self.stakes[participant]})
+        return f"{participant} staked {amount} MyCoins."
+
+    def vote_checkpoint(self):
+        # Validators live in this process and vote as soon as a checkpoint
+        # opens; only those marked offline in the UI hold back, which is how
+        # the 2/3 threshold gets contested
+        finalized = self.finality.finalized_height
+        voters = [node for node in self.stakes if node not in self.offline_validators]
+        self.finality.on_block(self.chain, self.stakes, voters)
+        if self.finality.finalized_height != finalized:
+            bus.publish("finality", {
+                "epoch": self.finality.finalized_epoch,
+                "height": self.finality.finalized_height,
+                "hash": self.finality.finalized_hash,
+            })
+
+    def validate_chain(self, chain=None):
+        # PoW blocks must carry a valid proof; PoS blocks carry none and are
+        # secured by finality. The finalized prefix is immutable and not
+        # re-checked.
+        chain = self.chain if chain is None else chain
+        if self.finality.conflicts(chain):
+            return False
+        for i in range(self.finality.finalized_height + 1, len(chain)):
+            previous_hash = chain[i - 1].hash()
+            if chain[i].previous_hash != previous_hash:
+                return False
+            if chain[i].consensus == "PoW" and not self.valid_proof(previous_hash, chain[i].proof):
+                return False
+        return True
+
+    def prune_finalized(self):
+        # Drop transaction bodies behind the finalized checkpoint; hashes stay
+        pruned = 0
+        for block in self.chain[self.pruned_height + 1:self.finality.finalized_height]:
+            block.prune()
+            pruned += 1
+        self.pruned_height = max(self.pruned_height, self.finality.finalized_height - 1)
+        return pruned
+
+    def refund(self, tx):
+        # Undo the reservation made at admission (the receiver was credited too)
+        self.participants[tx.sender] += tx.amount + tx.fee
+        self.participants[tx.receiver] -= tx.amount
+
+    def with_dependents(self, expired):
+        # A receiver is credited on admission and may already have spent
+        # that credit. When taking the credit back would leave it below
+        # zero, its own later pending spends go too (newest first, until
+        # the shortfall is covered), and so on down the chain.
+        position = {id(tx): i for i, tx in enumerate(self.current_transactions)}
+        gone = {id(tx) for tx in expired}
+        expired = list(expired)
+        refunds = {}  # account -> balance change from the expiries so far
+        queue = list(expired)
+        while queue:
+            tx = queue.pop()
+            refunds[tx.sender] = refunds.get(tx.sender, 0) + tx.amount + tx.fee
+            refunds[tx.receiver] = refunds.get(tx.receiver, 0) - tx.amount
+            balance = self.participants[tx.receiver] + refunds[tx.receiver]
+            if balance >= 0:
+                continue
+            shortfall = min(tx.amount, -balance)
+            for child in reversed(self.current_transactions[position.get(id(tx), -1) + 1:]):
+                if shortfall <= 0:
+                    break
+                if child.sender == tx.receiver and id(child) not in gone:
+                    gone.add(id(child))
+                    expired.append(child)
+                    queue.append(child)
+                    shortfall -= child.amount + child.fee
+        return expired
+
+    def expire_transactions(self, now=None, height=None):
+        expired = self.expiry.advance(time() if now is None else now, len(self.chain) if height is None else height)
+        return self.expire(expired)
+
+    def expire(self, expired):
+        if not expired:
+            return 0
+        expired = self.with_dependents(expired)
+        for tx in expired:
+            self.expiry.cancel(tx)
+            self.refund(tx)
+        gone = {id(tx) for tx in expired}
+        self.current_transactions = [tx for tx in self.current_transactions if id(tx) not in gone]
+        if self.wal:
+            self.wal.remove([tx.wal_id for tx in expired])
+        metrics.inc("mempool_expired_total", len(expired))
+        bus.publish("expired", lambda: [tx.to_dict() for tx in expired])
+        return len(expired)
+
+    def clear_transactions(self):
+        for tx in self.current_transactions:
+            self.expiry.cancel(tx)
+            self.refund(tx)
+        self.current_transactions = []
+        if self.wal:
+            self.wal.clear()
+
     def display_balances(self):
         return self.participants
 
+    def state_root(self):
+        return self.state.root()
+
+    def confirmed_account(self, name):
+        # Balance and stake as of the last block, from the committed state
+        return self.state.account(name)
+
     def display_chain(self):
         return [block.to_dict() for block in self.chain]
 
@@ -129,9 +365,24 @@ class Blockchain:
 
 # --- Streamlit Interface ---
 if "blockchain" not in st.session_state:
-    st.session_state.blockchain = Blockchain()
+    try:
+        st.session_state.blockchain = Blockchain(wal_path=MEMPOOL_WAL, admission=AdmissionControl())
+    except LogLockedError:
+        # Another session owns the log; this one keeps its mempool in memory only
+        st.session_state.blockchain = Blockchain(admission=AdmissionControl())
 
 blockchain = st.session_state.blockchain
+if blockchain.wal:
+    st.sidebar.caption(f"Mempool log {MEMPOOL_WAL}: {len(blockchain.current_transactions)} pending")
+
+# Columnar copy of the confirmed ledger, extended with new blocks on each rerun
+if "analytics" not in st.session_state:
+    st.session_state.analytics = LedgerAnalytics()
+analytics = st.session_state.analytics
+
+if "channels" not in st.session_state:
+    st.session_state.channels = ChannelManager(blockchain)
+channels = st.session_state.channels
 
 st.title("MyCoin Blockchain")
 
@@ -151,8 +402,12 @@ if st.button("Register Node"):
 
 # Task 2: Display Pending Transactions
 st.subheader("Pending Transactions")
+expired_count = blockchain.expire_transactions()
+if expired_count:
+    st.info(f"{expired_count} pending transactions expired and were refunded.")
 for tx in blockchain.current_transactions:
-    st.write(f"{tx.sender} → {tx.receiver}: {tx.amount} MyCoins (Fee: {tx.fee})")
+    expiry = f", expires in {max(tx.expires_at - time(), 0):.0f}s" if tx.expires_at else ""
+    st.write(f"{tx.sender} → {tx.receiver}: {tx.amount} MyCoins (Fee: {tx.fee}{expiry})")
 
 # Task 3: Add Proof of Stake (PoS) and PoW
 st.subheader("Mining Mode: Proof of Work (PoW) / Proof of Stake (PoS)")
@@ -162,6 +417,33 @@ if st.button("Toggle Mining Mode"):
     blockchain.toggle_mining_mode()
     st.write(f"Mining mode switched to: {blockchain.mining_mode}")
 
+# Stake MyCoins for PoS block production and checkpoint votes
+staker = st.text_input("Participant to Stake", key="staker")
+stake_amount = st.number_input("Stake Amount", min_value=0.0, step=0.1, key="stake_amount")
+if st.button("Stake Currency"):
+    if staker and stake_amount > 0:
+        result = blockchain.stake_currency(staker, stake_amount)
+        if "staked" in result:
+            st.success(result)
+        else:
+            st.error(result)
+    else:
+        st.error("Please provide valid participant and amount.")
+blockchain.offline_validators = set(st.multiselect(
+    "Offline Validators (withhold checkpoint votes)",
+    [node for node, stake in blockchain.stakes.items() if stake > 0],
+    key="offline_validators",
+))
+st.info(
+    f"Finalized up to block {blockchain.finality.finalized_height} "
+    f"(epoch {blockchain.finality.finalized_epoch}); the first PoS block at or past every "
+    f"{blockchain.finality.epoch_length}th height is a checkpoint, final once 2/3 of stake votes for it."
+)
+if blockchain.finality.display_epochs():
+    st.table(blockchain.finality.display_epochs())
+if st.button("Prune Finalized Blocks"):
+    st.success(f"Pruned {blockchain.prune_finalized()} block bodies; chain valid: {blockchain.validate_chain()}")
+
 # Task 4: Simulate Mining a Block
 miner_name = st.text_input("Enter Miner Name", key="miner_name")
 if st.button("Mine Block"):
@@ -173,33 +455,100 @@ if st.button("Mine Block"):
 
 # Task 5: Visualize Blockchain
 st.subheader("Blockchain Visualization")
+render_started = perf_counter()
+analytics.sync(blockchain.chain)
 
-# Generate Blockchain graph using NetworkX
+# Generate Blockchain graph using NetworkX (one edge per sender/receiver pair)
 G = nx.DiGraph()
-for block in blockchain.chain:
-    for tx in block.transactions:
-        G.add_edge(tx.sender, tx.receiver, weight=tx.amount)
+flows = analytics.flows()
+G.add_weighted_edges_from(zip(flows["sender"], flows["receiver"], flows["amount"]))
 
 # Use NetworkX to create a graph
 fig, ax = plt.subplots(figsize=(10, 8))
 pos = nx.spring_layout(G)
 nx.draw(G, pos, with_labels=True, node_size=5000, node_color="lightblue", font_size=10, ax=ax)
 st.pyplot(fig)
+metrics.observe("render_graph", perf_counter() - render_started)
 
 # Add Pie Chart for Balances
 st.subheader("Participant Balances - Pie Chart")
+render_started = perf_counter()
 balances = blockchain.display_balances()
 labels = list(balances.keys())
 values = list(balances.values())
 fig = px.pie(names=labels, values=values, title="Balances of Participants")
 st.plotly_chart(fig)
+metrics.observe("render_pie_chart", perf_counter() - render_started)
+
+# Ledger Analytics
+st.subheader("Ledger Analytics")
+render_started = perf_counter()
+st.write(f"Confirmed transactions: {analytics.tx_count} | Fees burned: {analytics.fee_totals()['total']}")
+st.write("Top holders (confirmed)")
+st.table([{"participant": name, "balance": balance} for name, balance in analytics.top_holders(10)])
+supply = analytics.supply_over_time()
+st.plotly_chart(px.line(supply, x="height", y="supply", title="Circulating Supply by Block"))
+history_account = st.selectbox("Balance History For", sorted(blockchain.nodes), key="history_account")
+if history_account:
+    history = analytics.balance_history(history_account)
+    st.plotly_chart(px.line(history, x="height", y="balance", markers=True, title=f"Balance of {history_account}"))
+if st.checkbox("Show Flow Matrix", key="show_flow_matrix"):
+    st.plotly_chart(px.imshow(analytics.flow_matrix(), text_auto=True, title="Sender → Receiver Flows"))
+metrics.observe("render_analytics", perf_counter() - render_started)
 
 # Display Blockchain in JSON format
 st.subheader("Blockchain")
+st.caption(f"State root (confirmed balances and stakes): {blockchain.state_root()}")
+render_started = perf_counter()
 chain_data = blockchain.display_chain()
 st.write(chain_data)
+metrics.observe("render_chain_json", perf_counter() - render_started)
+
+# Payment Channels
+st.subheader("Payment Channels")
+channel_a = st.text_input("Party A", key="channel_a")
+channel_b = st.text_input("Party B", key="channel_b")
+deposit_a = st.number_input("Deposit A", min_value=0.0, step=1.0, key="deposit_a")
+deposit_b = st.number_input("Deposit B", min_value=0.0, step=1.0, key="deposit_b")
+if st.button("Open Channel"):
+    result = channels.open_channel(channel_a, channel_b, deposit_a, deposit_b)
+    if "opened" in result:
+        st.success(result)
+    else:
+        st.error(result)
+
+open_channels = [c.id for c in channels.channels.values() if c.status != "closed"]
+selected_channel = st.selectbox("Channel", open_channels, key="selected_channel")
+channel_payer = st.text_input("Payer", key="channel_payer")
+channel_amount = st.number_input("Off-Chain Amount", min_value=0.0, step=0.1, key="channel_amount")
+channel_count = st.number_input("Repeat", min_value=1, value=1, step=1000, key="channel_count")
+if st.button("Pay Off-Chain"):
+    if selected_channel:
+        started = perf_counter()
+        for _ in range(int(channel_count)):
+            result = channels.pay(selected_channel, channel_payer, channel_amount)
+            if "Paid" not in result:
+                break
+        elapsed = perf_counter() - started
+        if "Paid" in result:
+            st.success(f"{result} x{int(channel_count)} in {elapsed * 1000:.1f} ms")
+        else:
+            st.error(result)
+if st.button("Close Channel"):
+    if selected_channel:
+        result = channels.close(selected_channel)
+        if "settled" in result:
+            st.success(result)
+        else:
+            st.error(result)
+if channels.channels:
+    st.table(channels.display_channels())
 
 # Clear Transactions Button
 if st.button("Clear Transactions"):
-    blockchain.current_transactions.clear()
-    st.success("Transactions cleared!")
+    blockchain.clear_transactions()
+    st.success("Transactions cleared and refunded!")
+
+# Diagnostics
+if st.sidebar.checkbox("Show Diagnostics", key="show_diagnostics"):
+    render_panel(st.sidebar)
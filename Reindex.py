@@ -0,0 +1,236 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+from Blockchain import transaction_from_dict
+from Export import FORMAT, open_text, pq, require_pyarrow
+from State import AccountState, block_deltas
+
+
+class StateDelta:
+    """Balance changes and first-seen accounts over a contiguous height range.
+
+    Each block's change per account is worked out by State.block_deltas, as
+    AccountState.apply_block does, and kept in block order. Once a range
+    starts at genesis its changes are folded into balances in that same
+    order, so merged ranges reproduce the chain's own (floating-point)
+    balances bit for bit and their state root can be checked against the
+    block headers.
+    """
+
+    def __init__(self):
+        self.first = None  # lowest height in the range
+        self.last = None
+        self.tip = None  # hash of the block at `last`, if the export stored it
+        self.tip_root = None  # state_root in the header of the block at `last`
+        self.tx_count = 0
+        self.nodes = []  # registered nodes from the export metadata
+        # account -> per-block changes in block order; a range that starts at
+        # genesis keeps one entry, the account's balance
+        self.changes = {}
+
+    def apply(self, account, deltas):
+        if self.first != 0:
+            self.changes.setdefault(account, []).extend(deltas)
+            return
+        balance = self.changes[account][0] if account in self.changes else 0
+        for delta in deltas:
+            balance = balance + delta
+        self.changes[account] = [balance]
+
+    def balance(self, account):
+        # Only meaningful for a range that starts at genesis
+        return self.changes[account][0] if account in self.changes else 0
+
+    def add_block(self, block):
+        if self.first is None:
+            self.first = block["index"]
+        elif block["index"] != self.last + 1:
+            raise ValueError(f"Block {self.last + 1} is missing from the chain")
+        self.last = block["index"]
+        self.tip = block.get("hash")
+        self.tip_root = block.get("state_root")
+        transactions = [transaction_from_dict(tx) for tx in block["transactions"]]
+        for account, delta in block_deltas(transactions).items():
+            self.apply(account, (delta,))
+        self.tx_count += len(transactions)
+
+    def merge(self, later):
+        # `later` must start right after this range ends
+        if later.first is None:
+            self.nodes.extend(later.nodes)
+            return self
+        expected = 0 if self.last is None else self.last + 1
+        if later.first != expected:
+            raise ValueError(f"Blocks {expected}..{later.first - 1} are missing from the chain")
+        if self.first is None:
+            self.first = later.first
+        self.last, self.tip, self.tip_root = later.last, later.tip, later.tip_root
+        self.tx_count += later.tx_count
+        self.nodes.extend(later.nodes)
+        for account, deltas in later.changes.items():
+            self.apply(account, deltas)
+        return self
+
+
+def parse_line(line, delta):
+    # Plain floats, as the chain itself computed with
+    row = json.loads(line)
+    if row.get("format") == FORMAT:
+        delta.nodes.extend(row.get("nodes", []))
+    else:
+        delta.add_block(row)
+
+
+# --- Workers: each one reads and folds its own slice of the file ---
+
+def jsonl_range_delta(path, start, end):
+    delta = StateDelta()
+    with open(path, "rb") as f:
+        f.seek(start)
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            if line.strip():
+                parse_line(line, delta)
+    return delta
+
+
+def lines_delta(lines):
+    delta = StateDelta()
+    for line in lines:
+        if line.strip():
+            parse_line(line, delta)
+    return delta
+
+
+def parquet_group_delta(path, group):
+    delta = StateDelta()
+    table = pq.ParquetFile(path).read_row_group(group, columns=["index", "hash", "state_root", "transactions_json"])
+    for index, block_hash, root, transactions in zip(*(table.column(i).to_pylist() for i in range(4))):
+        delta.add_block({
+            "index": index,
+            "hash": block_hash,
+            "state_root": root,
+            "transactions": json.loads(transactions),
+        })
+    return delta
+
+
+def split_points(path, parts):
+    # Byte offsets that cut the file into `parts` line-aligned ranges
+    size = os.path.getsize(path)
+    points = [0]
+    with open(path, "rb") as f:
+        for i in range(1, parts):
+            f.seek(max(size * i // parts, points[-1]))
+            f.readline()
+            points.append(min(f.tell(), size))
+    points.append(size)
+    return [(a, b) for a, b in zip(points, points[1:]) if b > a]
+
+
+def chunked_lines(path, chunk_blocks):
+    chunk = []
+    with open_text(path, "r") as f:
+        for line in f:
+            chunk.append(line)
+            if len(chunk) >= chunk_blocks:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def rebuild_state(path, workers=None, chunk_blocks=2000):
+    """Replay an exported chain (JSONL, JSONL.gz or Parquet) in parallel and
+    return the merged StateDelta from genesis to the tip."""
+    workers = workers or os.cpu_count() or 1
+    state = StateDelta()
+    with ProcessPoolExecutor(workers) as pool:
+        if path.endswith(".parquet"):
+            require_pyarrow()
+            groups = range(pq.ParquetFile(path).num_row_groups)
+            deltas = pool.map(parquet_group_delta, [path] * len(groups), groups)
+        elif path.endswith(".gz"):
+            # Not seekable: this process decompresses, workers parse
+            deltas = pool.map(lines_delta, chunked_lines(path, chunk_blocks))
+        else:
+            ranges = split_points(path, workers * 4)
+            deltas = pool.map(jsonl_range_delta, [path] * len(ranges), *zip(*ranges))
+        for delta in deltas:
+            state.merge(delta)
+    return state
+
+
+def account_state(state):
+    # The AccountState the chain would hold at the tip (stakes are not on chain)
+    if state.first not in (0, None):
+        raise ValueError("The account state needs the chain from genesis")
+    accounts = AccountState(history=1)
+    for account in state.changes:
+        accounts.put(account, state.balance(account), 0)
+    return accounts
+
+
+def state_root(state):
+    # Sparse Merkle root over every account the chain touched, as in the headers
+    return account_state(state).root()
+
+
+def state_to_dict(state):
+    return {
+        "height": state.last,
+        "tip": state.tip,
+        "tx_count": state.tx_count,
+        "root": state_root(state),
+        "nodes": sorted(set(state.nodes)),
+        "balances": {account: state.balance(account) for account in state.changes},
+    }
+
+
+def save_state(state, path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state_to_dict(state), f)
+    os.replace(tmp_path, path)
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild account state from an exported Mycoin chain")
+    parser.add_argument("path", help="chain exported by Export.py (.jsonl, .jsonl.gz or .parquet)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--state", help="state file to write (default: <path>.state.json)")
+    parser.add_argument("--write", action="store_true", help="store the rebuilt state and root")
+    args = parser.parse_args()
+    state_path = args.state or f"{args.path}.state.json"
+
+    started = perf_counter()
+    state = rebuild_state(args.path, args.workers)
+    root = state_root(state)
+    print(f"Replayed {state.last + 1 if state.last is not None else 0} blocks, {state.tx_count} transactions, "
+          f"{len(state.changes)} accounts in {perf_counter() - started:.1f}s")
+    print(f"State root {root}")
+
+    # The tip's header commits to the state; the replay must reproduce it
+    if state.tip_root is None:
+        print("The export carries no state root to check against")
+    elif state.tip_root != root:
+        print(f"State root mismatch: block {state.last} commits to {state.tip_root}")
+        sys.exit(1)
+    else:
+        print(f"State root matches the header of block {state.last}")
+    if args.write:
+        save_state(state, state_path)
+        print(f"Wrote {state_path}")
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+
+SHORT_ID_BYTES = 6
+
+
+def short_id(tx, key):
+    tx_bytes = json.dumps(tx.to_dict(), sort_keys=True).encode()
+    return hashlib.blake2b(tx_bytes, key=key, digest_size=SHORT_ID_BYTES).digest()
+
+
+class CompactBlock:
+    """Block announcement carrying the header plus a salted 6-byte short ID
+    per transaction (BIP152-style) instead of the transactions themselves.
+
+    The salt mixes the block hash with a random nonce, so an attacker cannot
+    precompute colliding transactions for every block.
+    """
+
+    def __init__(self, header, block_hash, nonce, short_ids, prefilled=None):
+        self.header = header
+        self.block_hash = block_hash
+        self.nonce = nonce
+        self.short_ids = short_ids
+        self.prefilled = prefilled or {}  # position -> tx dict
+
+    @property
+    def key(self):
+        return bytes.fromhex(self.block_hash)[:16] + self.nonce
+
+    @classmethod
+    def from_block(cls, block, prefill=()):
+        header = {k: v for k, v in block.to_dict().items() if k != "transactions"}
+        compact = cls(header, block.hash(), os.urandom(8), [])
+        key = compact.key
+        compact.short_ids = [short_id(tx, key) for tx in block.transactions]
+        compact.prefilled = {i: block.transactions[i].to_dict() for i in prefill}
+        return compact
+
+    def encode(self):
+        meta = json.dumps({
+            "header": self.header,
+            "hash": self.block_hash,
+            "nonce": self.nonce.hex(),
+            "count": len(self.short_ids),
+            "prefilled": self.prefilled,
+        }, sort_keys=True).encode()
+        return meta + b"\n" + b"".join(self.short_ids)
+
+    @classmethod
+    def decode(cls, data):
+        meta, _, packed = data.partition(b"\n")
+        meta = json.loads(meta)
+        short_ids = [packed[i:i + SHORT_ID_BYTES] for i in range(0, meta["count"] * SHORT_ID_BYTES, SHORT_ID_BYTES)]
+        prefilled = {int(i): tx for i, tx in meta["prefilled"].items()}
+        return cls(meta["header"], meta["hash"], bytes.fromhex(meta["nonce"]), short_ids, prefilled)
+
+
+class PartialBlock:
+    def __init__(self, compact, slots):
+        self.compact = compact
+        self.slots = slots
+
+    @property
+    def missing(self):
+        return [i for i, tx in enumerate(self.slots) if tx is None]
+
+    def request(self):
+        # getblocktxn: the only payload the receiver has to ask for
+        return {"hash": self.compact.block_hash, "indexes": self.missing}
+
+    def complete(self, txs, tx_cls, block_cls):
+        for position, tx in zip(self.missing, txs):
+            self.slots[position] = tx if isinstance(tx, tx_cls) else tx_cls(**tx)
+        if None in self.slots:
+            return None
+        header = self.compact.header
+        # Only chains whose headers commit to account state carry state_root
+        extra = {"state_root": header["state_root"]} if "state_root" in header else {}
+        block = block_cls(
+            index=header["index"],
+            previous_hash=header["previous_hash"],
+            proof=header["proof"],
+            transactions=self.slots,
+            timestamp=header["timestamp"],
+            **extra,
+        )
+        # A short-ID collision would show up as a hash mismatch here
+        if block.hash() != self.compact.block_hash:
+            return None
+        return block
+
+
+def reconstruct(compact, mempool, tx_cls):
+    key = compact.key
+    by_id = {}
+    for tx in mempool:
+        sid = short_id(tx, key)
+        # Ambiguous IDs are treated as missing rather than guessed
+        by_id[sid] = None if sid in by_id else tx
+    slots = [by_id.get(sid) for sid in compact.short_ids]
+    for position, tx in compact.prefilled.items():
+        slots[position] = tx_cls(**tx)
+    return PartialBlock(compact, slots)
+
+
+def respond_block_txn(block, request):
+    # blocktxn: the sender's answer to a getblocktxn request
+    return [block.transactions[i].to_dict() for i in request["indexes"]]
+
+
+def full_block_size(block):
+    return len(json.dumps(block.to_dict(), sort_keys=True).encode())
@@ -0,0 +1,318 @@
+import argparse
+import hashlib
+import itertools
+import multiprocessing as mp
+import queue
+import random
+import threading
+from time import perf_counter, sleep
+
+from Blockchain import MINT, Blockchain
+from Light import LightClient
+from Merkle import merkle_levels, merkle_proof
+
+OUTBOX_PREFIX = "shard:"
+
+
+def shard_of(account, shards):
+    return int.from_bytes(hashlib.sha256(account.encode()).digest()[:8], "big") % shards
+
+
+def outbox_account(shard, receiver):
+    # Debit side of a cross-shard transfer; the name tells the destination
+    return f"{OUTBOX_PREFIX}{shard}/{receiver}"
+
+
+def parse_outbox(account):
+    if not account.startswith(OUTBOX_PREFIX) or "/" not in account:
+        return None
+    shard, _, receiver = account[len(OUTBOX_PREFIX):].partition("/")
+    if not (shard.isascii() and shard.isdigit()):
+        return None
+    return int(shard), receiver
+
+
+class ShardNode:
+    """One shard: a full Blockchain for its accounts, plus header-only views
+    (LightClient) of every other shard to check incoming receipts against.
+
+    A cross-shard transfer is a normal transaction from the sender to the
+    outbox account `shard:<dest>/<receiver>`, admitted like any other
+    transaction only if the sender can cover it. Once it is mined, the
+    receipt (transaction, height, position, Merkle proof) goes to the
+    destination shard, which checks it against the source shard's header
+    chain (the path must lead to the claimed position, inside the block)
+    and credits the receiver from `shard:<source>` exactly once per
+    position.
+    """
+
+    def __init__(self, shard_id, shards):
+        self.shard_id = shard_id
+        self.shards = shards
+        self.blockchain = Blockchain()
+        self.miner = f"miner-{shard_id}"
+        self.blockchain.register_node(self.miner)
+        self.peers = {s: LightClient() for s in range(shards) if s != shard_id}
+        for source in self.peers:
+            self.blockchain.register_node(f"{OUTBOX_PREFIX}{source}")
+        self.parked = []  # receipts ahead of the headers we hold
+        self.credited = set()  # (source, height, position) already credited, as proven
+        self.confirmed = 0
+        self.cross_credited = 0
+
+    def register_node(self, account):
+        # Outbox names are the shard's own bookkeeping, never user accounts
+        if account.startswith(OUTBOX_PREFIX):
+            return f"Names starting with {OUTBOX_PREFIX} are reserved!"
+        return self.blockchain.register_node(account)
+
+    def fund(self, account, amount):
+        # Starting balance, minted on this shard
+        if account.startswith(OUTBOX_PREFIX):
+            return f"Names starting with {OUTBOX_PREFIX} are reserved!"
+        return self.blockchain.issue(MINT, account, amount)
+
+    def pending(self):
+        # Mempool entries other than the reward for our own last block
+        return sum(1 for tx in self.blockchain.current_transactions if tx.sender != MINT or tx.receiver != self.miner)
+
+    def transfer(self, sender, receiver, amount):
+        if sender.startswith(OUTBOX_PREFIX) or receiver.startswith(OUTBOX_PREFIX):
+            return f"Names starting with {OUTBOX_PREFIX} are reserved!"
+        dest = shard_of(receiver, self.shards)
+        if dest == self.shard_id:
+            return self.blockchain.create_transaction(sender, receiver, amount)
+        outbox = outbox_account(dest, receiver)
+        self.blockchain.register_node(outbox)
+        return self.blockchain.create_transaction(sender, outbox, amount)
+
+    def mine(self):
+        # Returns the new header and the receipts of its cross-shard debits
+        # A block holding nothing but our own reward would only mint another
+        if not self.pending():
+            return None, []
+        self.blockchain.mine_block(self.miner)
+        block = self.blockchain.chain[-1]
+        self.confirmed += sum(1 for tx in block.transactions if tx.sender != MINT)
+        receipts = []
+        levels = None
+        for position, tx in enumerate(block.transactions):
+            target = parse_outbox(tx.receiver) if hasattr(tx, "receiver") else None
+            if target is None:
+                continue
+            if levels is None:
+                levels = merkle_levels(block.leaves())
+            receipts.append((target[0], {
+                "source": self.shard_id,
+                "height": block.index,
+                "position": position,
+                "transaction": tx.to_dict(),
+                "proof": merkle_proof(None, position, levels),
+            }))
+        return block.header(), receipts
+
+    def add_headers(self, source, headers):
+        for header in headers:
+            self.peers[source].add_header(header)
+        parked, self.parked = self.parked, []
+        for receipt in parked:
+            self.credit(receipt)
+
+    def credit(self, receipt):
+        source = receipt["source"]
+        tx = receipt["transaction"]
+        target = parse_outbox(tx["receiver"])
+        if source not in self.peers or target is None or target[0] != self.shard_id:
+            return "Receipt is not for this shard!"
+        key = (source, receipt["height"], receipt["position"])
+        if key in self.credited:
+            return "Receipt already credited!"
+        peer = self.peers[source]
+        if receipt["height"] >= len(peer):
+            self.parked.append(receipt)
+            return "Waiting for the source shard's header."
+        if not peer.verify(receipt):
+            return "Receipt proof does not match the source shard's header at its position!"
+        receiver = target[1]
+        self.blockchain.register_node(receiver)
+        self.credited.add(key)
+        self.cross_credited += 1
+        # The coins left the source shard's balances; they enter ours here
+        return self.blockchain.issue(f"{OUTBOX_PREFIX}{source}", receiver, tx["amount"])
+
+    def stats(self):
+        return {
+            "shard": self.shard_id,
+            "height": len(self.blockchain.chain) - 1,
+            "confirmed": self.confirmed,
+            "pending": self.pending(),
+            "cross_credited": self.cross_credited,
+            "parked": len(self.parked),
+        }
+
+
+def run_shard(shard_id, shards, inbox, outbox, batch=5000):
+    """Process entry point: apply commands, and mine whenever the mempool is
+    non-empty, so every shard mines in parallel with the others."""
+    node = ShardNode(shard_id, shards)
+    # Genesis is every peer's trust anchor for this shard's header chain
+    outbox.put(("header", shard_id, node.blockchain.chain[0].header()))
+    while True:
+        commands = []
+        try:
+            # Block only while there is nothing to mine
+            commands.append(inbox.get(timeout=None if not node.pending() else 0.001))
+            while len(commands) < batch:
+                commands.append(inbox.get_nowait())
+        except queue.Empty:
+            pass
+        for command, *args in commands:
+            if command == "stop":
+                return
+            if command == "register":
+                node.register_node(*args)
+            elif command == "fund":
+                node.fund(*args)
+            elif command == "transfer":
+                node.transfer(*args)
+            elif command == "headers":
+                node.add_headers(*args)
+            elif command == "receipt":
+                node.credit(*args)
+            elif command == "query":
+                reply_id, method, query_args = args
+                if method == "balance":
+                    result = node.blockchain.check_balance(*query_args)
+                else:
+                    result = node.stats()
+                outbox.put(("reply", reply_id, result))
+        header, receipts = node.mine()
+        if header:
+            outbox.put(("header", shard_id, header))
+            for dest, receipt in receipts:
+                outbox.put(("receipt", dest, receipt))
+
+
+class ShardedNetwork:
+    """K shard processes behind one router.
+
+    Accounts live on shard `shard_of(account, K)`; transactions go to the
+    sender's shard. The router thread relays every new header to the other
+    shards before the receipts that depend on it, so receipts never wait for
+    headers in the normal case.
+    """
+
+    def __init__(self, shards=4):
+        self.shards = shards
+        ctx = mp.get_context()
+        self.outbox = ctx.Queue()
+        self.inboxes = [ctx.Queue() for _ in range(shards)]
+        self.processes = [
+            ctx.Process(target=run_shard, args=(i, shards, self.inboxes[i], self.outbox), daemon=True)
+            for i in range(shards)
+        ]
+        self.replies = {}
+        self.reply_ready = threading.Condition()
+        self.reply_ids = itertools.count()
+        self.router = threading.Thread(target=self.route, daemon=True)
+
+    def start(self):
+        for process in self.processes:
+            process.start()
+        self.router.start()
+        return self
+
+    def route(self):
+        while True:
+            message = self.outbox.get()
+            kind = message[0]
+            if kind == "stopped":
+                return
+            if kind == "header":
+                _, source, header = message
+                for shard, inbox in enumerate(self.inboxes):
+                    if shard != source:
+                        inbox.put(("headers", source, [header]))
+            elif kind == "receipt":
+                _, dest, receipt = message
+                self.inboxes[dest].put(("receipt", receipt))
+            elif kind == "reply":
+                _, reply_id, result = message
+                with self.reply_ready:
+                    self.replies[reply_id] = result
+                    self.reply_ready.notify_all()
+
+    def query(self, shard, method, *args):
+        reply_id = next(self.reply_ids)
+        self.inboxes[shard].put(("query", reply_id, method, args))
+        with self.reply_ready:
+            self.reply_ready.wait_for(lambda: reply_id in self.replies)
+            return self.replies.pop(reply_id)
+
+    def shard_of(self, account):
+        return shard_of(account, self.shards)
+
+    def register_node(self, account):
+        self.inboxes[self.shard_of(account)].put(("register", account))
+        return f"Node {account} added to shard {self.shard_of(account)}."
+
+    def fund(self, account, amount):
+        self.inboxes[self.shard_of(account)].put(("fund", account, amount))
+
+    def create_transaction(self, sender, receiver, amount):
+        self.inboxes[self.shard_of(sender)].put(("transfer", sender, receiver, amount))
+
+    def check_balance(self, account):
+        return self.query(self.shard_of(account), "balance", account)
+
+    def stats(self):
+        return [self.query(shard, "stats") for shard in range(self.shards)]
+
+    def stop(self):
+        for inbox in self.inboxes:
+            inbox.put(("stop",))
+        for process in self.processes:
+            process.join()
+        self.outbox.put(("stopped",))
+        self.router.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run K Mycoin shards in parallel and measure throughput")
+    parser.add_argument("--shards", type=int, default=mp.cpu_count())
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--transactions", type=int, default=20000)
+    parser.add_argument("--cross", type=float, default=0.1, help="fraction of transfers that cross shards")
+    parser.add_argument("--balance", type=float, default=1000, help="starting balance of every account")
+    args = parser.parse_args()
+
+    network = ShardedNetwork(args.shards).start()
+    accounts = [f"acct{i}" for i in range(args.accounts)]
+    by_shard = {}
+    for account in accounts:
+        network.register_node(account)
+        network.fund(account, args.balance)
+        by_shard.setdefault(network.shard_of(account), []).append(account)
+    # Transfers spend confirmed balances, so the funding has to be mined first
+    while any(s["pending"] for s in network.stats()):
+        sleep(0.05)
+    rng = random.Random(1)
+    started = perf_counter()
+    for _ in range(args.transactions):
+        sender = rng.choice(accounts)
+        local = by_shard[network.shard_of(sender)]
+        receiver = rng.choice(accounts) if rng.random() < args.cross else rng.choice(local)
+        network.create_transaction(sender, receiver, 1)
+    while True:
+        stats = network.stats()
+        confirmed = sum(s["confirmed"] for s in stats)
+        credited = sum(s["cross_credited"] for s in stats)
+        if not any(s["pending"] or s["parked"] for s in stats) and confirmed >= args.transactions + credited:
+            break
+        sleep(0.05)
+    elapsed = perf_counter() - started
+    for s in stats:
+        print(s)
+    print(f"{args.shards} shards: {confirmed} transactions confirmed ({credited} cross-shard credits) "
+          f"in {elapsed:.2f}s, {confirmed / elapsed:.0f} tx/s")
+    network.stop()
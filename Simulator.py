@@ -0,0 +1,272 @@
+import argparse
+import heapq
+import json
+import math
+import random
+from bisect import bisect
+from collections import deque
+from itertools import accumulate
+from statistics import mean, median
+
+MINE, RECEIVE, TX_BATCH = 0, 1, 2
+HEADER_BYTES = 80
+# A full mesh has n * (n - 1) / 2 links; past this it no longer fits in memory
+MAX_FULL_NODES = 1000
+
+
+def poisson(rng, rate):
+    if rate > 30:
+        return max(0, round(rng.gauss(rate, math.sqrt(rate))))
+    limit, count, product = math.exp(-rate), 0, rng.random()
+    while product > limit:
+        count += 1
+        product *= rng.random()
+    return count
+
+
+class SimBlock:
+    """An immutable block shared by every node that knows about it.
+
+    Nodes only hold references, so the whole network stores each block once.
+    """
+
+    __slots__ = ("id", "height", "parent", "miner", "time", "tx_count", "size")
+
+    def __init__(self, block_id, parent, miner, time, tx_count, tx_size):
+        self.id = block_id
+        self.height = parent.height + 1 if parent else 0
+        self.parent = parent
+        self.miner = miner
+        self.time = time
+        self.tx_count = tx_count
+        self.size = HEADER_BYTES + tx_count * tx_size
+
+
+class SimNode:
+    __slots__ = ("id", "tip", "peers", "latencies", "bandwidth")
+
+    def __init__(self, node_id, genesis, bandwidth):
+        self.id = node_id
+        self.tip = genesis
+        self.peers = []
+        self.latencies = []
+        self.bandwidth = bandwidth
+
+
+class NetworkSimulator:
+    """Discrete-event simulation of many Mycoin nodes mining and gossiping
+    blocks over a configurable topology.
+
+    Proof of work is modelled statistically: blocks are found network-wide as
+    a Poisson process with mean `block_interval`, and the finder is picked in
+    proportion to hash power. Each relay costs link latency plus transmission
+    time (block size / sender bandwidth). Nodes follow the highest tip they
+    have seen, first-seen wins on ties.
+    """
+
+    def __init__(
+        self,
+        n_nodes=1000,
+        topology="random",
+        degree=8,
+        latency=(0.02, 0.2),
+        bandwidth=1_000_000,
+        hash_power=None,
+        block_interval=10.0,
+        tx_rate=50.0,
+        tx_size=250,
+        max_block_txs=2000,
+        seed=0,
+    ):
+        self.rng = random.Random(seed)
+        self.n_nodes = n_nodes
+        self.block_interval = block_interval
+        self.tx_rate = tx_rate
+        self.tx_size = tx_size
+        self.max_block_txs = max_block_txs
+        self.genesis = SimBlock(0, None, None, 0.0, 0, tx_size)
+        self.blocks = [self.genesis]
+        self.nodes = [SimNode(i, self.genesis, self.pick(bandwidth)) for i in range(n_nodes)]
+        self.build_topology(topology, degree, latency)
+
+        if hash_power is None:
+            hash_power = [1.0] * n_nodes
+        elif hash_power == "pareto":
+            hash_power = [self.rng.paretovariate(1.2) for _ in range(n_nodes)]
+        self.cumulative_power = list(accumulate(hash_power))
+
+        self.events = []
+        self.seq = 0
+        self.now = 0.0
+        self.pending = deque()  # [arrival time, tx count] batches not yet in a block
+        self.seen = {0: bytearray(b"\x01" * n_nodes)}  # block id -> node flags
+        self.reach_times = {0: []}  # block id -> times each node first saw it
+        self.events_processed = 0
+
+    def pick(self, value):
+        if isinstance(value, tuple):
+            return self.rng.uniform(*value)
+        return value
+
+    def build_topology(self, topology, degree, latency):
+        n = self.n_nodes
+        edges = set()
+        if topology == "full":
+            if n > MAX_FULL_NODES:
+                raise ValueError(f"A full topology is limited to {MAX_FULL_NODES} nodes, not {n}")
+            edges = {(a, b) for a in range(n) for b in range(a + 1, n)}
+        elif topology == "ring":
+            edges = {(i, (i + 1) % n) for i in range(n)}
+        elif topology == "star":
+            edges = {(0, i) for i in range(1, n)}
+        elif topology == "random":
+            # A ring keeps the graph connected; random chords add the rest
+            for i in range(n):
+                edges.add((i, (i + 1) % n))
+                for _ in range(max(degree - 2, 0) // 2):
+                    edges.add((i, self.rng.randrange(n)))
+        else:
+            raise ValueError(f"Unknown topology: {topology}")
+        for a, b in edges:
+            if a == b:
+                continue
+            link_latency = self.pick(latency)
+            self.nodes[a].peers.append(b)
+            self.nodes[a].latencies.append(link_latency)
+            self.nodes[b].peers.append(a)
+            self.nodes[b].latencies.append(link_latency)
+
+    def schedule(self, time, kind, *payload):
+        self.seq += 1
+        heapq.heappush(self.events, (time, self.seq, kind, payload))
+
+    def next_miner(self):
+        total = self.cumulative_power[-1]
+        return bisect(self.cumulative_power, self.rng.random() * total)
+
+    def run(self, duration):
+        self.schedule(self.rng.expovariate(1 / self.block_interval), MINE)
+        if self.tx_rate:
+            self.schedule(1.0, TX_BATCH)
+        events = self.events
+        while events and events[0][0] <= duration:
+            self.now, _, kind, payload = heapq.heappop(events)
+            self.events_processed += 1
+            if kind == RECEIVE:
+                self.receive(*payload)
+            elif kind == MINE:
+                self.mine()
+                self.schedule(self.now + self.rng.expovariate(1 / self.block_interval), MINE)
+            else:
+                # Transactions arrive in one-second batches to keep the heap small
+                count = poisson(self.rng, self.tx_rate)
+                if count:
+                    self.pending.append([self.now, count])
+                self.schedule(self.now + 1.0, TX_BATCH)
+        self.now = duration
+        return self.report(duration)
+
+    def mine(self):
+        node = self.nodes[self.next_miner()]
+        parent = node.tip
+        # Simplification: one shared mempool drained in arrival order; txs in
+        # blocks that later turn out to be orphans are not re-queued
+        tx_count = 0
+        while self.pending and tx_count < self.max_block_txs:
+            batch = self.pending[0]
+            take = min(batch[1], self.max_block_txs - tx_count)
+            tx_count += take
+            batch[1] -= take
+            if not batch[1]:
+                self.pending.popleft()
+        block = SimBlock(len(self.blocks), parent, node.id, self.now, tx_count, self.tx_size)
+        self.blocks.append(block)
+        self.seen[block.id] = bytearray(self.n_nodes)
+        self.reach_times[block.id] = []
+        self.receive(node.id, block)
+
+    def receive(self, node_id, block):
+        seen = self.seen[block.id]
+        if seen[node_id]:
+            return
+        seen[node_id] = 1
+        self.reach_times[block.id].append(self.now - block.time)
+        node = self.nodes[node_id]
+        if block.height > node.tip.height:
+            node.tip = block
+        delay = block.size / node.bandwidth
+        for peer, link_latency in zip(node.peers, node.latencies):
+            if not seen[peer]:
+                self.schedule(self.now + link_latency + delay, RECEIVE, peer, block)
+
+    def main_chain(self):
+        best = max((node.tip for node in self.nodes), key=lambda b: (b.height, -b.id))
+        ids = set()
+        while best is not None:
+            ids.add(best.id)
+            best = best.parent
+        return ids
+
+    def report(self, duration):
+        main = self.main_chain()
+        mined = self.blocks[1:]
+        orphans = [b for b in mined if b.id not in main]
+        confirmed_txs = sum(b.tx_count for b in mined if b.id in main)
+        p50, p90 = [], []
+        for block in mined:
+            times = self.reach_times[block.id]
+            if len(times) >= self.n_nodes * 0.9:
+                p50.append(times[self.n_nodes // 2])
+                p90.append(times[int(self.n_nodes * 0.9) - 1])
+        tips = {node.tip.id for node in self.nodes}
+        return {
+            "nodes": self.n_nodes,
+            "duration": duration,
+            "blocks_mined": len(mined),
+            "main_chain_height": len(main) - 1,
+            "orphans": len(orphans),
+            "orphan_rate": len(orphans) / len(mined) if mined else 0.0,
+            "propagation_p50_mean": mean(p50) if p50 else None,
+            "propagation_p90_mean": mean(p90) if p90 else None,
+            "propagation_p90_median": median(p90) if p90 else None,
+            "throughput_tps": confirmed_txs / duration if duration else 0.0,
+            "pending_txs": sum(batch[1] for batch in self.pending),
+            "distinct_tips": len(tips),
+            "events_processed": self.events_processed,
+        }
+
+
+def simulate(duration=600.0, **config):
+    return NetworkSimulator(**config).run(duration)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate a Mycoin network")
+    parser.add_argument("--nodes", type=int, default=1000)
+    parser.add_argument("--topology", choices=["random", "ring", "star", "full"], default="random")
+    parser.add_argument("--degree", type=int, default=8)
+    parser.add_argument("--latency-min", type=float, default=0.02)
+    parser.add_argument("--latency-max", type=float, default=0.2)
+    parser.add_argument("--bandwidth", type=float, default=1_000_000, help="Bytes per second per node")
+    parser.add_argument("--hash-power", choices=["uniform", "pareto"], default="uniform")
+    parser.add_argument("--block-interval", type=float, default=10.0)
+    parser.add_argument("--tx-rate", type=float, default=50.0)
+    parser.add_argument("--duration", type=float, default=600.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.topology == "full" and args.nodes > MAX_FULL_NODES:
+        parser.error(f"--topology full is limited to {MAX_FULL_NODES} nodes")
+
+    result = simulate(
+        duration=args.duration,
+        n_nodes=args.nodes,
+        topology=args.topology,
+        degree=args.degree,
+        latency=(args.latency_min, args.latency_max),
+        bandwidth=args.bandwidth,
+        hash_power=None if args.hash_power == "uniform" else "pareto",
+        block_interval=args.block_interval,
+        tx_rate=args.tx_rate,
+        seed=args.seed,
+    )
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,279 @@
+import hashlib
+import json
+from collections import deque
+
+from Indexes import tx_outputs, tx_payouts
+
+EMPTY = bytes(32)
+KEY_BITS = 256
+
+
+def account_key(account):
+    return hashlib.sha256(account.encode()).digest()
+
+
+def key_bit(key, depth):
+    return (key[depth >> 3] >> (7 - (depth & 7))) & 1
+
+
+def key_bits(key, length):
+    return "".join(str(key_bit(key, depth)) for depth in range(length))
+
+
+def node_hash(node):
+    return node.hash if node is not None else EMPTY
+
+
+class Leaf:
+    __slots__ = ("key", "value", "data", "hash")
+
+    def __init__(self, key, value, data):
+        self.key = key
+        self.value = value  # canonical bytes the hash commits to
+        self.data = data  # decoded form of `value`, for cheap reads
+        self.hash = hashlib.sha256(b"\x00" + key + hashlib.sha256(value).digest()).digest()
+
+
+class Node:
+    __slots__ = ("left", "right", "hash")
+
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+        self.hash = hashlib.sha256(b"\x01" + node_hash(left) + node_hash(right)).digest()
+
+
+class SparseMerkleTree:
+    """Sparse Merkle tree over 256-bit keys with single-leaf subtrees
+    collapsed into the leaf, so a path is O(log n) deep rather than 256.
+
+    The shape depends only on the set of keys, so equal contents always
+    give equal roots. Updates copy the path instead of mutating it: keeping
+    an old root keeps that version of the tree.
+    """
+
+    def __init__(self, root=None):
+        self.root_node = root
+
+    def root(self):
+        return node_hash(self.root_node).hex()
+
+    def get(self, key):
+        node, depth = self.root_node, 0
+        while isinstance(node, Node):
+            node = node.right if key_bit(key, depth) else node.left
+            depth += 1
+        if node is not None and node.key == key:
+            return node.data
+        return None
+
+    def set(self, key, value, data=None):
+        self.root_node = self._set(self.root_node, Leaf(key, value, data), 0)
+
+    def _set(self, node, leaf, depth):
+        if node is None:
+            return leaf
+        if isinstance(node, Leaf):
+            if node.key == leaf.key:
+                return leaf
+            return self._split(node, leaf, depth)
+        if key_bit(leaf.key, depth):
+            return Node(node.left, self._set(node.right, leaf, depth + 1))
+        return Node(self._set(node.left, leaf, depth + 1), node.right)
+
+    def _split(self, a, b, depth):
+        side_a, side_b = key_bit(a.key, depth), key_bit(b.key, depth)
+        if side_a == side_b:
+            child = self._split(a, b, depth + 1)
+            return Node(None, child) if side_a else Node(child, None)
+        return Node(b, a) if side_a else Node(a, b)
+
+    def delete(self, key):
+        self.root_node = self._delete(self.root_node, key, 0)
+
+    def _delete(self, node, key, depth):
+        if node is None:
+            return None
+        if isinstance(node, Leaf):
+            return None if node.key == key else node
+        if key_bit(key, depth):
+            left, right = node.left, self._delete(node.right, key, depth + 1)
+        else:
+            left, right = self._delete(node.left, key, depth + 1), node.right
+        # A subtree left with a single leaf collapses back into that leaf
+        if left is None and (right is None or isinstance(right, Leaf)):
+            return right
+        if right is None and isinstance(left, Leaf):
+            return left
+        return Node(left, right)
+
+    def items(self, node=None):
+        stack = [node or self.root_node]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, Leaf):
+                yield node.key, node.value
+            elif node is not None:
+                stack.append(node.right)
+                stack.append(node.left)
+
+    def find(self, prefix):
+        # The subtree at `prefix` (a string of "0"/"1") as this tree stores it
+        node = self.root_node
+        for depth, bit in enumerate(prefix):
+            if isinstance(node, Leaf):
+                return node if key_bits(node.key, len(prefix))[depth:] == prefix[depth:] else None
+            if node is None:
+                return None
+            node = node.right if bit == "1" else node.left
+        return node
+
+    def view(self, prefix=""):
+        """Summary of one subtree, as served to a peer during diff sync."""
+        node = self.find(prefix)
+        if node is None:
+            return {"type": "empty", "hash": EMPTY.hex()}
+        if isinstance(node, Leaf):
+            return {"type": "leaf", "hash": node.hash.hex(), "key": node.key.hex(), "value": node.value.decode()}
+        return {
+            "type": "node",
+            "hash": node.hash.hex(),
+            "left": node_hash(node.left).hex(),
+            "right": node_hash(node.right).hex(),
+        }
+
+    def diff(self, fetch, prefix=""):
+        """Leaves that differ from a peer's tree, as (key, value or None).
+
+        `fetch(prefix)` returns the peer's view() of that subtree; only
+        subtrees whose hashes differ are fetched and descended into.
+        """
+        remote = fetch(prefix)
+        local = self.view(prefix)
+        if remote["hash"] == local["hash"]:
+            return []
+        if remote["type"] == "node":
+            changes = []
+            for bit, side in (("0", "left"), ("1", "right")):
+                if local["type"] == "node" and local[side] == remote[side]:
+                    continue
+                changes.extend(self.diff(fetch, prefix + bit))
+            return changes
+        # The peer holds at most one leaf here; everything else of ours goes
+        remote_key = bytes.fromhex(remote["key"]) if remote["type"] == "leaf" else None
+        local_node = self.find(prefix)
+        changes = []
+        if local_node is not None:
+            changes = [(key, None) for key, _ in self.items(local_node) if key != remote_key]
+        if remote_key is not None:
+            changes.append((remote_key, remote["value"].encode()))
+        return changes
+
+
+def block_deltas(transactions):
+    # Net balance change of every account one block touches, in tx order
+    deltas = {}
+    for tx in transactions:
+        deltas[tx.sender] = deltas.get(tx.sender, 0) - tx.amount - getattr(tx, "fee", 0)
+        for receiver, amount in tx_outputs(tx):
+            deltas[receiver] = deltas.get(receiver, 0) + amount
+        for payer, receiver, amount in tx_payouts(tx):
+            deltas[payer] = deltas.get(payer, 0) - amount
+            deltas[receiver] = deltas.get(receiver, 0) + amount
+    return deltas
+
+
+class AccountState:
+    """Balances and stakes committed to by a SparseMerkleTree.
+
+    apply_block() updates each account the block touches once and returns
+    the new root, which goes into the block header; stake recorded with a
+    block moves coins from the balance into the stake. The roots of the
+    last `history` blocks are kept, so a reorg that shallow rolls back in
+    O(1).
+    """
+
+    def __init__(self, history=256):
+        self.tree = SparseMerkleTree()
+        self.roots = deque(maxlen=history)  # tree root after each recent block
+        self.height = -1  # last applied block
+
+    def __len__(self):
+        return self.height + 1
+
+    def root(self):
+        return self.tree.root()
+
+    def account(self, name):
+        data = self.tree.get(account_key(name))
+        return data or {"balance": 0, "stake": 0}
+
+    def balance(self, name):
+        return self.account(name)["balance"]
+
+    def stake(self, name):
+        return self.account(name)["stake"]
+
+    def put(self, name, balance, stake):
+        data = {"account": name, "balance": balance, "stake": stake}
+        self.tree.set(account_key(name), json.dumps(data, sort_keys=True).encode(), data)
+
+    def update(self, name, balance=0, stake=0):
+        current = self.account(name)
+        self.put(name, current["balance"] + balance, current["stake"] + stake)
+
+    def apply_block(self, block, stakes=None):
+        # `stakes`: optional {account: stake delta} recorded alongside the block
+        deltas = block_deltas(block.transactions)
+        stakes = stakes or {}
+        for name in deltas.keys() | stakes.keys():
+            stake = stakes.get(name, 0)
+            self.update(name, deltas.get(name, 0) - stake, stake)
+        return self.commit()
+
+    def commit(self):
+        self.height += 1
+        self.roots.append(self.tree.root_node)
+        return self.tree.root()
+
+    def truncate(self, height):
+        # Roll back to the state before block `height`; False if too deep
+        drop = self.height - height + 1
+        if drop <= 0:
+            return True
+        if drop >= len(self.roots):
+            return False
+        for _ in range(drop):
+            self.roots.pop()
+        self.tree.root_node = self.roots[-1]
+        self.height = height - 1
+        return True
+
+    def rebuild(self, chain):
+        self.__init__(self.roots.maxlen)
+        for block in chain:
+            self.apply_block(block)
+
+    def reorg(self, chain, fork):
+        if not self.truncate(fork):
+            self.rebuild(chain[:fork])
+        for block in chain[fork:]:
+            self.apply_block(block)
+        return self.root()
+
+    def sync(self, fetch):
+        # Pull a peer's state by descending only the subtrees that differ,
+        # then take over its height. The roots kept for rollback were ours,
+        # not the peer's, so that history restarts at the synced root.
+        top = fetch("")
+        changes = self.tree.diff(lambda prefix: fetch(prefix) if prefix else top)
+        for key, value in changes:
+            if value is None:
+                self.tree.delete(key)
+            else:
+                self.tree.set(key, value, json.loads(value))
+        if "height" in top:
+            self.height = top["height"]
+        self.roots.clear()
+        self.roots.append(self.tree.root_node)
+        return len(changes)
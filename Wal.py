@@ -0,0 +1,230 @@
+import json
+import os
+import threading
+import zlib
+
+from Metrics import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory lock, one process per log file
+    fcntl = None
+
+
+class LogLockedError(RuntimeError):
+    pass
+
+
+def encode_record(record):
+    body = json.dumps(record, separators=(",", ":"))
+    return f"{zlib.crc32(body.encode()):08x} {body}\n".encode()
+
+
+def decode_line(line):
+    # None for a torn or corrupt line, which ends recovery
+    if not line.endswith(b"\n"):
+        return None
+    crc, _, body = line.rstrip(b"\n").partition(b" ")
+    try:
+        if int(crc, 16) != zlib.crc32(body):
+            return None
+        return json.loads(body)
+    except ValueError:
+        return None
+
+
+class MempoolLog:
+    """Append-only write-ahead log of mempool admissions and removals.
+
+    Records are buffered and written by a flusher thread that fsyncs a whole
+    group at once, every `flush_interval` seconds, as soon as `group_size`
+    records are waiting, or as soon as a caller waits in sync(). add()
+    returns once its record is durable; admissions that arrive while an
+    fsync is running share the next one instead of paying for one each;
+    remove() and clear() return without waiting (call sync() to wait for
+    them). confirm() takes mined entries out together with the confirmed
+    balances they produced, in one record, so a restart gets back both.
+    The log is rewritten with only the live entries and the latest
+    confirmed balances once dead records dominate.
+
+    The log is locked before it is read, so a second process can neither
+    replay nor truncate a log that a live mempool is still appending to.
+    """
+
+    def __init__(self, path, flush_interval=0.005, group_size=256, compact_min=10000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.group_size = group_size
+        self.compact_min = compact_min
+        self.live = {}  # wal id -> tx dict, in admission order
+        self.accounts = {}  # account -> [balance, stake] as of the last confirm
+        self.records = 0
+        self.next_id = 1
+        self.pending = []
+        self.flushed = 0  # records known to be on disk
+        self.appended = 0
+        self.flush_requested = False  # a sync() caller is waiting
+        self.cond = threading.Condition()
+        self.closed = False
+        self.file = open(path, "ab")
+        if fcntl is not None:
+            try:
+                fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self.file.close()
+                raise LogLockedError(f"{path} is already in use by another mempool")
+        self.recover()
+        self.flusher = threading.Thread(target=self.flush_loop, daemon=True)
+        self.flusher.start()
+
+    def recover(self):
+        # One sequential pass; stops at the first torn record and cuts it off.
+        # Runs with the log locked and before anything is appended.
+        valid_bytes = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                record = decode_line(line)
+                if record is None:
+                    break
+                valid_bytes += len(line)
+                self.records += 1
+                op = record["op"]
+                if op == "add":
+                    self.live[record["id"]] = record["tx"]
+                    self.next_id = max(self.next_id, record["id"] + 1)
+                elif op == "remove":
+                    for wal_id in record["ids"]:
+                        self.live.pop(wal_id, None)
+                elif op == "clear":
+                    self.live.clear()
+                elif op == "confirm":
+                    for wal_id in record["ids"]:
+                        self.live.pop(wal_id, None)
+                    self.accounts.update(record["accounts"])
+        if valid_bytes < os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_bytes)
+
+    def pending_transactions(self):
+        return list(self.live.items())
+
+    def confirmed_accounts(self):
+        return dict(self.accounts)
+
+    def _append(self, record):
+        with self.cond:
+            self.pending.append(encode_record(record))
+            self.records += 1
+            self.appended += 1
+            if len(self.pending) >= self.group_size:
+                self.cond.notify_all()
+            return self.appended
+
+    def add(self, tx_dict, wait=True):
+        with self.cond:
+            wal_id = self.next_id
+            self.next_id += 1
+            self.live[wal_id] = tx_dict
+        appended = self._append({"op": "add", "id": wal_id, "tx": tx_dict})
+        if wait:
+            self.sync(appended)
+        return wal_id
+
+    def remove(self, wal_ids):
+        wal_ids = [wal_id for wal_id in wal_ids if wal_id is not None]
+        if not wal_ids:
+            return
+        with self.cond:
+            for wal_id in wal_ids:
+                self.live.pop(wal_id, None)
+        self._append({"op": "remove", "ids": wal_ids})
+        self.maybe_compact()
+
+    def confirm(self, wal_ids, accounts):
+        # `accounts`: {account: [balance, stake]} after the block that
+        # mined `wal_ids`
+        wal_ids = [wal_id for wal_id in wal_ids if wal_id is not None]
+        with self.cond:
+            for wal_id in wal_ids:
+                self.live.pop(wal_id, None)
+            self.accounts.update(accounts)
+        self._append({"op": "confirm", "ids": wal_ids, "accounts": accounts})
+        self.maybe_compact()
+
+    def clear(self):
+        with self.cond:
+            self.live.clear()
+        self._append({"op": "clear"})
+        self.maybe_compact()
+
+    def flush_loop(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(
+                    lambda: len(self.pending) >= self.group_size or self.flush_requested or self.closed,
+                    self.flush_interval,
+                )
+                if self.closed and not self.pending:
+                    return
+                self._flush()
+
+    def _flush(self):
+        # Caller holds self.cond
+        if not self.pending:
+            return
+        self.flush_requested = False
+        group, self.pending = self.pending, []
+        with metrics.timer("mempool_wal_fsync"):
+            self.file.write(b"".join(group))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.flushed += len(group)
+        metrics.inc("mempool_wal_records_total", len(group))
+        self.cond.notify_all()
+
+    def sync(self, target=None):
+        # Wait until record number `target` (default: everything so far) is on disk
+        with self.cond:
+            target = self.appended if target is None else target
+            if self.flushed < target:
+                self.flush_requested = True
+                self.cond.notify_all()
+            self.cond.wait_for(lambda: self.flushed >= target or self.closed)
+
+    def maybe_compact(self):
+        if self.records < self.compact_min or self.records < 4 * max(len(self.live), 1):
+            return
+        with self.cond:
+            self._flush()
+            # The new file is locked before it replaces the old one, and the
+            # old one stays locked until then, so the path is never unlocked
+            tmp_path = f"{self.path}.compact"
+            compacted = open(tmp_path, "ab")
+            if fcntl is not None:
+                try:
+                    fcntl.flock(compacted, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    # Keep appending to the current log; compaction is retried later
+                    compacted.close()
+                    metrics.inc("mempool_wal_compaction_failures_total")
+                    return
+            compacted.truncate(0)
+            if self.accounts:
+                compacted.write(encode_record({"op": "confirm", "ids": [], "accounts": self.accounts}))
+            for wal_id, tx_dict in self.live.items():
+                compacted.write(encode_record({"op": "add", "id": wal_id, "tx": tx_dict}))
+            compacted.flush()
+            os.fsync(compacted.fileno())
+            os.replace(tmp_path, self.path)
+            self.file.close()
+            self.file = compacted
+            self.records = len(self.live) + bool(self.accounts)
+        metrics.inc("mempool_wal_compactions_total")
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self._flush()
+            self.cond.notify_all()
+        self.flusher.join()
+        self.file.close()
@@ -0,0 +1,44 @@
+import hashlib
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Blockchain import Blockchain  # noqa: E402
+
+# One leading zero instead of four: same checks, a few dozen hashes a block
+DIFFICULTY = "0"
+
+
+def easy_proof(self, last_hash, proof):
+    guess_hash = hashlib.sha256(f"{last_hash}{proof}".encode()).hexdigest()
+    return guess_hash.startswith(DIFFICULTY)
+
+
+@pytest.fixture(autouse=True)
+def easy_pow(monkeypatch):
+    monkeypatch.setattr(Blockchain, "valid_proof", easy_proof)
+
+
+@pytest.fixture
+def blockchain():
+    chain = Blockchain()
+    for account in ("alice", "bob", "carol", "miner"):
+        chain.register_node(account)
+    # Two blocks of rewards give the miner coins to spend
+    chain.mine_block("miner")
+    chain.mine_block("miner")
+    return chain
+
+
+@pytest.fixture
+def mycoin4(tmp_path, monkeypatch):
+    # Importing the app runs its Streamlit script once, which opens
+    # mempool.wal in the working directory
+    monkeypatch.chdir(tmp_path)
+    module = importlib.import_module("Mycoin4")
+    monkeypatch.setattr(module.Blockchain, "valid_proof", easy_proof)
+    return module
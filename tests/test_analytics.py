@@ -0,0 +1,20 @@
+from Analytics import LedgerAnalytics
+
+
+def test_balances_and_supply_match_the_ledger(blockchain):
+    blockchain.create_batch_transaction("miner", [["alice", 4], ["bob", 3]])
+    blockchain.deploy_contract("miner", "bank", "Bank")
+    blockchain.mine_block("miner")
+    blockchain.call_contract("alice", "bank", "deposit", value=4)
+    blockchain.mine_block("miner")
+    blockchain.call_contract("alice", "bank", "withdraw", [3])
+    blockchain.mine_block("carol")
+
+    analytics = LedgerAnalytics()
+    analytics.sync(blockchain.chain)
+    balances = dict(zip(analytics.accounts, analytics.balances()))
+    for account in ("alice", "bob", "carol", "miner", "bank"):
+        assert balances.get(account, 0) == blockchain.check_balance(account)
+    assert analytics.tx_count == sum(len(block.transactions) for block in blockchain.chain)
+    held = sum(blockchain.check_balance(account) for account in ("alice", "bob", "carol", "miner", "bank"))
+    assert analytics.supply_over_time()["supply"].iloc[-1] == held
@@ -0,0 +1,32 @@
+import math
+
+import pytest
+
+
+@pytest.mark.parametrize("amount", [-10, 0, math.nan, math.inf])
+def test_transfer_amount_must_be_positive_and_finite(blockchain, amount):
+    spendable = blockchain.spendable("miner")
+    assert "added" not in blockchain.create_transaction("alice", "miner", amount)
+    assert "added" not in blockchain.create_batch_transaction("alice", [["miner", amount]])
+    blockchain.mine_block("bob")
+    assert blockchain.check_balance("alice") == 0
+    assert blockchain.spendable("miner") >= spendable
+
+
+def test_contract_accounts_cannot_send(blockchain):
+    blockchain.deploy_contract("miner", "bank", "Bank")
+    assert "contract" in blockchain.register_node("bank")  # deploy still pending
+    blockchain.mine_block("miner")
+    blockchain.call_contract("miner", "bank", "deposit", value=5)
+    blockchain.mine_block("miner")
+    assert blockchain.check_balance("bank") == 5
+
+    assert "added" not in blockchain.create_transaction("bank", "alice", 5)
+    assert "added" not in blockchain.create_batch_transaction("bank", [["alice", 5]])
+    assert "added" not in blockchain.call_contract("bank", "bank", "deposit", value=5)
+    assert "contract" in blockchain.register_node("bank")
+    blockchain.call_contract("miner", "bank", "withdraw", [5])
+    blockchain.mine_block("miner")
+    assert blockchain.check_balance("bank") == 0
+    assert blockchain.check_balance("alice") == 0
+    assert blockchain.validate_chain()
@@ -0,0 +1,36 @@
+from Channels import OPEN, ChannelManager
+
+
+def escrow_payouts(chain, escrow):
+    return [tx for tx in chain.current_transactions if tx.sender == escrow]
+
+
+def test_settle_waits_for_the_escrow_to_be_funded(blockchain):
+    channels = ChannelManager(blockchain)
+    result = channels.open_channel("miner", "alice", 6)
+    assert "opened" in result
+    channel = next(iter(channels.channels.values()))
+    channels.pay(channel.id, "miner", 2)
+
+    # The deposit is still pending, so the escrow has nothing to pay out
+    result = channels.close(channel.id)
+    assert "settled" not in result
+    assert channel.status == OPEN
+    assert not escrow_payouts(blockchain, channel.escrow)
+
+    blockchain.mine_block("bob")
+    assert "settled" in channels.close(channel.id)
+    assert len(escrow_payouts(blockchain, channel.escrow)) == 1
+    blockchain.mine_block("bob")
+    assert blockchain.check_balance("alice") == 2
+    assert blockchain.check_balance(channel.escrow) == 0
+
+
+def test_open_checks_both_deposits_first(blockchain):
+    channels = ChannelManager(blockchain)
+    spendable = blockchain.spendable("miner")
+    result = channels.open_channel("miner", "alice", 5, 5)  # alice has nothing
+    assert "opened" not in result
+    assert not channels.channels
+    assert blockchain.spendable("miner") == spendable
+    assert not [tx for tx in blockchain.current_transactions if tx.receiver.startswith("channel:")]
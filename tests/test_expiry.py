@@ -0,0 +1,18 @@
+from time import time
+
+
+def test_spends_of_an_expired_credit_expire_with_it(mycoin4):
+    chain = mycoin4.Blockchain()
+    chain.nodes.add("System")
+    for node in ("alice", "bob", "carol"):
+        chain.register_node(node)
+    chain.create_transaction("System", "alice", 10, ttl=5)
+    chain.create_transaction("alice", "bob", 8)
+    chain.create_transaction("bob", "carol", 3)
+    chain.create_transaction("System", "carol", 1)
+
+    assert chain.expire_transactions(now=time() + 10) == 3
+    assert chain.participants["alice"] == chain.participants["bob"] == 0
+    assert chain.participants["carol"] == 1
+    assert [(tx.sender, tx.receiver) for tx in chain.current_transactions] == [("System", "carol")]
+    assert chain.expiry.advance(time() + 3600 * 2, len(chain.chain)) == [chain.current_transactions[0]]
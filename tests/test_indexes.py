@@ -0,0 +1,65 @@
+import json
+
+from Blockchain import BatchTransaction, Block, ContractCall, Transaction, transaction_from_dict, tx_record
+from Chains import PersistentChain
+from Indexes import BlockTreeIndex, ChainView, block_entries
+from Lazy import LazyBlock, canonical
+
+
+def extend(index, chain, transactions):
+    block = Block(len(chain), chain[-1].hash() if chain else "0", 0, transactions, timestamp=len(chain))
+    index.add_block(block)
+    return chain.append(block)
+
+
+def brute_force(index, chain, account):
+    return [(h, p) for h, p, block_hash in index.accounts.get(account, ()) if h < len(chain) and chain[h].hash() == block_hash]
+
+
+def test_view_pages_check_only_new_blocks(monkeypatch):
+    index = BlockTreeIndex()
+    chain = extend(index, PersistentChain(), [])
+    for i in range(50):
+        chain = extend(index, chain, [Transaction("alice", "bob", i + 1)])
+    # A side branch from height 40 that also pays alice
+    fork = chain.ancestor(39)
+    for i in range(5):
+        fork = extend(index, fork, [Transaction("bob", "alice", 100 + i)])
+
+    view = index.view(chain)
+    assert view.history("alice", page=1, page_size=10) == brute_force(index, chain, "alice")[-20:-10][::-1]
+
+    checks = []
+    on_chain = ChainView.on_chain
+    monkeypatch.setattr(ChainView, "on_chain", lambda self, h, b: checks.append(h) or on_chain(self, h, b))
+    chain = extend(index, chain, [Transaction("carol", "alice", 1)])
+    view = index.view(chain, view)
+    assert view.history("alice", page_size=3) == brute_force(index, chain, "alice")[-3:][::-1]
+    assert checks == [51]
+
+    # Switching to the side branch re-checks from the fork point only
+    checks.clear()
+    view = index.view(fork, view)
+    assert view.positions("alice") == brute_force(index, fork, "alice")
+    assert min(checks) == 40
+
+
+def test_buffer_backed_blocks_index_without_decoding(monkeypatch):
+    call = ContractCall("alice", "escrow", "release", [{"receiver": "mallory"}], value=2,
+                        receipt={"status": "ok", "gas_used": 7, "result": None, "events": [["paid", "x"]],
+                                 "payouts": [["escrow", "dave", 2]]})
+    transactions = [Transaction("alice", "bob", 5), BatchTransaction("bob", [("carol", 1), ("erin", 2)]), call]
+    block = Block(1, "0", 0, transactions, timestamp=1)
+    # Stored records, so the call's receipt sits beside it in the buffer
+    records = [tx_record(tx) for tx in transactions]
+    lazy = LazyBlock(canonical({"index": 1, "previous_hash": "0", "proof": 0, "timestamp": 1,
+                                "transactions": records}), transaction_from_dict)
+    expected = [accounts for _, accounts in block_entries(block)]
+
+    def loads(*args, **kwargs):
+        raise AssertionError("transaction decoded while indexing")
+
+    monkeypatch.setattr(json, "loads", loads)
+    assert [accounts for _, accounts in block_entries(lazy)] == expected == [
+        {"alice", "bob"}, {"bob", "carol", "erin"}, {"alice", "escrow", "dave"},
+    ]
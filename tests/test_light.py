@@ -0,0 +1,64 @@
+import pytest
+
+from Blockchain import tx_hash
+from Light import LightClient
+from conftest import DIFFICULTY
+
+
+@pytest.fixture
+def chain(blockchain):
+    blockchain.create_batch_transaction("miner", [["alice", 4], ["bob", 3]])
+    blockchain.deploy_contract("miner", "bank", "Bank")
+    blockchain.mine_block("miner")
+    blockchain.call_contract("alice", "bank", "deposit", value=4)
+    blockchain.mine_block("miner")
+    blockchain.call_contract("alice", "bank", "withdraw", [3])
+    blockchain.call_contract("bob", "bank", "withdraw", [1])  # reverts: nothing deposited
+    blockchain.mine_block("carol")
+    return blockchain
+
+
+@pytest.fixture
+def client(chain):
+    client = LightClient(difficulty=DIFFICULTY)
+    assert client.sync(chain).startswith("Synced")
+    return client
+
+
+def test_balances_match_the_full_node(chain, client):
+    for account in ("alice", "bob", "carol", "miner", "bank"):
+        assert client.check_balance(chain, account) == chain.check_balance(account)
+    assert chain.check_balance("alice") == 3
+
+
+def test_batch_and_contract_calls_are_included(chain, client):
+    calls = [tx for block in chain.chain for tx in block.transactions if hasattr(tx, "receipt")]
+    batches = [tx for block in chain.chain for tx in block.transactions if hasattr(tx, "outputs")]
+    assert {tx.receipt["status"] for tx in calls} == {"ok", "reverted"}
+    for tx in calls + batches:
+        assert client.is_included(chain, tx_hash(tx))
+    assert not client.is_included(chain, "0" * 64)
+
+
+def test_proof_only_counts_at_its_position(chain, client):
+    call = next(tx for tx in chain.chain[-1].transactions if getattr(tx, "method", None) == "withdraw")
+    proof = chain.prove_transaction(tx_hash(call))
+    assert client.verify(proof)
+    for position in (proof["position"] + 1, proof["position"] + 4, -1):
+        assert not client.verify(dict(proof, position=position))
+
+
+def test_receipt_is_committed_by_the_block(chain, client):
+    call = next(tx for tx in chain.chain[-1].transactions if tx.sender == "alice")
+    proof = chain.prove_transaction(tx_hash(call))
+    receipt = dict(proof["transaction"]["receipt"], payouts=[["bank", "alice", 30]])
+    forged = dict(proof, transaction=dict(proof["transaction"], receipt=receipt))
+    assert not client.verify(forged)
+
+
+def test_headers_must_link(chain):
+    client = LightClient(difficulty=DIFFICULTY)
+    headers = chain.get_headers(0, 10)
+    assert client.add_header(headers[0])
+    assert not client.add_header(dict(headers[1], previous_hash="0" * 64))
+    assert not client.add_header(headers[2])
@@ -0,0 +1,45 @@
+import threading
+
+from Blockchain import Block
+from Miner import MiningWorker
+
+
+def test_worker_and_direct_mining_keep_the_chain_valid(blockchain):
+    worker = MiningWorker(blockchain, "miner", chunk_size=4, continuous=True)
+    worker.start()
+    senders = []
+    for i in range(20):
+        blockchain.create_transaction("miner", "alice", 1)
+        blockchain.mine_block("bob")
+        senders.append(threading.Thread(target=blockchain.create_transaction, args=("miner", "carol", 1)))
+        senders[-1].start()
+    for sender in senders:
+        sender.join()
+    worker.stop(wait=True)
+    blockchain.mine_block("bob")
+
+    assert blockchain.validate_chain()
+    assert [block.index for block in blockchain.chain] == list(range(len(blockchain.chain)))
+    assert worker.blocks_mined > 0
+    confirmed = [tx for block in blockchain.chain for tx in block.transactions if tx.sender == "miner"]
+    assert len(confirmed) == 40 and len(set(map(id, confirmed))) == 40
+
+
+def test_stale_proof_is_rejected(blockchain):
+    tip = blockchain.chain[-1]
+    stale = blockchain.proof_of_work(tip)
+    blockchain.mine_block("bob")
+    while blockchain.valid_proof(blockchain.chain[-1].hash(), stale):
+        blockchain.mine_block("bob")
+    height = len(blockchain.chain)
+    result = blockchain.add_mined_block("miner", stale, [])
+    assert result.startswith("Stale proof")
+    assert len(blockchain.chain) == height
+    assert blockchain.validate_chain()
+
+
+def test_blocks_link_to_their_parent(blockchain):
+    last = blockchain.chain[-1]
+    block = Block(last.index + 1, "0" * 64, blockchain.proof_of_work(last), [])
+    blockchain.chain.append(block)
+    assert not blockchain.validate_chain()
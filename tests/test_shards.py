@@ -0,0 +1,107 @@
+import itertools
+
+import pytest
+
+from Shards import ShardNode, parse_outbox, shard_of
+from conftest import DIFFICULTY
+
+
+def account_on(shard, shards=2):
+    return next(name for name in (f"user{i}" for i in itertools.count()) if shard_of(name, shards) == shard)
+
+
+@pytest.fixture
+def shards():
+    nodes = [ShardNode(shard, 2) for shard in range(2)]
+    for node in nodes:
+        for peer in node.peers.values():
+            peer.difficulty = DIFFICULTY
+    return nodes
+
+
+def funded(node, account, amount):
+    node.register_node(account)
+    node.fund(account, amount)
+    node.mine()
+    return account
+
+
+def deliver(source, dest):
+    dest.add_headers(source.shard_id, source.blockchain.get_headers(len(dest.peers[source.shard_id])))
+
+
+def test_cross_shard_transfer_credits_once(shards):
+    home, away = shards
+    sender, receiver = account_on(0), account_on(1)
+    funded(home, sender, 100)
+    assert "added" in home.transfer(sender, receiver, 30)
+    _, receipts = home.mine()
+    assert [dest for dest, _ in receipts] == [1]
+    receipt = receipts[0][1]
+
+    assert away.credit(receipt) == "Waiting for the source shard's header."
+    deliver(home, away)
+    assert away.cross_credited == 1
+    assert away.credit(receipt) == "Receipt already credited!"
+    away.mine()
+    assert away.blockchain.check_balance(receiver) == 30
+    assert home.blockchain.check_balance(sender) == 70
+
+
+def test_receipt_at_another_position_is_rejected(shards):
+    home, away = shards
+    sender, receiver = account_on(0), account_on(1)
+    funded(home, sender, 100)
+    home.transfer(sender, receiver, 10)
+    _, receipts = home.mine()
+    deliver(home, away)
+    receipt = receipts[0][1]
+    for shift in (1, 7, 8, -1):
+        forged = dict(receipt, position=receipt["position"] + shift)
+        assert "does not match" in away.credit(forged)
+    assert away.cross_credited == 0
+    assert "Receipt" not in away.credit(receipt)
+    assert away.cross_credited == 1
+
+
+def test_duplicated_odd_leaf_cannot_be_replayed(shards):
+    # Three leaves: the last is paired with itself, so a path that puts it on
+    # the right of its copy reaches the same root at position 3
+    home, away = shards
+    sender, receiver = account_on(0), account_on(1)
+    funded(home, sender, 100)
+    home.transfer(sender, receiver, 10)
+    home.transfer(sender, receiver, 10)
+    _, receipts = home.mine()
+    deliver(home, away)
+    last = receipts[-1][1]
+    assert last["position"] == 2 and away.peers[0].tx_count(last["height"]) == 3
+    leaf_sibling, upper = last["proof"]
+    mirrored = [[leaf_sibling[0], False], upper]
+    assert "does not match" in away.credit(dict(last, position=3, proof=mirrored))
+    assert "does not match" in away.credit(dict(last, position=3))
+    for _, receipt in receipts:
+        away.credit(receipt)
+    away.mine()
+    assert away.blockchain.check_balance(receiver) == 20
+
+
+def test_transfer_beyond_balance_is_refused(shards):
+    home, _ = shards
+    sender, receiver = account_on(0), account_on(1)
+    funded(home, sender, 5)
+    assert "added" not in home.transfer(sender, receiver, 6)
+
+
+def test_outbox_names_are_reserved(shards):
+    home, _ = shards
+    sender = funded(home, account_on(0), 5)
+    assert "reserved" in home.register_node("shard:abc/x")
+    assert "shard:abc/x" not in home.blockchain.nodes
+    assert "reserved" in home.transfer(sender, "shard:abc/x", 1)
+    assert parse_outbox("shard:abc/x") is None
+    # A name that slipped into the chain no longer takes the shard down
+    home.blockchain.register_node("shard:abc/x")
+    home.blockchain.create_transaction(sender, "shard:abc/x", 1)
+    header, receipts = home.mine()
+    assert header is not None and receipts == []
@@ -0,0 +1,117 @@
+import os
+import time
+
+import pytest
+
+from Wal import LogLockedError, MempoolLog, encode_record
+
+TX = {"sender": "alice", "receiver": "bob", "amount": 5}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "mempool.wal")
+
+
+def test_second_opener_neither_replays_nor_truncates(path):
+    log = MempoolLog(path)
+    try:
+        log.add(TX)
+        # Half-written record, as if the live writer were mid-append
+        with open(path, "ab") as f:
+            f.write(encode_record(TX)[:10])
+        size = os.path.getsize(path)
+        with pytest.raises(LogLockedError):
+            MempoolLog(path)
+        assert os.path.getsize(path) == size
+    finally:
+        log.close()
+
+
+def test_recovery_cuts_off_a_torn_tail(path):
+    log = MempoolLog(path)
+    first = log.add(TX)
+    second = log.add(dict(TX, amount=6))
+    log.remove([first])
+    log.sync()
+    log.close()
+    valid = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(encode_record({"op": "clear"})[:-1])
+
+    log = MempoolLog(path)
+    try:
+        assert log.pending_transactions() == [(second, dict(TX, amount=6))]
+        assert os.path.getsize(path) == valid
+        assert log.add(TX) > second
+    finally:
+        log.close()
+
+
+def test_closed_log_can_be_reopened(path):
+    MempoolLog(path).close()
+    MempoolLog(path).close()
+
+
+def test_durable_add_does_not_wait_for_the_flush_interval(path):
+    log = MempoolLog(path, flush_interval=1.0)
+    try:
+        started = time.perf_counter()
+        for i in range(10):
+            log.add(dict(TX, amount=i))
+        assert time.perf_counter() - started < 0.5
+        assert log.flushed == 10
+    finally:
+        log.close()
+
+
+def test_compaction_keeps_the_log_locked(path):
+    log = MempoolLog(path, compact_min=8)
+    try:
+        ids = [log.add(dict(TX, amount=i)) for i in range(8)]
+        log.remove(ids[:-1])
+        assert log.records == 1
+        with pytest.raises(LogLockedError):
+            MempoolLog(path)
+        log.add(TX)
+    finally:
+        log.close()
+    log = MempoolLog(path)
+    try:
+        assert [tx["amount"] for _, tx in log.pending_transactions()] == [7, 5]
+    finally:
+        log.close()
+
+
+def test_restart_replays_transfers_from_confirmed_balances(tmp_path, mycoin4):
+    path = str(tmp_path / "restart.wal")
+    chain = mycoin4.Blockchain(wal_path=path)
+    chain.nodes.add("System")  # so the mining rewards it pays are admitted
+    for node in ("miner", "bob"):
+        chain.register_node(node)
+    chain.mine_block("miner")
+    chain.mine_block("miner")
+    assert "added" in chain.create_transaction("miner", "bob", 15)
+    chain.wal.close()
+
+    # Confirmed balances come back from the log, pending transfers on top
+    restarted = mycoin4.Blockchain(wal_path=path)
+    try:
+        pending = [(tx.sender, tx.receiver, tx.amount) for tx in restarted.current_transactions]
+        assert ("miner", "bob", 15) in pending
+        assert len(restarted.wal.pending_transactions()) == len(pending)
+        assert restarted.state.balance("miner") == 10
+        assert restarted.participants["miner"] == 5 and restarted.participants["bob"] == 15
+        assert restarted.chain[0].state_root == restarted.state_root()
+        assert "added" in restarted.create_transaction("miner", "bob", 5)
+        restarted.mine_block("bob")
+    finally:
+        restarted.wal.close()
+
+    restarted = mycoin4.Blockchain(wal_path=path)
+    try:
+        assert all(tx.sender == "System" for tx in restarted.current_transactions)
+        assert restarted.state.balance("miner") == 0
+        assert restarted.state.balance("bob") == 20
+    finally:
+        restarted.wal.close()